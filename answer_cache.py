@@ -0,0 +1,133 @@
+import hashlib
+import math
+import re
+import threading
+from collections import OrderedDict
+
+from food_cache import MISSING
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Question words that don't change what is being asked
+QUESTION_STOP_WORDS = {
+    'how', 'many', 'much', 'what', 'whats', 'which', 'who', 'why', 'when', 'there',
+    'does', 'do', 'did', 'is', 'are', 'contain', 'contains', 'have', 'has', 'get',
+    'me', 'tell', 'please', 'i', 'my', 'you', 'your', 'it', 'its', 'know', 'want',
+    'give', 'some', 'any', 'about', 'amount', 'number', 'total', 'typical', 'usually'
+}
+
+
+def question_tokens(question, stop_words=()):
+    """Lowercase, drop stop words, fold simple plurals and sort the remaining tokens"""
+    tokens = set()
+    for token in TOKEN_PATTERN.findall(question.lower()):
+        if token in stop_words or token in QUESTION_STOP_WORDS:
+            continue
+        # "eggs" and "egg" ask the same thing; leave short words and "-ss" alone
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        tokens.add(token)
+    return sorted(tokens)
+
+
+def embed(tokens):
+    """Cheap local embedding: L2-normalized sparse vector of tokens and their trigrams"""
+    features = {}
+    for token in tokens:
+        features[token] = features.get(token, 0) + 2.0
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            gram = '#' + padded[i:i + 3]
+            features[gram] = features.get(gram, 0) + 1.0
+    norm = math.sqrt(sum(weight * weight for weight in features.values()))
+    if not norm:
+        return {}
+    return {feature: weight / norm for feature, weight in features.items()}
+
+
+def cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(feature, 0.0) for feature, weight in a.items())
+
+
+class SemanticAnswerCache:
+    """Cache of generated answers keyed on a normalized form of the question.
+
+    "calories in an egg" and "how many calories does an egg have" normalize
+    to the same key. Keys are prefixed with ``version`` (a hash of the prompt
+    template and model), so changing the template invalidates old answers.
+    When ``similarity_threshold`` is set, a miss on the exact key falls back
+    to the most similar recent question by embedding cosine similarity.
+    """
+
+    def __init__(self, cache, version, stop_words=(), similarity_threshold=None, max_vectors=2000):
+        self.cache = cache
+        self.version = version
+        self.stop_words = frozenset(stop_words)
+        self.similarity_threshold = similarity_threshold
+        self.max_vectors = max_vectors
+        self.similar_hits = 0
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, question):
+        return f"{self.version}:{' '.join(question_tokens(question, self.stop_words))}"
+
+    def get(self, question):
+        """Return the cached answer for a question, or None"""
+        tokens = question_tokens(question, self.stop_words)
+        if not tokens:
+            return None
+        key = f"{self.version}:{' '.join(tokens)}"
+        answer = self.cache.get(key)
+        if answer is not MISSING:
+            return answer
+        if self.similarity_threshold is None:
+            return None
+
+        vector = embed(tokens)
+        best_key, best_score = None, self.similarity_threshold
+        with self._lock:
+            candidates = list(self._vectors.items())
+        for candidate_key, candidate_vector in candidates:
+            score = cosine(vector, candidate_vector)
+            if score >= best_score:
+                best_key, best_score = candidate_key, score
+        if best_key is None:
+            return None
+        answer = self.cache.get(best_key)
+        if answer is MISSING:
+            with self._lock:
+                self._vectors.pop(best_key, None)
+            return None
+        self.similar_hits += 1
+        return answer
+
+    def set(self, question, answer):
+        """Cache a non-empty answer for a question"""
+        tokens = question_tokens(question, self.stop_words)
+        if not tokens or not answer:
+            return
+        key = f"{self.version}:{' '.join(tokens)}"
+        self.cache.set(key, answer)
+        if self.similarity_threshold is not None:
+            with self._lock:
+                self._vectors[key] = embed(tokens)
+                self._vectors.move_to_end(key)
+                while len(self._vectors) > self.max_vectors:
+                    self._vectors.popitem(last=False)
+
+    def info(self):
+        info = self.cache.info()
+        info.update({
+            'version': self.version,
+            'similarity_threshold': self.similarity_threshold,
+            'similar_hits': self.similar_hits
+        })
+        return info
+
+
+def template_version(*parts):
+    """Short stable hash identifying a prompt template/model combination"""
+    return hashlib.sha1('\x00'.join(parts).encode('utf-8')).hexdigest()[:12]
@@ -0,0 +1,80 @@
+"""Cold-start benchmark: import time of nutrition_bot and what the first requests load.
+
+Each run starts a fresh interpreter with ``-X importtime``, imports the app,
+answers a greeting, an off-topic message and a local food lookup, and
+reports the slowest imports and whether the Gemini SDK or NumPy were
+loaded along the way. Run from the repository root:
+
+    python benchmarks/bench_import.py
+"""
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should stay unloaded until a request actually needs them
+LAZY_MODULES = ('google.generativeai', 'numpy')
+
+PROBE = r"""
+import sys, time
+start = time.perf_counter()
+import nutrition_bot
+imported = time.perf_counter() - start
+for message in ("hi", "what's the weather like tomorrow", "calories in an apple"):
+    nutrition_bot.get_response(message)
+served = time.perf_counter() - start
+print(f"IMPORT {imported:.6f}")
+print(f"SERVED {served:.6f}")
+for name in %r:
+    print(f"LOADED {name} {name in sys.modules}")
+""" % (LAZY_MODULES,)
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run_probe():
+    env = dict(os.environ, GOOGLE_API_KEY=os.environ.get('GOOGLE_API_KEY', 'benchmark'),
+               SPOONACULAR_API_KEY='', CACHE_WARMER='0')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    top_level = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative, name = int(match.group(2)), match.group(4)
+            # Two spaces of indent: imported directly by the probe or nutrition_bot
+            if len(match.group(3)) <= 3:
+                top_level.append((cumulative, name))
+    report = {}
+    loaded = {}
+    for line in result.stdout.splitlines():
+        fields = line.split()
+        if fields and fields[0] in ('IMPORT', 'SERVED'):
+            report[fields[0]] = float(fields[1])
+        elif fields and fields[0] == 'LOADED':
+            loaded[fields[1]] = fields[2] == 'True'
+    return report['IMPORT'], report['SERVED'], top_level, loaded
+
+
+def main(runs=5):
+    results = [run_probe() for _ in range(runs)]
+    imports = sorted(result[0] for result in results)
+    served = sorted(result[1] for result in results)
+    _, _, top_level, loaded = results[-1]
+
+    print(f"import nutrition_bot  : {imports[len(imports) // 2] * 1000:8.1f} ms (median of {runs})")
+    print(f"import + 3 local msgs : {served[len(served) // 2] * 1000:8.1f} ms (median of {runs})")
+    print("\nslowest top-level imports (last run, cumulative):")
+    for cumulative, name in sorted(top_level, reverse=True)[:10]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    print("\nloaded after serving local answers:")
+    for name in LAZY_MODULES:
+        print(f"  {name:20s} {'yes' if loaded.get(name) else 'no'}")
+
+
+if __name__ == '__main__':
+    main()
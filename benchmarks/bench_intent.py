@@ -0,0 +1,56 @@
+"""Microbenchmark: per-message cost of intent classification.
+
+Compares the compiled single-pass IntentClassifier with the per-keyword
+substring loops it replaced, and reports the cost of parsing a message
+with the templated-question grammar. Run from the repository root:
+
+    python benchmarks/bench_intent.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nutrition_bot import (  # noqa: E402
+    FOOD_QUERY_KEYWORDS, GREETING_KEYWORDS, NUTRITION_KEYWORDS, QUERY_PARSER, classify_message
+)
+
+MESSAGES = [
+    "hi",
+    "How many calories are in a banana?",
+    "What are the nutrition facts in an apple?",
+    "Tell me about the health benefits of spinach",
+    "Compare nutritional value of white rice vs brown rice",
+    "protein in 150g chicken for dinner",
+    "is this a good idea for my morning routine before work tomorrow",
+    "what's the best way to store tomatoes so they last longer in summer",
+    "could you recommend a quick dinner recipe with chicken and broccoli",
+]
+
+
+def legacy_classify(message):
+    """The three separate keyword passes used before IntentClassifier"""
+    message_lower = message.lower()
+    greeting = any(g in message_lower.split() or g == message_lower for g in GREETING_KEYWORDS)
+    nutrition = any(keyword in message_lower for keyword in NUTRITION_KEYWORDS)
+    food_query = any(keyword in message_lower for keyword in FOOD_QUERY_KEYWORDS)
+    return greeting, nutrition, food_query
+
+
+def bench(fn, number=2000):
+    seconds = min(timeit.repeat(lambda: [fn(m) for m in MESSAGES], number=number, repeat=5))
+    return seconds / (number * len(MESSAGES)) * 1e6
+
+
+def main():
+    legacy = bench(legacy_classify)
+    compiled = bench(classify_message)
+    print(f"legacy substring loops : {legacy:8.2f} us/message")
+    print(f"compiled single pass   : {compiled:8.2f} us/message")
+    print(f"speedup                : {legacy / compiled:8.2f}x")
+    print(f"templated parse        : {bench(QUERY_PARSER.parse):8.2f} us/message")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Microbenchmarks of the chat pipeline's building blocks against the stub APIs.
+
+Times is_nutrition_related, get_food_info and format_nutrition_facts per
+corpus category, both cold (caches cleared before every call, so each
+upstream probe hits the Spoonacular stub) and warm. Run from the
+repository root:
+
+    python benchmarks/bench_pipeline.py --spoonacular-latency 0.02
+"""
+import argparse
+import os
+import time
+
+from harness import load_corpus, summarize
+from stubs import add_stub_arguments, start_stubs, stub_configs
+
+
+def time_calls(fn, inputs, repeat, before_each=None):
+    if before_each is None:
+        # Warm runs start from populated caches
+        for value in inputs:
+            fn(value)
+    latencies = []
+    for _ in range(repeat):
+        for value in inputs:
+            if before_each is not None:
+                before_each()
+            start = time.perf_counter()
+            fn(value)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(label, latencies):
+    stats = summarize(latencies)
+    print(f"  {label:40s} n={stats['count']:5d}  p50 {stats['p50_ms']:8.3f} ms"
+          f"  p95 {stats['p95_ms']:8.3f} ms  p99 {stats['p99_ms']:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_stub_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=20, help='passes over the corpus for warm runs')
+    parser.add_argument('--cold-repeat', type=int, default=2, help='passes over the corpus for cold runs')
+    args = parser.parse_args()
+
+    spoonacular, gemini, env = start_stubs(*stub_configs(args))
+    # The app reads its configuration at import time
+    os.environ.update(env)
+    import nutrition_bot
+
+    def reset_caches():
+        nutrition_bot.FOOD_TERMS_CACHE.clear()
+        nutrition_bot.FOOD_INFO_CACHE.clear()
+        nutrition_bot.preload_common_food_terms()
+
+    chats = load_corpus(endpoint='chat')
+    categories = sorted({query['category'] for query in chats})
+
+    print("is_nutrition_related")
+    for category in categories:
+        messages = [query['message'] for query in chats if query['category'] == category]
+        report(f"{category} (cold)", time_calls(nutrition_bot.is_nutrition_related, messages,
+                                                args.cold_repeat, before_each=reset_caches))
+        report(f"{category} (warm)", time_calls(nutrition_bot.is_nutrition_related, messages, args.repeat))
+
+    print("get_food_info")
+    lookups = load_corpus(endpoint='food_info')
+    for category in sorted({query['category'] for query in lookups}):
+        names = [query['food_name'] for query in lookups if query['category'] == category]
+        report(f"{category} (cold)", time_calls(nutrition_bot.get_food_info, names,
+                                                args.cold_repeat, before_each=reset_caches))
+        report(f"{category} (warm)", time_calls(nutrition_bot.get_food_info, names, args.repeat))
+
+    print("format_nutrition_facts")
+    foods = [info for info in (nutrition_bot.get_food_info(query['food_name']) for query in lookups) if info]
+    report("all found foods", time_calls(nutrition_bot.format_nutrition_facts, foods, args.repeat * 10))
+
+    print(f"\nstub calls: spoonacular {spoonacular.stats()}, gemini {gemini.stats()}")
+    spoonacular.stop()
+    gemini.stop()
+
+
+if __name__ == '__main__':
+    main()
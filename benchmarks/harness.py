@@ -0,0 +1,44 @@
+"""Shared helpers for the benchmark scripts: query corpus and latency summaries"""
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'queries.jsonl')
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def load_corpus(path=CORPUS_PATH, endpoint=None):
+    """Read the replayable query corpus, one JSON object per line"""
+    queries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            query = json.loads(line)
+            if endpoint is None or query['endpoint'] == endpoint:
+                queries.append(query)
+    return queries
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return float('nan')
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies):
+    """Return count, mean and p50/p95/p99 (milliseconds) of a list of latencies in seconds"""
+    ordered = sorted(latencies)
+    return {
+        'count': len(ordered),
+        'mean_ms': sum(ordered) / len(ordered) * 1000 if ordered else float('nan'),
+        'p50_ms': percentile(ordered, 0.50) * 1000,
+        'p95_ms': percentile(ordered, 0.95) * 1000,
+        'p99_ms': percentile(ordered, 0.99) * 1000,
+    }
@@ -0,0 +1,144 @@
+"""Concurrent load test of /api/chat and /api/food_info against the stub APIs.
+
+Starts the Spoonacular and Gemini stubs, launches the app in each
+deployment mode as a subprocess, replays the query corpus from
+``--concurrency`` client threads and reports requests per second and
+p50/p95/p99 latency per endpoint. The replay order is shuffled with a fixed
+seed, so runs are comparable. Run from the repository root:
+
+    python benchmarks/load_test.py --modes dev gunicorn --requests 500 --concurrency 32
+"""
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from harness import ROOT, load_corpus, summarize
+from stubs import add_stub_arguments, start_stubs, stub_configs
+
+DEV_SERVER = (
+    "import os, nutrition_bot; "
+    "nutrition_bot.app.run(host='127.0.0.1', port=int(os.environ['PORT']), threaded=True)"
+)
+
+# Deployment mode: (command, extra environment)
+MODES = {
+    'dev': ([sys.executable, '-c', DEV_SERVER], {}),
+    'gunicorn': ([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'nutrition_bot:app'], {}),
+    'gunicorn-parallel': ([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'nutrition_bot:app'],
+                          {'SPOONACULAR_SEARCH_MODE': 'parallel'}),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(mode, stub_env, workers):
+    command, mode_env = MODES[mode]
+    port = free_port()
+    # Every client thread shares one IP, so per-client rate limiting is off
+    env = dict(os.environ, **stub_env, **mode_env, PORT=str(port), WEB_CONCURRENCY=str(workers),
+               RATE_LIMIT_RATE='0')
+    if mode.startswith('gunicorn'):
+        # gunicorn.conf.py binds 0.0.0.0; keep the benchmark on loopback
+        command = command + ['-b', f'127.0.0.1:{port}']
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    give_up_at = time.monotonic() + 30
+    while time.monotonic() < give_up_at:
+        if process.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with status {process.returncode}")
+        try:
+            if requests.get(base_url + '/api/test', timeout=1).ok:
+                return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{mode} server did not start within 30 seconds")
+
+
+def send(session, base_url, query):
+    if query['endpoint'] == 'chat':
+        return session.post(base_url + '/api/chat', json={'message': query['message']}, timeout=60)
+    return session.get(base_url + '/api/food_info', params={'food_name': query['food_name']}, timeout=60)
+
+
+def run_load(base_url, queries, total, concurrency):
+    """Replay queries round-robin; return (wall seconds, [(endpoint, status, seconds)])"""
+    results = []
+    results_lock = threading.Lock()
+    sessions = threading.local()
+    schedule = [queries[i % len(queries)] for i in range(total)]
+
+    def worker(query):
+        session = getattr(sessions, 'session', None)
+        if session is None:
+            session = sessions.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            status = send(session, base_url, query).status_code
+        except requests.RequestException:
+            status = 'error'
+        with results_lock:
+            results.append((query['endpoint'], status, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, schedule))
+    return time.perf_counter() - start, results
+
+
+def report(mode, wall, results):
+    print(f"\n== {mode}: {len(results)} requests in {wall:.2f} s, {len(results) / wall:.1f} req/s")
+    for endpoint in sorted({endpoint for endpoint, _, _ in results}):
+        rows = [(status, seconds) for name, status, seconds in results if name == endpoint]
+        stats = summarize([seconds for _, seconds in rows])
+        failed = sum(1 for status, _ in rows if status == 'error' or status >= 500)
+        print(f"  {endpoint:10s} n={stats['count']:5d}  p50 {stats['p50_ms']:8.1f} ms"
+              f"  p95 {stats['p95_ms']:8.1f} ms  p99 {stats['p99_ms']:8.1f} ms  failed {failed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_stub_arguments(parser)
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--warmup', action='store_true',
+                        help='replay the corpus once before measuring so caches are warm')
+    args = parser.parse_args()
+
+    queries = load_corpus()
+    random.Random(args.seed).shuffle(queries)
+
+    for mode in args.modes:
+        # Fresh stubs per mode so every mode sees the same failure sequence
+        spoonacular, gemini, stub_env = start_stubs(*stub_configs(args))
+        process, base_url = start_app(mode, stub_env, args.workers)
+        try:
+            if args.warmup:
+                run_load(base_url, queries, len(queries), args.concurrency)
+            wall, results = run_load(base_url, queries, args.requests, args.concurrency)
+            report(mode, wall, results)
+            print(f"  stub calls: spoonacular {spoonacular.stats()}, gemini {gemini.stats()}")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+            spoonacular.stop()
+            gemini.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""Local stand-ins for the Spoonacular and Gemini APIs.
+
+Both servers answer with deterministic, well-formed payloads after a
+configurable delay, and fail a configurable fraction of calls with 500 or
+429 (with Retry-After), so benchmarks exercise the real HTTP clients,
+retries and circuit breaker without network access or API quota. Point the
+app at them with SPOONACULAR_BASE_URL and GEMINI_API_ENDPOINT (see
+``start_stubs``). Run standalone with:
+
+    python benchmarks/stubs.py --spoonacular-latency 0.05 --error-rate 0.01
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Foods the Spoonacular stub knows; anything else autocompletes to nothing
+STUB_FOODS = (
+    'avocado', 'bacon', 'bagel', 'blueberries', 'broccoli', 'brown rice', 'burrito',
+    'cashews', 'cheddar cheese', 'chia seeds', 'chickpeas', 'cottage cheese', 'croissant',
+    'dark chocolate', 'edamame', 'granola', 'greek yogurt', 'hummus', 'kale', 'lentils',
+    'mango', 'oatmeal', 'peanut butter', 'pizza', 'quinoa', 'ramen', 'salmon', 'spinach',
+    'strawberries', 'sushi', 'sweet potato', 'tofu', 'tuna', 'turkey', 'walnuts', 'white rice'
+)
+
+NUTRIENTS = (
+    ('Calories', 'kcal', 400), ('Fat', 'g', 30), ('Saturated Fat', 'g', 10),
+    ('Carbohydrates', 'g', 60), ('Sugar', 'g', 25), ('Protein', 'g', 30),
+    ('Fiber', 'g', 12), ('Sodium', 'mg', 800), ('Calcium', 'mg', 200), ('Magnesium', 'mg', 120)
+)
+
+
+class StubConfig:
+    """Latency and failure behaviour shared by the stub servers"""
+
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=1, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Return (delay seconds, failure status or None) for one call"""
+        with self._lock:
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return delay, 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return delay, 500
+        return delay, None
+
+
+def _stable_number(text, low, high):
+    digest = int(hashlib.sha1(text.encode('utf-8')).hexdigest()[:8], 16)
+    return low + digest % (high - low + 1)
+
+
+def _nutrients(name):
+    return [
+        {'name': label, 'amount': round(_stable_number(name + label, 0, ceiling * 10) / 10, 1), 'unit': unit}
+        for label, unit, ceiling in NUTRIENTS
+    ]
+
+
+def _find_food(query):
+    query = (query or '').lower().strip()
+    for food in STUB_FOODS:
+        if food == query or food in query or (len(query) >= 3 and food.startswith(query)):
+            return food
+    return None
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; without TCP_NODELAY the
+    # second one waits for a delayed ACK and every call gains ~40 ms
+    disable_nagle_algorithm = True
+    config = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=()):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _respond(self, route):
+        delay, failure = self.config.draw()
+        self.server.count(failure)
+        time.sleep(delay)
+        if failure == 429:
+            self._send_json(429, {'message': 'rate limited'},
+                            headers=[('Retry-After', str(self.config.retry_after))])
+        elif failure:
+            self._send_json(failure, {'message': 'stub failure'})
+        else:
+            status, payload = route()
+            self._send_json(status, payload)
+
+
+class SpoonacularHandler(_StubHandler):
+    INGREDIENT_INFO = re.compile(r'^/food/ingredients/(\d+)/information$')
+    PRODUCT_INFO = re.compile(r'^/food/products/(\d+)$')
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        self._respond(lambda: self.route(url.path, query))
+
+    def route(self, path, query):
+        food = _find_food(query.get('query'))
+        if path == '/food/ingredients/autocomplete':
+            return 200, [{'name': food}] if food else []
+        if path == '/food/ingredients/search':
+            # Dishes are left to the product and recipe tiers
+            if food and food not in ('pizza', 'ramen', 'sushi', 'burrito'):
+                return 200, {'results': [{'id': STUB_FOODS.index(food) + 1, 'name': food}]}
+            return 200, {'results': []}
+        if path == '/food/products/search':
+            if food in ('pizza', 'ramen'):
+                return 200, {'products': [{'id': 1000 + STUB_FOODS.index(food), 'title': food}]}
+            return 200, {'products': []}
+        if path == '/recipes/complexSearch':
+            if food:
+                return 200, {'results': [{'id': 2000 + STUB_FOODS.index(food), 'title': food,
+                                          'nutrition': {'nutrients': _nutrients(food)}}]}
+            return 200, {'results': []}
+        match = self.INGREDIENT_INFO.match(path)
+        if match and 0 < int(match.group(1)) <= len(STUB_FOODS):
+            food = STUB_FOODS[int(match.group(1)) - 1]
+            return 200, {'id': int(match.group(1)), 'name': food,
+                         'nutrition': {'nutrients': _nutrients(food)}}
+        match = self.PRODUCT_INFO.match(path)
+        if match and 0 <= int(match.group(1)) - 1000 < len(STUB_FOODS):
+            food = STUB_FOODS[int(match.group(1)) - 1000]
+            return 200, {'id': int(match.group(1)), 'title': food, 'brand': 'Stub Foods',
+                         'nutrition': {'nutrients': _nutrients(food)}}
+        return 404, {'message': f'unknown path {path}'}
+
+
+class GeminiHandler(_StubHandler):
+    """Answers generateContent and streamGenerateContent REST calls"""
+
+    ANSWER = ("<strong>Stub answer</strong><br>This is a canned response from the benchmark "
+              "Gemini stub. Calories: 100 kcal<br>Protein: 5g<br>Carbohydrates: 15g<br>Fat: 2g")
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        path = urlparse(self.path).path
+        self._respond(lambda: self.route(path))
+
+    def route(self, path):
+        if path.endswith(':streamGenerateContent'):
+            # The REST transport expects the whole stream as one JSON array
+            words = self.ANSWER.split(' ')
+            pieces = [' '.join(words[i:i + 8]) + ' ' for i in range(0, len(words), 8)]
+            return 200, [self._candidate(piece) for piece in pieces]
+        if path.endswith(':generateContent'):
+            return 200, self._candidate(self.ANSWER)
+        return 404, {'error': {'message': f'unknown path {path}'}}
+
+    @staticmethod
+    def _candidate(text):
+        return {'candidates': [{'content': {'parts': [{'text': text}], 'role': 'model'},
+                                'finishReason': 'STOP', 'index': 0}]}
+
+
+class _CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.calls = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def count(self, failure):
+        with self._lock:
+            self.calls += 1
+            if failure:
+                self.failures += 1
+
+
+class StubServer:
+    """Run one stub handler on a background thread"""
+
+    def __init__(self, handler, config, host='127.0.0.1', port=0):
+        handler_class = type(handler.__name__, (handler,), {'config': config})
+        self.httpd = _CountingServer((host, port), handler_class)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self):
+        return {'calls': self.httpd.calls, 'failures': self.httpd.failures}
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def start_stubs(spoonacular_config, gemini_config, spoonacular_port=0, gemini_port=0):
+    """Start both stubs and return (spoonacular, gemini, env overrides for the app)"""
+    spoonacular = StubServer(SpoonacularHandler, spoonacular_config, port=spoonacular_port).start()
+    gemini = StubServer(GeminiHandler, gemini_config, port=gemini_port).start()
+    env = {
+        'SPOONACULAR_BASE_URL': spoonacular.url,
+        'SPOONACULAR_API_KEY': 'stub',
+        'GEMINI_API_ENDPOINT': gemini.url,
+        'GOOGLE_API_KEY': 'stub',
+        # Benchmarks measure request handling, not background work
+        'CACHE_WARMER': '0',
+        'QUERY_STATS_PATH': '',
+    }
+    return spoonacular, gemini, env
+
+
+def add_stub_arguments(parser):
+    """Add the stub latency/failure options shared by the benchmark scripts"""
+    parser.add_argument('--spoonacular-latency', type=float, default=0.05,
+                        help='seconds per Spoonacular call (default 0.05)')
+    parser.add_argument('--gemini-latency', type=float, default=0.5,
+                        help='seconds per Gemini call (default 0.5)')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='uniform +/- jitter added to every latency')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of calls answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                        help='fraction of calls answered with 429 and Retry-After')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def stub_configs(args):
+    """Build (spoonacular, gemini) StubConfigs from parsed add_stub_arguments options"""
+    common = dict(jitter=args.jitter, error_rate=args.error_rate,
+                  rate_limit_rate=args.rate_limit_rate)
+    return (StubConfig(latency=args.spoonacular_latency, seed=args.seed, **common),
+            StubConfig(latency=args.gemini_latency, seed=args.seed + 1, **common))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_stub_arguments(parser)
+    parser.add_argument('--spoonacular-port', type=int, default=9001)
+    parser.add_argument('--gemini-port', type=int, default=9002)
+    args = parser.parse_args()
+
+    spoonacular, gemini, env = start_stubs(*stub_configs(args), spoonacular_port=args.spoonacular_port,
+                                           gemini_port=args.gemini_port)
+    print("Stubs running; start the app with:")
+    print('  ' + ' '.join(f"{name}={value}" for name, value in env.items() if value))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        spoonacular.stop()
+        gemini.stop()
+
+
+if __name__ == '__main__':
+    main()
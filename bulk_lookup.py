@@ -0,0 +1,284 @@
+"""Offline bulk nutrition lookup for large food lists.
+
+Streams a text file (one food name or question per line) or a column of a
+CSV file, looks every distinct food up once (local database and dataset
+first, then Spoonacular concurrently) and appends the results to a JSONL or
+CSV file as it goes:
+
+    python bulk_lookup.py foods.csv enriched.jsonl --column name --max-api-calls 1000
+
+Only the set of names already seen grows with the input; rows are read and
+written one at a time. A checkpoint file next to the output records how far
+the input has been processed, so rerunning the same command after an
+interruption continues where it stopped instead of starting over. Rows
+whose lookup failed (timeout, upstream error, open circuit) are listed in
+the checkpoint and looked up again by the next run, which appends a new
+record for them; the last record for a row is the one that counts. The run
+also stops early, to be resumed later, once ``--max-api-calls`` Spoonacular
+calls are spent, the upstream quota is down to local-only answers or
+Spoonacular's circuit breaker is open.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from nutrition_dataset import NUTRIENT_COLUMNS
+
+OUTPUT_FIELDS = ['row', 'query', 'food_name', 'status', 'source', 'name', 'brand'] + NUTRIENT_COLUMNS
+
+# CSV columns tried, in order, when --column isn't given
+NAME_COLUMNS = ['food_name', 'food', 'name', 'query']
+
+# Rows written between checkpoints
+CHECKPOINT_EVERY = 200
+
+
+def read_queries(path, column=None):
+    """Yield (row number, text) from a CSV column or from the lines of a text file"""
+    with open(path, encoding='utf-8', newline='') as f:
+        if column or path.lower().endswith('.csv'):
+            reader = csv.DictReader(f)
+            fields = reader.fieldnames or []
+            if column is None:
+                column = next((name for name in NAME_COLUMNS if name in fields), fields[0] if fields else None)
+            if column not in fields:
+                raise ValueError(f"{path} has no column {column!r}")
+            for row, record in enumerate(reader, start=1):
+                yield row, (record.get(column) or '').strip()
+        else:
+            for row, line in enumerate(f, start=1):
+                yield row, line.strip()
+
+
+def food_name_for(bot, text):
+    """Turn a line ("apple" or "calories in an apple?") into the food name to look up"""
+    food_name = bot.extract_food_name(text) or text
+    return food_name.strip(' ?!.,;:"\'')
+
+
+def build_record(row, query, food_name, status, source, food_info):
+    food_info = food_info or {}
+    record = {'row': row, 'query': query, 'food_name': food_name, 'status': status, 'source': source,
+              'name': food_info.get('name'), 'brand': food_info.get('brand') or None}
+    for nutrient in NUTRIENT_COLUMNS:
+        record[nutrient] = food_info.get(nutrient)
+    return record
+
+
+class ResultWriter:
+    """Append records to a JSONL or CSV file, tracking the byte offset for checkpoints"""
+
+    def __init__(self, path, output_format, offset=0):
+        self.output_format = output_format
+        self.file = open(path, 'r+b' if offset and os.path.exists(path) else 'wb')
+        # Drop anything written after the last checkpoint
+        self.file.seek(offset)
+        self.file.truncate()
+        if offset == 0 and output_format == 'csv':
+            self._write_csv_row(OUTPUT_FIELDS)
+
+    def _write_csv_row(self, values):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(values)
+        self.file.write(buffer.getvalue().encode('utf-8'))
+
+    def write(self, record):
+        if self.output_format == 'csv':
+            self._write_csv_row(['' if record[field] is None else record[field] for field in OUTPUT_FIELDS])
+        else:
+            self.file.write(json.dumps(record).encode('utf-8') + b'\n')
+
+    def flush(self):
+        """Flush to disk and return the current offset"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def load_checkpoint(path, input_path, output_format):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    if checkpoint.get('input') != os.path.abspath(input_path) or checkpoint.get('format') != output_format:
+        raise ValueError(f"Checkpoint {path} belongs to a different run; pass --restart to start over")
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    # Write-then-rename so an interruption never leaves a half-written checkpoint
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, path)
+
+
+def lookup_remote(bot, food_name):
+    """Return (status, food_info) for a food that isn't in the local data"""
+    food_info = bot.get_food_info_from_api(food_name)
+    if food_info:
+        return 'found', food_info
+    # "Not found" answers are cached; failed lookups (errors, open circuit) are not
+    if bot.FOOD_INFO_CACHE.get(bot.normalize_food_name(food_name)) is bot.MISSING:
+        return 'error', None
+    return 'not_found', None
+
+
+def stop_reason(bot, calls_at_start, max_api_calls):
+    """Return why no more remote lookups should be started, or None"""
+    if max_api_calls is not None and bot.SPOONACULAR.call_count() - calls_at_start >= max_api_calls:
+        return f"reached --max-api-calls {max_api_calls}"
+    if bot.QUOTA.stage('spoonacular') == bot.STAGE_LOCAL_ONLY:
+        return "upstream quota exhausted"
+    if bot.SPOONACULAR.breaker.state == 'open':
+        return "Spoonacular is unavailable (circuit open)"
+    return None
+
+
+def run(bot, args):
+    """Process the input, returning (counts, stop reason or None)"""
+    checkpoint_path = args.checkpoint or args.output + '.checkpoint'
+    checkpoint = None if args.restart else load_checkpoint(checkpoint_path, args.input, args.format)
+    done_rows = checkpoint['rows'] if checkpoint else 0
+    counts = dict(checkpoint['counts']) if checkpoint else {'found': 0, 'not_found': 0, 'error': 0, 'duplicate': 0}
+    # Failed rows of earlier runs, looked up again in input order
+    retry_rows = set(checkpoint.get('errors', [])) if checkpoint else set()
+    error_rows = set(retry_rows)
+    writer = ResultWriter(args.output, args.format, checkpoint['output_bytes'] if checkpoint else 0)
+
+    seen = set()
+    pending = deque()    # (row, query, food_name, source, future or (status, food_info)), in input order
+    window = args.concurrency * 4
+    calls_at_start = bot.SPOONACULAR.call_count()
+    last_row = done_rows
+    reason = None
+    since_checkpoint = 0
+
+    def next_ready():
+        result = pending[0][4]
+        return not isinstance(result, Future) or result.done()
+
+    def write_next():
+        row, query, food_name, source, result = pending[0]
+        status, food_info = result.result() if isinstance(result, Future) else result
+        writer.write(build_record(row, query, food_name, status, source, food_info))
+        pending.popleft()
+        if row in retry_rows:
+            # Supersedes the failed record of an earlier run
+            retry_rows.discard(row)
+            error_rows.discard(row)
+            counts['error'] -= 1
+        if status == 'error':
+            error_rows.add(row)
+        counts[status] += 1
+
+    def checkpoint_now():
+        # Every row before the oldest unwritten lookup is fully accounted for;
+        # retried rows come before the previous checkpoint and don't move it
+        rows = next((entry[0] - 1 for entry in pending if entry[0] > done_rows), last_row)
+        save_checkpoint(checkpoint_path, {
+            'input': os.path.abspath(args.input),
+            'format': args.format,
+            'rows': rows,
+            'output_bytes': writer.flush(),
+            'counts': counts,
+            'errors': sorted(error_rows)
+        })
+        print(f"rows {rows}: " + ', '.join(f"{name} {count}" for name, count in counts.items()), file=sys.stderr)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        try:
+            for row, query in read_queries(args.input, args.column):
+                food_name = food_name_for(bot, query)
+                key = bot.normalize_food_name(food_name)
+                if row <= done_rows and row not in retry_rows:
+                    # Already processed by an earlier run; only rebuild the duplicate filter
+                    seen.add(key)
+                    continue
+                if not key:
+                    last_row = row
+                    continue
+                if key in seen:
+                    counts['duplicate'] += 1
+                    last_row = row
+                    continue
+
+                food_info = bot.find_local_food(food_name.lower())
+                if food_info:
+                    pending.append((row, query, food_name, 'local', ('found', food_info)))
+                elif not bot.SPOONACULAR_API_KEY:
+                    pending.append((row, query, food_name, None, ('not_found', None)))
+                else:
+                    reason = stop_reason(bot, calls_at_start, args.max_api_calls)
+                    if reason:
+                        break
+                    pending.append((row, query, food_name, 'spoonacular',
+                                    pool.submit(lookup_remote, bot, food_name)))
+                seen.add(key)
+                last_row = max(last_row, row)
+
+                # Write finished rows in input order; block once the window is full
+                while pending and (len(pending) >= window or next_ready()):
+                    write_next()
+                    since_checkpoint += 1
+                    if since_checkpoint >= CHECKPOINT_EVERY:
+                        checkpoint_now()
+                        since_checkpoint = 0
+
+            while pending:
+                write_next()
+        finally:
+            # On Ctrl-C, keep what is already written; unfinished rows are redone on resume
+            pool.shutdown(wait=False, cancel_futures=True)
+            checkpoint_now()
+            writer.close()
+    return counts, reason
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help="Text file with one food per line, or a CSV file")
+    parser.add_argument('output', help="File to write the results to (appended to when resuming)")
+    parser.add_argument('--column', help=f"CSV column holding the food names (default: first of {NAME_COLUMNS})")
+    parser.add_argument('--format', choices=['jsonl', 'csv'],
+                        help="Output format (default: from the output file extension, else jsonl)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Concurrent Spoonacular lookups")
+    parser.add_argument('--max-api-calls', type=int,
+                        help="Stop after about this many Spoonacular calls (in-flight lookups may add a few)")
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: OUTPUT.checkpoint)")
+    parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint and start over")
+    args = parser.parse_args()
+    if args.format is None:
+        args.format = 'csv' if args.output.lower().endswith('.csv') else 'jsonl'
+
+    # The cache warmer would spend quota on the web app's hot foods, not on this run
+    os.environ.setdefault('CACHE_WARMER', '0')
+    import nutrition_bot
+
+    try:
+        counts, reason = run(nutrition_bot, args)
+    except ValueError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        print("Interrupted. Rerun the same command to resume.", file=sys.stderr)
+        sys.exit(130)
+    if reason:
+        print(f"Stopped early: {reason}. Rerun the same command to resume.", file=sys.stderr)
+        sys.exit(1)
+    print(f"Wrote {counts['found'] + counts['not_found'] + counts['error']} foods to {args.output}"
+          f" ({counts['found']} found, {counts['not_found']} not found, {counts['error']} failed,"
+          f" {counts['duplicate']} duplicates skipped)")
+    if counts['error']:
+        print("Rerun the same command to retry the failed lookups.", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: persistence works, but without cross-process locking
+    fcntl = None
+
+LOG = logging.getLogger('nutrition_bot.cache_warmer')
+
+
+class HeavyHitters:
+    """Bounded top-k frequency counter (Space-Saving algorithm).
+
+    Tracks at most ``capacity`` keys; when a new key arrives and the table is
+    full it replaces the least frequent key and inherits its count, which
+    keeps every truly frequent key in the table with a bounded overestimate.
+    When ``path`` is set, counts are merged into a JSON file shared by every
+    worker process so the statistics survive restarts.
+    """
+
+    def __init__(self, capacity=1000, path=None):
+        self.capacity = capacity
+        self.path = path
+        self._counts = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        if path:
+            self._merge_from_disk()
+
+    def _add(self, counts, key, amount):
+        if key in counts or len(counts) < self.capacity:
+            counts[key] = counts.get(key, 0) + amount
+            return
+        if not amount:
+            # Seeding must not evict keys that were actually asked for
+            return
+        victim = min(counts, key=counts.get)
+        counts[key] = counts.pop(victim) + amount
+
+    def record(self, key, amount=1):
+        with self._lock:
+            self._add(self._counts, key, amount)
+            # Counts waiting for persist() are bounded the same way
+            if self.path and amount:
+                self._add(self._pending, key, amount)
+
+    def top(self, n=10):
+        """Return the n most frequent (key, count) pairs, most frequent first"""
+        with self._lock:
+            items = list(self._counts.items())
+        items.sort(key=lambda item: (-item[1], item[0]))
+        return items[:n]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._counts)
+
+    def _trim(self, counts):
+        if len(counts) <= self.capacity:
+            return counts
+        kept = sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:self.capacity]
+        return dict(kept)
+
+    def _merge_from_disk(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f).get('counts', {})
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            for key, count in stored.items():
+                self._counts[key] = max(self._counts.get(key, 0), count)
+            self._counts = self._trim(self._counts)
+
+    def persist(self):
+        """Add the counts recorded since the last persist to the shared file"""
+        if not self.path:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path + '.lock', 'w') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    with open(self.path, encoding='utf-8') as f:
+                        stored = json.load(f).get('counts', {})
+                except (OSError, ValueError):
+                    stored = {}
+                for key, count in pending.items():
+                    stored[key] = stored.get(key, 0) + count
+                stored = self._trim(stored)
+                temp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'updated': time.time(), 'counts': stored}, f)
+                os.replace(temp_path, self.path)
+        except OSError as e:
+            LOG.warning("Could not persist query statistics to %s: %s", self.path, e)
+            with self._lock:
+                for key, count in pending.items():
+                    self._pending[key] = self._pending.get(key, 0) + count
+                self._pending = self._trim(self._pending)
+            return
+        # Adopt the merged view so every worker warms the same hot set
+        with self._lock:
+            for key, count in stored.items():
+                self._counts[key] = max(self._counts.get(key, 0), count)
+            self._counts = self._trim(self._counts)
+
+
+class CacheWarmer:
+    """Background thread that pre-fetches the hottest foods within an API budget.
+
+    Every ``interval`` seconds (and once at start) it walks the top
+    ``top_n`` foods from ``hitters``, skips the ones ``is_warm`` reports as
+    already cached or local, and calls ``warm`` for the rest until
+    ``budget`` upstream calls (as counted by ``call_counter``) are spent.
+
+    With ``lock_path`` set, only the process holding an exclusive lock on
+    that file warms; the others check again every interval and take over
+    when it exits, so several workers don't each spend a budget.
+    """
+
+    def __init__(self, hitters, warm, is_warm, call_counter, budget=50, interval=900, top_n=100,
+                 lock_path=None):
+        self.hitters = hitters
+        self.warm = warm
+        self.is_warm = is_warm
+        self.call_counter = call_counter
+        self.budget = budget
+        self.interval = interval
+        self.top_n = top_n
+        self.lock_path = lock_path
+        self.last_run = None
+        self.last_warmed = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._lock_file = None
+
+    @property
+    def leader(self):
+        """Whether this process does the warming"""
+        return self._lock_file is not None or not self.lock_path or fcntl is None
+
+    def _acquire_lock(self):
+        if self.leader:
+            return True
+        try:
+            lock_file = open(self.lock_path, 'a')
+        except OSError as e:
+            LOG.warning("Could not open warmer lock %s, warming in every process: %s", self.lock_path, e)
+            self.lock_path = None
+            return True
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Held until the process exits
+        self._lock_file = lock_file
+        return True
+
+    def run_once(self):
+        """Warm the hottest cold foods; returns the names that were fetched"""
+        warmed = []
+        start_calls = self.call_counter()
+        for name, _ in self.hitters.top(self.top_n):
+            if self.call_counter() - start_calls >= self.budget:
+                break
+            if self.is_warm(name):
+                continue
+            try:
+                self.warm(name)
+                warmed.append(name)
+            except Exception as e:
+                LOG.warning("Error warming cache for %s: %s", name, e)
+        self.last_run = time.time()
+        self.last_warmed = warmed
+        return warmed
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if self._acquire_lock():
+                self.run_once()
+            self.hitters.persist()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start the warming thread; calling it again is a no-op"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='cache-warmer', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def info(self):
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'leader': self.leader,
+            'budget': self.budget,
+            'interval': self.interval,
+            'last_run': self.last_run,
+            'last_warmed': self.last_warmed,
+            'top': self.hitters.top(10)
+        }
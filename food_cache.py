@@ -0,0 +1,328 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# A child of the app logger, so its rate limiting and queue handler apply
+LOG = logging.getLogger('nutrition_bot.food_cache')
+
+# Sentinel returned by cache lookups when a key is absent or expired, so that
+# cached falsy values (e.g. "this term is not a food") can still be told apart
+MISSING = object()
+
+
+class CacheStats:
+    """Hit/miss/eviction counters for a cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def record(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class SQLiteCacheBackend:
+    """On-disk cache store shared by every process that opens the same file.
+
+    Gunicorn workers (and repeated Vercel invocations on a warm instance) all
+    point at the same database, so a term resolved by one worker is a cache
+    hit for the others. Entries are evicted least-recently-used once the
+    namespace grows past ``max_size``. A hit only writes its access time
+    when the stored one is more than ``touch_interval`` seconds old, so hot
+    keys don't turn every read into a write.
+    """
+
+    def __init__(self, path, namespace, max_size=10000, touch_interval=60):
+        self.path = path
+        self.namespace = namespace
+        self.max_size = max_size
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, last_access)"
+            )
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared across threads, keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """Return (value, expires_at) or MISSING"""
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT value, expires_at, last_access FROM cache WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            return MISSING
+        value, expires_at, last_access = row
+        now = time.time()
+        if expires_at <= now:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            )
+            return MISSING
+        if now - last_access >= self.touch_interval:
+            conn.execute(
+                "UPDATE cache SET last_access = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key)
+            )
+        return json.loads(value), expires_at
+
+    def set(self, key, value, expires_at):
+        """Store a value and return how many entries were evicted to make room"""
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value), expires_at, time.time())
+        )
+        count = conn.execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        overflow = count - self.max_size
+        if overflow <= 0:
+            return 0
+        conn.execute(
+            "DELETE FROM cache WHERE rowid IN ("
+            "SELECT rowid FROM cache WHERE namespace = ? ORDER BY last_access LIMIT ?)",
+            (self.namespace, overflow)
+        )
+        return overflow
+
+    def delete(self, key):
+        self._connection().execute(
+            "DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+        )
+
+    def clear(self):
+        self._connection().execute(
+            "DELETE FROM cache WHERE namespace = ?", (self.namespace,)
+        )
+
+    def __len__(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ? AND expires_at > ?",
+            (self.namespace, time.time())
+        ).fetchone()[0]
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry.
+
+    Falsy values are treated as negative results and kept for
+    ``negative_ttl`` seconds instead of ``ttl``, so a lookup that found
+    nothing is retried sooner than one that succeeded. When a ``backend`` is
+    given it acts as a shared second level behind the in-process LRU. With
+    ``local_copy=False`` the in-process LRU is skipped whenever there is a
+    backend, so values that other processes update (e.g. sessions) are
+    always read fresh from the shared store.
+    """
+
+    def __init__(self, max_size=1000, ttl=86400, negative_ttl=3600, backend=None, local_copy=True):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.backend = backend
+        self.local_copy = local_copy or backend is None
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        """Return the cached value for key, or default if absent or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key) if self.local_copy else None
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats.record('hits')
+                    return value
+                del self._entries[key]
+                self.stats.record('expirations')
+
+        if self.backend is not None:
+            try:
+                stored = self.backend.get(key)
+            except sqlite3.Error as e:
+                LOG.warning("Error reading shared cache: %s", e)
+                stored = MISSING
+            if stored is not MISSING:
+                value, expires_at = stored
+                if self.local_copy:
+                    self._store_local(key, value, expires_at)
+                self.stats.record('hits')
+                return value
+
+        self.stats.record('misses')
+        return default
+
+    def set(self, key, value, ttl=None):
+        """Cache a value, using the negative TTL for falsy results by default"""
+        if ttl is None:
+            ttl = self.ttl if value else self.negative_ttl
+        expires_at = time.time() + ttl
+        if self.local_copy:
+            self._store_local(key, value, expires_at)
+        if self.backend is not None:
+            try:
+                evicted = self.backend.set(key, value, expires_at)
+            except sqlite3.Error as e:
+                LOG.warning("Error writing shared cache: %s", e)
+                evicted = 0
+            if evicted:
+                self.stats.record('evictions', evicted)
+
+    def _store_local(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats.record('evictions')
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.backend is not None:
+            try:
+                self.backend.delete(key)
+            except sqlite3.Error as e:
+                LOG.warning("Error deleting from shared cache: %s", e)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.backend is not None:
+            try:
+                self.backend.clear()
+            except sqlite3.Error as e:
+                LOG.warning("Error clearing shared cache: %s", e)
+
+    def __contains__(self, key):
+        # Membership checks don't count as hits/misses or refresh LRU order
+        with self._lock:
+            entry = self._entries.get(key) if self.local_copy else None
+            if entry is not None and entry[1] > time.time():
+                return True
+        if self.backend is None:
+            return False
+        try:
+            return self.backend.get(key) is not MISSING
+        except sqlite3.Error:
+            return False
+
+    def __len__(self):
+        if self.backend is not None:
+            return len(self.backend)
+        with self._lock:
+            return len(self._entries)
+
+    def info(self):
+        """Return size, configuration and counters for monitoring"""
+        info = {
+            'size': len(self),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'negative_ttl': self.negative_ttl,
+            'shared_backend': self.backend.path if self.backend is not None else None
+        }
+        info.update(self.stats.as_dict())
+        return info
+
+
+def create_cache(namespace, max_size, ttl, negative_ttl, local_copy=True):
+    """Build a TTLCache, backed by the shared SQLite store when CACHE_DB_PATH is set"""
+    backend = None
+    db_path = os.getenv('CACHE_DB_PATH')
+    if db_path:
+        try:
+            backend = SQLiteCacheBackend(db_path, namespace, max_size=max_size)
+        except (sqlite3.Error, OSError) as e:
+            LOG.warning("Could not open shared cache at %s, using in-process cache only: %s", db_path, e)
+    return TTLCache(max_size=max_size, ttl=ttl, negative_ttl=negative_ttl, backend=backend,
+                    local_copy=local_copy)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for and share its result (or exception) instead of
+    repeating the work.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn(*args, **kwargs)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
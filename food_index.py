@@ -0,0 +1,182 @@
+import re
+from collections import defaultdict
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Key used in trie nodes to hold the ids of the shortest tokens below them
+_COMPLETIONS = ''
+# How many completions each trie node keeps; bounds prefix expansion cost
+MAX_PREFIX_COMPLETIONS = 16
+# Shortest query token that is expanded by prefix or fuzzy matching
+MIN_EXPANSION_LENGTH = 3
+# Minimum trigram (Dice) similarity for a fuzzy token match
+MIN_FUZZY_SIMILARITY = 0.5
+# Posting lists longer than this only refine candidates found via rarer tokens
+LARGE_POSTING = 5000
+
+# Credit given to a query token depending on how it matched an indexed token
+EXACT_CREDIT = 1.0
+PREFIX_CREDIT = 0.8
+FUZZY_CREDIT = 0.7
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def trigrams(token):
+    """Return the set of padded character trigrams of a token"""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FoodIndex:
+    """Ranked food-name resolution over a token inverted index.
+
+    Built once from the food names, it resolves each query token by exact
+    lookup, then by prefix (via a trie), then by trigram similarity, and
+    ranks foods by how much of the query and of the food name matched.
+    Ties are broken by name length and then alphabetically so results are
+    deterministic.
+    """
+
+    def __init__(self, names, stop_words=()):
+        self.stop_words = frozenset(stop_words)
+        self.names = []
+        self._name_ids = {}
+        self._name_token_counts = []
+        self._vocabulary = []
+        self._token_ids = {}
+        self._postings = []
+        self._trie = {}
+        self._trigram_postings = defaultdict(list)
+
+        for name in names:
+            self._add_name(name.lower())
+        self._build_token_indexes()
+
+    def _add_name(self, name):
+        if name in self._name_ids:
+            return
+        name_id = len(self.names)
+        self.names.append(name)
+        self._name_ids[name] = name_id
+        tokens = set(tokenize(name))
+        self._name_token_counts.append(max(len(tokens), 1))
+        for token in tokens:
+            token_id = self._token_ids.get(token)
+            if token_id is None:
+                token_id = len(self._vocabulary)
+                self._token_ids[token] = token_id
+                self._vocabulary.append(token)
+                self._postings.append(set())
+            self._postings[token_id].add(name_id)
+
+    def _build_token_indexes(self):
+        # Shortest tokens first so every trie node keeps its closest completions
+        for token_id in sorted(range(len(self._vocabulary)),
+                               key=lambda i: (len(self._vocabulary[i]), self._vocabulary[i])):
+            token = self._vocabulary[token_id]
+            node = self._trie
+            for char in token:
+                node = node.setdefault(char, {_COMPLETIONS: []})
+                if len(node[_COMPLETIONS]) < MAX_PREFIX_COMPLETIONS:
+                    node[_COMPLETIONS].append(token_id)
+            for gram in trigrams(token):
+                self._trigram_postings[gram].append(token_id)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _prefix_matches(self, token):
+        node = self._trie
+        for char in token:
+            node = node.get(char)
+            if node is None:
+                return []
+        return [(token_id, PREFIX_CREDIT * len(token) / len(self._vocabulary[token_id]))
+                for token_id in node[_COMPLETIONS]]
+
+    def _fuzzy_matches(self, token):
+        grams = trigrams(token)
+        shared = defaultdict(int)
+        for gram in grams:
+            for token_id in self._trigram_postings.get(gram, ()):
+                shared[token_id] += 1
+        matches = []
+        for token_id, count in shared.items():
+            similarity = 2 * count / (len(grams) + len(trigrams(self._vocabulary[token_id])))
+            if similarity >= MIN_FUZZY_SIMILARITY:
+                matches.append((token_id, FUZZY_CREDIT * similarity))
+        matches.sort(key=lambda match: (-match[1], self._vocabulary[match[0]]))
+        return matches[:MAX_PREFIX_COMPLETIONS]
+
+    def _resolve_token(self, token):
+        """Return [(token_id, credit)] for the indexed tokens a query token matches"""
+        token_id = self._token_ids.get(token)
+        if token_id is not None:
+            return [(token_id, EXACT_CREDIT)]
+        if len(token) < MIN_EXPANSION_LENGTH:
+            return []
+        return self._prefix_matches(token) or self._fuzzy_matches(token)
+
+    def search(self, query, limit=5):
+        """Return up to limit (name, score) pairs ranked best first, scores in (0, 1]"""
+        query = query.lower().strip()
+        exact_id = self._name_ids.get(query)
+        if exact_id is not None and limit == 1:
+            return [(query, 1.0)]
+
+        tokens = [token for token in dict.fromkeys(tokenize(query))
+                  if token not in self.stop_words]
+        if not tokens:
+            return [(query, 1.0)] if exact_id is not None else []
+
+        # Resolve each query token, rarest first, so very common tokens only
+        # refine the candidate set instead of flooding it
+        resolved = []
+        for token in tokens:
+            matches = self._resolve_token(token)
+            if matches:
+                size = sum(len(self._postings[token_id]) for token_id, _ in matches)
+                resolved.append((size, token, matches))
+        resolved.sort(key=lambda item: (item[0], item[1]))
+
+        credits = {}
+        matched_counts = {}
+        for size, _, matches in resolved:
+            best_for_token = {}
+            if size > LARGE_POSTING and credits:
+                for name_id in credits:
+                    for token_id, credit in matches:
+                        if name_id in self._postings[token_id] and credit > best_for_token.get(name_id, 0):
+                            best_for_token[name_id] = credit
+            else:
+                for token_id, credit in matches:
+                    for name_id in self._postings[token_id]:
+                        if credit > best_for_token.get(name_id, 0):
+                            best_for_token[name_id] = credit
+            for name_id, credit in best_for_token.items():
+                credits[name_id] = credits.get(name_id, 0) + credit
+                matched_counts[name_id] = matched_counts.get(name_id, 0) + 1
+
+        query_size = len(tokens)
+        scored = []
+        for name_id, credit in credits.items():
+            query_coverage = credit / query_size
+            name_coverage = min(matched_counts[name_id] / self._name_token_counts[name_id], 1.0)
+            scored.append((round(0.6 * query_coverage + 0.4 * name_coverage, 4), name_id))
+        if exact_id is not None:
+            scored = [item for item in scored if item[1] != exact_id]
+            scored.append((1.0, exact_id))
+
+        scored.sort(key=lambda item: (-item[0], len(self.names[item[1]]), self.names[item[1]]))
+        return [(self.names[name_id], score) for score, name_id in scored[:limit]]
+
+    def best_match(self, query, min_score=0.0):
+        """Return the best matching name, or None if nothing scores above min_score"""
+        results = self.search(query, limit=1)
+        if results and results[0][1] >= min_score:
+            return results[0][0]
+        return None
@@ -0,0 +1,31 @@
+import os
+
+# Views are synchronous: every request holds one worker thread until it is
+# answered, including while it waits on Gemini or Spoonacular. Concurrency
+# comes from the gthread threads alone, so a worker serves at most `threads`
+# requests at once; scale WEB_CONCURRENCY with CPU cores.
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 128))
+
+# Gemini generations can take a while; don't kill workers mid-response
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    # Runs in the master before the first worker is forked. With --preload
+    # the app is already imported here, so the dataset index is built once
+    # and shared with the workers copy-on-write
+    if server.cfg.preload_app:
+        import nutrition_bot
+        nutrition_bot.wait_for_dataset_index()
+
+
+def post_worker_init(worker):
+    # Background threads must start in the workers: with --preload the app
+    # is imported in the master, whose threads don't survive the fork
+    import nutrition_bot
+    nutrition_bot.start_cache_warmer()
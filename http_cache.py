@@ -0,0 +1,123 @@
+import gzip
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional: without it responses are gzip-compressed only
+    brotli = None
+
+# Responses worth compressing; images and fonts are already compressed
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript',
+    'application/javascript', 'application/json', 'image/svg+xml'
+}
+
+
+def parse_accept_encoding(header):
+    """Return {encoding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for part in (header or '').split(','):
+        fields = part.strip().split(';')
+        encoding = fields[0].strip().lower()
+        if not encoding:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[encoding] = q
+    return accepted
+
+
+def choose_encoding(header):
+    """Pick brotli or gzip for an Accept-Encoding header, or None"""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    best, best_q = None, 0.0
+    for encoding in candidates:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data, encoding, level=6):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    # mtime=0 keeps the output (and so its ETag) identical across calls
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class CompressedBodyCache:
+    """LRU of compressed bodies keyed by (strong ETag, encoding).
+
+    Static files and cached API payloads are compressed once instead of on
+    every request.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+def compress_response(response, accept_encoding, body_cache=None, min_size=500, level=6):
+    """Compress a 200 response in place for the client's Accept-Encoding.
+
+    A strong ETag gets the encoding appended, since the compressed bytes are
+    a different representation. Streamed responses (e.g. Server-Sent Events)
+    and bodies under ``min_size`` bytes are left alone.
+    """
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+
+    etag, weak = response.get_etag()
+    cache_key = (etag, encoding) if etag and not weak and body_cache is not None else None
+    body = body_cache.get(cache_key) if cache_key else None
+    if body is None:
+        if response.direct_passthrough:
+            # send_file responses wrap the file; read it so it can be compressed
+            response.direct_passthrough = False
+        elif response.is_streamed:
+            return response
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        body = compress(data, encoding, level)
+        if cache_key:
+            body_cache.set(cache_key, body)
+    elif hasattr(response.response, 'close'):
+        response.response.close()
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
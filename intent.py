@@ -0,0 +1,78 @@
+import re
+from collections import namedtuple
+
+# Anything left over besides greetings and punctuation
+WORD_PATTERN = re.compile(r"\w")
+
+# Result of classifying one message:
+#   words: the lowercased message split into words (reused for n-gram probing)
+#   is_greeting: the message is only greeting words/phrases and punctuation
+#   nutrition_keywords: nutrition keywords found, in message order
+#   is_food_query: the message asks for nutrition facts about something
+MessageIntent = namedtuple('MessageIntent', ['words', 'is_greeting', 'nutrition_keywords', 'is_food_query'])
+
+
+class IntentClassifier:
+    """Single-pass keyword classifier compiled once at import time.
+
+    All keyword lists are merged into one regex so a message is scanned once
+    instead of once per keyword. Greetings must match whole words ("hi" does
+    not fire inside "this"); nutrition and food query keywords must start at
+    a word boundary but may be followed by more letters, so "vitamin" still
+    matches "vitamins" and "info" matches "information". A message only
+    counts as a greeting when nothing but greetings and punctuation is left.
+    """
+
+    def __init__(self, greeting_keywords, nutrition_keywords, food_query_keywords):
+        categories = {}
+        for category, keywords in (('nutrition', nutrition_keywords), ('food_query', food_query_keywords)):
+            for keyword in keywords:
+                categories.setdefault(keyword.lower(), set()).add(category)
+
+        # A phrase consumes the keywords inside it ("nutrition facts" hides
+        # "nutrition" and "facts"), so it inherits their categories
+        for phrase in categories:
+            for keyword, keyword_categories in categories.items():
+                if keyword != phrase and re.search(r'\b' + re.escape(keyword), phrase):
+                    categories[phrase] = categories[phrase] | keyword_categories
+        self._categories = categories
+
+        def alternation(keywords):
+            # Longest first so multi-word phrases win over their prefixes
+            ordered = sorted({keyword.lower() for keyword in keywords}, key=lambda k: (-len(k), k))
+            return '|'.join(re.escape(keyword) for keyword in ordered)
+
+        self._pattern = re.compile(
+            r"\b(?:(?P<greeting>" + alternation(greeting_keywords) + r")\b"
+            r"|(?P<keyword>" + alternation(categories) + r"))"
+        )
+
+    def classify(self, message):
+        """Classify a message in a single scan"""
+        message_lower = message.lower()
+        greeting_spans = []
+        is_food_query = False
+        nutrition_keywords = []
+        for match in self._pattern.finditer(message_lower):
+            keyword = match.group('keyword')
+            if keyword is None:
+                greeting_spans.append(match.span())
+                continue
+            keyword_categories = self._categories[keyword]
+            if 'nutrition' in keyword_categories:
+                nutrition_keywords.append(keyword)
+            if 'food_query' in keyword_categories:
+                is_food_query = True
+        # Only a bare greeting ("Hi!", "good morning") is one; "Hi, how many
+        # calories in a banana?" is a question that happens to start politely
+        is_greeting = bool(greeting_spans) and not self._has_other_words(message_lower, greeting_spans)
+        return MessageIntent(message_lower.split(), is_greeting, tuple(nutrition_keywords), is_food_query)
+
+    @staticmethod
+    def _has_other_words(message, spans):
+        start = 0
+        for span_start, span_end in spans:
+            if WORD_PATTERN.search(message, start, span_start):
+                return True
+            start = span_end
+        return WORD_PATTERN.search(message, start) is not None
@@ -0,0 +1,98 @@
+"""Non-blocking, rate-limited logging.
+
+Records are formatted in the calling thread and handed to a bounded queue;
+a single listener thread writes them to stdout, so request threads never
+wait on a slow or blocked terminal. A per-message token bucket stops a
+repeated error (e.g. an upstream outage) from flooding the log; the next
+message let through reports how many were suppressed.
+
+Threads don't survive a fork, so a process forked after setup (a gunicorn
+worker under --preload) starts its own listener on a fresh queue.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+
+class RateLimitFilter(logging.Filter):
+    """Allow at most ``rate`` records per second (bursts of ``burst``) per message template"""
+
+    def __init__(self, rate=5.0, burst=20):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.suppressed = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, dropped = self._buckets.get(key, (self.burst, now, 0))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, dropped + 1)
+                self.suppressed += 1
+                return False
+            self._buckets[key] = (tokens - 1, now, 0)
+        if dropped:
+            record.msg = f"{record.msg} ({dropped} similar messages suppressed)"
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(name, level='INFO', rate=5.0, burst=20, queue_size=10000):
+    """Return a logger whose output is rate limited and written by a background thread"""
+    logger = logging.getLogger(name)
+    if getattr(logger, 'rate_limit', None) is not None:
+        return logger
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = DroppingQueueHandler(log_queue)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    rate_limit = RateLimitFilter(rate=rate, burst=burst)
+    handler.addFilter(rate_limit)
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(logging.Formatter('%(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, output)
+    listener.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(listener.stop)
+
+    def restart_in_child():
+        # The queue may have been locked by another thread at fork time, and
+        # what it holds is written by the parent
+        fresh_queue = queue.Queue(maxsize=queue_size)
+        handler.queue = listener.queue = fresh_queue
+        listener._thread = None
+        listener.start()
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=restart_in_child)
+
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    logger.rate_limit = rate_limit
+    logger.queue_handler = handler
+    return logger
@@ -0,0 +1,100 @@
+"""Normalization of upstream nutrient lists into compact food records.
+
+Spoonacular reports nutrients the same way for ingredients, products and
+recipes: a list of {"name", "amount", "unit"} entries. FoodRecord.add_nutrients
+maps each entry to one of NUTRIENT_COLUMNS with a single dict lookup on its
+exact lowercased name (the names the dataset importer accepts, see
+FIELD_ALIASES) and converts the amount to that column's unit, in one pass
+over the list. Matching whole names keeps "Sugar Alcohol" out of sugars,
+"Net Carbohydrates" out of carbs and "Mono Unsaturated Fat" out of
+saturated fat, while still recognizing "Total Fat".
+
+Records keep their fields in __slots__ and are cached as positional rows
+(to_row / from_row), which are smaller than dicts both in memory and as
+JSON in the shared SQLite cache. as_food_info returns the food info dict
+the rest of the app works with.
+"""
+from nutrition_dataset import FIELD_ALIASES, NUTRIENT_COLUMNS
+
+# Unit each nutrient column is stored and displayed in
+NUTRIENT_UNITS = {
+    'calories': 'kcal',
+    'fat': 'g', 'saturated_fat': 'g', 'carbs': 'g', 'sugars': 'g', 'protein': 'g', 'fiber': 'g',
+    'sodium': 'mg', 'calcium': 'mg', 'magnesium': 'mg'
+}
+
+# Multipliers from an upstream unit (lowercased) to each stored unit
+UNIT_FACTORS = {
+    'kcal': {'kcal': 1, 'kj': 1 / 4.184},
+    'g': {'g': 1, 'mg': 0.001, 'µg': 1e-6, 'mcg': 1e-6, 'ug': 1e-6},
+    'mg': {'mg': 1, 'g': 1000, 'µg': 0.001, 'mcg': 0.001, 'ug': 0.001}
+}
+
+# Upstream nutrient name (lowercased) -> (column, unit factors for that column)
+UPSTREAM_NUTRIENTS = {
+    alias: (column, UNIT_FACTORS[NUTRIENT_UNITS[column]])
+    for column in NUTRIENT_COLUMNS
+    for alias in FIELD_ALIASES[column]
+}
+
+
+class FoodRecord:
+    """A food's name, brand, description and per-100g nutrients in fixed fields.
+
+    Nutrients the source doesn't report stay None.
+    """
+
+    __slots__ = ('name', 'brand', 'description') + tuple(NUTRIENT_COLUMNS)
+
+    def __init__(self, name='', brand='', description=''):
+        self.name = name
+        self.brand = brand
+        self.description = description
+        for column in NUTRIENT_COLUMNS:
+            setattr(self, column, None)
+
+    def add_nutrients(self, nutrients):
+        """Fill nutrient fields from an upstream nutrient list; the first entry for a field wins"""
+        missing = sum(1 for column in NUTRIENT_COLUMNS if getattr(self, column) is None)
+        for nutrient in nutrients or ():
+            if not missing:
+                # Every field is set, the rest of the list can't change anything
+                break
+            name = nutrient.get('name')
+            mapping = UPSTREAM_NUTRIENTS.get(name.lower()) if isinstance(name, str) else None
+            if mapping is None:
+                continue
+            column, factors = mapping
+            amount = nutrient.get('amount')
+            if getattr(self, column) is not None or amount.__class__ not in (int, float):
+                continue
+            unit = nutrient.get('unit')
+            # A missing unit means the stored unit; an unknown one can't be converted
+            factor = factors.get(str(unit).lower()) if unit else 1
+            if factor is None:
+                continue
+            setattr(self, column, amount if factor == 1 else round(amount * factor, 3))
+            missing -= 1
+        return self
+
+    def to_row(self):
+        """Return the fields as a JSON-serializable list, in __slots__ order"""
+        return [getattr(self, field) for field in self.__slots__]
+
+    @classmethod
+    def from_row(cls, row):
+        record = cls()
+        for field, value in zip(cls.__slots__, row):
+            setattr(record, field, value)
+        return record
+
+    def as_food_info(self):
+        """Return the food info dict used by lookups, formatting and the API"""
+        food_info = {'name': self.name, 'description': self.description}
+        if self.brand:
+            food_info['brand'] = self.brand
+        for column in NUTRIENT_COLUMNS:
+            value = getattr(self, column)
+            if value is not None:
+                food_info[column] = value
+        return food_info
@@ -0,0 +1,150 @@
+"""Fixed-layout NumPy nutrient vectors and vectorized nutrient arithmetic.
+
+A food's per-100g profile is a float64 vector laid out in NUTRIENT_COLUMNS
+order (the order format_nutrition_facts prints), with NaN for nutrients the
+source doesn't report. Many foods stack into an (n_foods, n_nutrients)
+matrix, so scaling, summing, diffing and ranking are single array operations.
+"""
+import warnings
+
+import numpy as np
+
+from nutrition_dataset import NUTRIENT_COLUMNS
+# Nutrient name synonyms, re-exported for callers that look nutrients up here
+from query_parser import NUTRIENT_ALIASES
+
+NUTRIENT_INDEX = {name: i for i, name in enumerate(NUTRIENT_COLUMNS)}
+
+
+def to_vector(food_info):
+    """Build the nutrient vector of a food info dict"""
+    vector = np.full(len(NUTRIENT_COLUMNS), np.nan)
+    for i, name in enumerate(NUTRIENT_COLUMNS):
+        value = food_info.get(name)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            vector[i] = value
+    return vector
+
+
+def to_matrix(foods):
+    """Stack the nutrient vectors of several food info dicts into a matrix"""
+    if not foods:
+        return np.empty((0, len(NUTRIENT_COLUMNS)))
+    return np.vstack([to_vector(food_info) for food_info in foods])
+
+
+def from_vector(vector, decimals=2):
+    """Convert a nutrient vector back to a {nutrient: value} dict, skipping missing values"""
+    rounded = np.round(vector, decimals)
+    return {
+        name: float(rounded[i])
+        for i, name in enumerate(NUTRIENT_COLUMNS)
+        if not np.isnan(rounded[i])
+    }
+
+
+def scale(vectors, grams):
+    """Scale per-100g vectors (or a matrix, one gram amount per row) to portion sizes"""
+    factors = np.asarray(grams, dtype=float) / 100.0
+    if np.ndim(vectors) == 2 and np.ndim(factors) == 1:
+        factors = factors[:, None]
+    return vectors * factors
+
+
+def total(matrix, grams=None):
+    """Sum a meal: the rows of matrix, optionally scaled by per-row gram amounts.
+
+    A nutrient missing from every row stays NaN; otherwise missing values
+    count as zero.
+    """
+    if grams is not None:
+        matrix = scale(matrix, grams)
+    sums = np.nansum(matrix, axis=0)
+    sums[np.all(np.isnan(matrix), axis=0)] = np.nan
+    return sums
+
+
+def diff(a, b):
+    """Per-nutrient difference a - b between two foods"""
+    return a - b
+
+
+def rank(matrix, nutrient, per=None, limit=10, descending=True):
+    """Return (row indices, values) of the top foods by a nutrient or nutrient ratio.
+
+    ``per`` ranks by nutrient / per (e.g. protein per calorie). Rows with a
+    missing value or a zero denominator are skipped.
+    """
+    values = matrix[:, NUTRIENT_INDEX[nutrient]]
+    if per is not None:
+        denominator = matrix[:, NUTRIENT_INDEX[per]]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(denominator > 0, values / denominator, np.nan)
+
+    candidates = np.flatnonzero(~np.isnan(values))
+    if candidates.size == 0:
+        return candidates, values[candidates]
+    keyed = -values[candidates] if descending else values[candidates]
+    if limit < candidates.size:
+        top = np.argpartition(keyed, limit - 1)[:limit]
+        candidates = candidates[top]
+        keyed = keyed[top]
+    # Stable sort keeps equal values in row order, so results are deterministic
+    order = np.argsort(keyed, kind='stable')
+    rows = candidates[order]
+    return rows, values[rows]
+
+
+def dataset_matrix(dataset):
+    """Build the nutrient matrix of a memory-mapped dataset from its column views"""
+    columns = [np.frombuffer(dataset.columns[name], dtype=np.float32) for name in NUTRIENT_COLUMNS]
+    return np.column_stack(columns).astype(np.float64)
+
+
+class NutrientNeighbors:
+    """Brute-force k-nearest-neighbour search over standardized nutrient vectors.
+
+    Each nutrient is z-scored (missing values become the column mean), and
+    distances for all foods are computed with one matrix-vector product,
+    which BLAS handles in about a millisecond for 100k foods. Constraints
+    such as {'sugars': 'lower'} keep only foods whose raw value is strictly
+    below (or above) the query food's.
+    """
+
+    def __init__(self, matrix):
+        self._raw = matrix
+        with warnings.catch_warnings():
+            # All-NaN columns (nutrients no food reports) are expected
+            warnings.simplefilter('ignore', RuntimeWarning)
+            means = np.nanmean(matrix, axis=0) if len(matrix) else np.zeros(matrix.shape[1])
+            stds = np.nanstd(matrix, axis=0) if len(matrix) else np.ones(matrix.shape[1])
+        self._means = np.nan_to_num(means)
+        self._stds = np.where(np.nan_to_num(stds) > 0, np.nan_to_num(stds), 1.0)
+        self._features = self._standardize(matrix)
+        self._sq_norms = np.einsum('ij,ij->i', self._features, self._features)
+
+    def _standardize(self, vectors):
+        filled = np.where(np.isnan(vectors), self._means, vectors)
+        return (filled - self._means) / self._stds
+
+    def query(self, vector, limit=5, constraints=None, exclude=()):
+        """Return (row indices, distances) of the foods closest to vector"""
+        q = self._standardize(vector)
+        distances = self._sq_norms - 2 * (self._features @ q) + q @ q
+
+        mask = np.ones(len(distances), dtype=bool)
+        for nutrient, direction in (constraints or {}).items():
+            reference = vector[NUTRIENT_INDEX[nutrient]]
+            if np.isnan(reference):
+                continue
+            column = self._raw[:, NUTRIENT_INDEX[nutrient]]
+            # NaN compares False, so foods missing the nutrient are dropped
+            mask &= column < reference if direction == 'lower' else column > reference
+        for row in exclude:
+            mask[row] = False
+
+        candidates = np.flatnonzero(mask)
+        if limit < candidates.size:
+            candidates = candidates[np.argpartition(distances[candidates], limit - 1)[:limit]]
+        rows = candidates[np.argsort(distances[candidates], kind='stable')]
+        return rows, np.sqrt(np.maximum(distances[rows], 0))
@@ -1,15 +1,87 @@
+import atexit
+import functools
+import hashlib
+import json
 import os
-import google.generativeai as genai
-import requests
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, jsonify, url_for
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context, url_for
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from answer_cache import SemanticAnswerCache, template_version
+from cache_warmer import CacheWarmer, HeavyHitters
+from food_cache import MISSING, SingleFlight, create_cache
+from food_index import FoodIndex
+from http_cache import CompressedBodyCache, compress_response
+from intent import IntentClassifier
+from lazy_import import LazyModule
+from log_setup import configure_logging
+from nutrient_records import NUTRIENT_UNITS, FoodRecord
+from nutrition_dataset import NUTRIENT_COLUMNS, load_dataset
+from quota import (
+    STAGE_LOCAL_ONLY, STAGE_NORMAL, ClientRateLimiter, QuotaAccountant, QuotaExceeded, create_quota_store
+)
+from query_parser import NUTRIENT_ALIASES, PORTION_PATTERN, UNIT_GRAMS, QueryParser, find_nutrients, singular
+from sessions import SessionStore, estimate_tokens
+from upstream import CircuitBreaker, UpstreamClient
+import tracing
+
+# NumPy is only needed for nutrient arithmetic (batch totals, ranking,
+# alternatives), so it is imported on first use to keep cold starts fast
+np = LazyModule('numpy')
+nutrient_vectors = LazyModule('nutrient_vectors')
 
 # Create Flask app at module level for Vercel
-app = Flask(__name__)
+app = Flask(__name__, static_folder='static')
 
 # Load environment variables
 load_dotenv()
 
+# Request-path logging goes through a background thread and is rate limited
+# per message, so a failing upstream can't flood or stall the workers
+LOG = configure_logging(
+    'nutrition_bot',
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    rate=float(os.getenv('LOG_RATE', 5)),
+    burst=int(os.getenv('LOG_BURST', 20))
+)
+
+# Add a Server-Timing header with the per-stage breakdown to every response
+SERVER_TIMING = os.getenv('SERVER_TIMING', '0') == '1'
+
+# Upstream budgets per window, shared by all workers through the SQLite
+# store when CACHE_DB_PATH is set (else per process). As Spoonacular's runs
+# low, food-term probing stops first, then it isn't called at all; once
+# Gemini's runs out, questions that need it get a 429. A limit of 0 means
+# the resource is tracked but unlimited.
+QUOTA = QuotaAccountant(
+    {
+        'spoonacular': float(os.getenv('SPOONACULAR_QUOTA_POINTS', 0)),
+        'gemini': float(os.getenv('GEMINI_QUOTA_TOKENS', 0))
+    },
+    window=int(os.getenv('QUOTA_WINDOW', 86400)),
+    probe_reserve=float(os.getenv('QUOTA_PROBE_RESERVE', 0.3)),
+    local_only_reserve=float(os.getenv('QUOTA_LOCAL_ONLY_RESERVE', 0.05)),
+    store=create_quota_store()
+)
+
+# Per-client token buckets for the endpoints that can reach an upstream
+RATE_LIMITER = ClientRateLimiter(
+    rate=float(os.getenv('RATE_LIMIT_RATE', 1)),
+    burst=int(os.getenv('RATE_LIMIT_BURST', 10))
+)
+# With RATE_LIMIT_BY=session, a looser bucket per IP as well, so rotating
+# session ids doesn't get around the limit
+IP_RATE_LIMITER = ClientRateLimiter(
+    rate=float(os.getenv('RATE_LIMIT_IP_RATE', 5)),
+    burst=int(os.getenv('RATE_LIMIT_IP_BURST', 50))
+)
+
 # Configure the Gemini API
 GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 SPOONACULAR_API_KEY = os.getenv('SPOONACULAR_API_KEY')
@@ -22,10 +94,70 @@ if not SPOONACULAR_API_KEY:
     print("WARNING: SPOONACULAR_API_KEY not found in environment variables!")
     print("Make sure you have a .env file with your API key for food facts")
 
-genai.configure(api_key=GOOGLE_API_KEY)
+# Lookups in flight and total time budget for the food terms of one question
+FOOD_TERM_PROBES_PER_REQUEST = int(os.getenv('FOOD_TERM_PROBES_PER_REQUEST', 2))
+FOOD_TERM_LOOKUP_DEADLINE = float(os.getenv('FOOD_TERM_LOOKUP_DEADLINE', 3.0))
+# Enough workers for every request thread to have its probes in flight at
+# once, so probes never queue behind other requests' and miss the deadline.
+# Threads are only started as they are needed.
+FOOD_TERM_LOOKUP_WORKERS = int(os.getenv(
+    'FOOD_TERM_LOOKUP_WORKERS', int(os.getenv('GUNICORN_THREADS', 128)) * FOOD_TERM_PROBES_PER_REQUEST
+))
+
+# Shared, pooled client for every Spoonacular call: keep-alive connections,
+# timeouts, retries with jittered backoff on 429/5xx and a circuit breaker
+# that makes lookups fail fast (falling back to local data or Gemini) while
+# Spoonacular is degraded
+SPOONACULAR = UpstreamClient(
+    'spoonacular',
+    # Overridable so benchmarks can point at a local stand-in server
+    os.getenv('SPOONACULAR_BASE_URL', 'https://api.spoonacular.com'),
+    default_params={'apiKey': SPOONACULAR_API_KEY},
+    connect_timeout=float(os.getenv('SPOONACULAR_CONNECT_TIMEOUT', 3.05)),
+    read_timeout=float(os.getenv('SPOONACULAR_READ_TIMEOUT', 8)),
+    retries=int(os.getenv('SPOONACULAR_RETRIES', 2)),
+    # A retry never waits longer than a question waits for its food terms,
+    # so a 429 with a long Retry-After doesn't hold probe threads
+    max_retry_wait=FOOD_TERM_LOOKUP_DEADLINE,
+    # One keep-alive connection per probe thread
+    pool_size=int(os.getenv('SPOONACULAR_POOL_SIZE', FOOD_TERM_LOOKUP_WORKERS)),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv('SPOONACULAR_BREAKER_THRESHOLD', 5)),
+        reset_timeout=float(os.getenv('SPOONACULAR_BREAKER_RESET', 30))
+    ),
+    observer=lambda endpoint, seconds: on_spoonacular_call(endpoint, seconds)
+)
 
-# Initialize the model
-model = genai.GenerativeModel('gemini-1.5-flash')
+def on_spoonacular_call(endpoint, seconds):
+    # Each call shows up in the request's stage breakdown; Spoonacular
+    # charges about one point per request
+    tracing.annotate(f"spoonacular.{endpoint}", seconds)
+    QUOTA.spend('spoonacular', 1)
+
+GEMINI_MODEL_NAME = 'gemini-1.5-flash'
+
+# Alternative Gemini endpoint (e.g. the benchmark stub server), spoken to over REST
+GEMINI_API_ENDPOINT = os.getenv('GEMINI_API_ENDPOINT')
+
+# The Gemini SDK takes most of the import time, and greetings, off-topic
+# rejections and local lookups never need it, so it is loaded on first use
+_gemini_model = None
+_gemini_model_lock = threading.Lock()
+
+def get_gemini_model():
+    """Return the Gemini model, importing and configuring the SDK on first use"""
+    global _gemini_model
+    if _gemini_model is None:
+        with _gemini_model_lock:
+            if _gemini_model is None:
+                import google.generativeai as genai
+                if GEMINI_API_ENDPOINT:
+                    genai.configure(api_key=GOOGLE_API_KEY, transport='rest',
+                                    client_options={'api_endpoint': GEMINI_API_ENDPOINT})
+                else:
+                    genai.configure(api_key=GOOGLE_API_KEY)
+                _gemini_model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+    return _gemini_model
 
 # Nutrition database (simplified local approach instead of Open Food Facts API)
 NUTRITION_DATABASE = {
@@ -91,10 +223,37 @@ NUTRITION_KEYWORDS = [
     'beverage', 'drink', 'dairy', 'grain'
 ]
 
-# Cache for food terms to avoid repeated API calls
-FOOD_TERMS_CACHE = {}
 # Maximum cache size to prevent memory issues
-MAX_CACHE_SIZE = 1000
+MAX_CACHE_SIZE = int(os.getenv('FOOD_TERMS_CACHE_SIZE', 1000))
+# How long (seconds) a positive / negative food term lookup stays cached
+FOOD_TERMS_CACHE_TTL = int(os.getenv('FOOD_TERMS_CACHE_TTL', 7 * 24 * 3600))
+FOOD_TERMS_NEGATIVE_TTL = int(os.getenv('FOOD_TERMS_NEGATIVE_TTL', 6 * 3600))
+
+# LRU cache for food terms to avoid repeated API calls. Set CACHE_DB_PATH to
+# share it between gunicorn workers through an on-disk SQLite store.
+FOOD_TERMS_CACHE = create_cache(
+    'food_terms',
+    max_size=MAX_CACHE_SIZE,
+    ttl=FOOD_TERMS_CACHE_TTL,
+    negative_ttl=FOOD_TERMS_NEGATIVE_TTL
+)
+
+# Normalized Spoonacular results per food name, so repeat lookups don't spend
+# quota. Values are FoodRecord rows; the namespace changes with their layout.
+FOOD_INFO_CACHE = create_cache(
+    'food_info_rows',
+    max_size=int(os.getenv('FOOD_INFO_CACHE_SIZE', 5000)),
+    ttl=int(os.getenv('FOOD_INFO_CACHE_TTL', 30 * 24 * 3600)),
+    negative_ttl=int(os.getenv('FOOD_INFO_NEGATIVE_TTL', 24 * 3600))
+)
+FOOD_INFO_FLIGHTS = SingleFlight()
+
+# Top-k frequencies of foods that needed a remote lookup, persisted across
+# restarts and merged between workers; drives the background cache warmer
+QUERY_STATS = HeavyHitters(
+    capacity=int(os.getenv('QUERY_STATS_CAPACITY', 1000)),
+    path=os.getenv('QUERY_STATS_PATH', os.path.join(tempfile.gettempdir(), 'nutrition_bot_query_stats.json'))
+)
 
 # Common food terms to preload in cache to reduce API calls
 COMMON_FOOD_TERMS = [
@@ -105,85 +264,191 @@ COMMON_FOOD_TERMS = [
 
 def is_food_term_via_api(term):
     """Check if a term is a food item using the Spoonacular API"""
-    global FOOD_TERMS_CACHE
-    
     # Check cache first
-    if term in FOOD_TERMS_CACHE:
-        return FOOD_TERMS_CACHE[term]
-        
-    # Limit cache size to prevent memory issues
-    if len(FOOD_TERMS_CACHE) > MAX_CACHE_SIZE:
-        # Clear half of the cache when it gets too big
-        keys_to_remove = list(FOOD_TERMS_CACHE.keys())[:len(FOOD_TERMS_CACHE)//2]
-        for key in keys_to_remove:
-            del FOOD_TERMS_CACHE[key]
+    cached = FOOD_TERMS_CACHE.get(term)
+    if cached is not MISSING:
+        return cached
     
     if not SPOONACULAR_API_KEY:
         return False
         
     try:
         # Use Spoonacular's autocomplete feature as it's faster and uses less quota
-        autocomplete_url = "https://api.spoonacular.com/food/ingredients/autocomplete"
         params = {
-            "apiKey": SPOONACULAR_API_KEY,
             "query": term,
             "number": 1
         }
         
-        response = requests.get(autocomplete_url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        data = SPOONACULAR.get_json("/food/ingredients/autocomplete", "ingredients_autocomplete", params)
         
         # If we get a result, this is likely a food term
         is_food = len(data) > 0
         
-        # Cache the result
-        FOOD_TERMS_CACHE[term] = is_food
+        # Cache the result (negative results expire sooner)
+        FOOD_TERMS_CACHE.set(term, is_food)
         return is_food
         
     except Exception as e:
-        print(f"Error checking if term is food: {e}")
+        LOG.warning("Error checking if term is food: %s", e)
         return False
 
-def is_nutrition_related(question):
-    """Check if the question is related to nutrition, food, or diet"""
-    question_lower = question.lower()
+# Words that are never worth an API lookup on their own
+STOP_WORDS = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'is', 'are', 'was', 'were', 'been', 'be', 'as', 'this', 'that', 'these', 'those', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'shall', 'should', 'can', 'could', 'may', 'might', 'must', 'of'}
+
+# Minimum index score for a partial local match to be used instead of the API
+LOCAL_MATCH_MIN_SCORE = float(os.getenv('LOCAL_MATCH_MIN_SCORE', 0.5))
+# Substitute questions need a closer match before skipping Gemini
+ALTERNATIVE_MATCH_MIN_SCORE = float(os.getenv('ALTERNATIVE_MATCH_MIN_SCORE', 0.85))
+
+# Token/prefix/fuzzy index over the local database, built once at startup
+FOOD_INDEX = FoodIndex(NUTRITION_DATABASE, stop_words=STOP_WORDS)
+
+# Bulk food composition data, memory-mapped from the file written by
+# `python nutrition_dataset.py ingest`. Entries in NUTRITION_DATABASE take
+# precedence over it.
+NUTRITION_DATASET_PATH = os.getenv('NUTRITION_DATASET_PATH', os.path.join('data', 'nutrition.bin'))
+NUTRITION_DATASET = load_dataset(NUTRITION_DATASET_PATH, stop_words=STOP_WORDS)
+if NUTRITION_DATASET is not None:
+    # Partial and fuzzy matches need the name index; build it before the first request does
+    NUTRITION_DATASET.build_index_in_background()
+
+def wait_for_dataset_index():
+    """Finish building the dataset name index in this process.
+
+    Gunicorn calls this in the master under --preload, so every worker
+    inherits the finished index instead of building its own after the fork.
+    """
+    if NUTRITION_DATASET is not None:
+        NUTRITION_DATASET.index
+
+# Shared pool so lookups don't pay for thread start-up on every request
+_food_term_executor = ThreadPoolExecutor(
+    max_workers=FOOD_TERM_LOOKUP_WORKERS,
+    thread_name_prefix='food-term-lookup'
+)
+
+# Words that usually come right before a food ("eating oats", "a bowl of rice")
+FOOD_CONTEXT_WORDS = {'eat', 'eating', 'ate', 'eaten', 'drink', 'drinking', 'of', 'in', 'with', 'about',
+                      'some', 'more', 'less', 'like', 'add', 'adding', 'cook', 'cooking'}
+
+def collect_candidate_terms(words):
+    """Collect the unique unigrams and bigrams of a question worth checking as food terms.
+
+    Only a few are probed within the deadline of a long question, so the
+    likeliest foods come first: terms right after a word like "eat" or
+    "of", then bigrams without stop words, then the rest in question order.
+    """
+    candidates = []
+    seen = set()
     
-    # First check against our basic nutrition keywords
-    if any(keyword in question_lower for keyword in NUTRITION_KEYWORDS):
-        return True
+    # Only check words with 3+ characters to avoid checking common words
+    for i, word in enumerate(words):
+        if len(word) >= 3 and word not in STOP_WORDS and word not in seen:
+            seen.add(word)
+            candidates.append((i, word))
+    
+    # Then 2-word combinations, skipping pairs made only of stop words
+    for i in range(len(words) - 1):
+        if words[i] not in STOP_WORDS or words[i+1] not in STOP_WORDS:
+            two_word_term = words[i] + " " + words[i+1]
+            if two_word_term not in seen:
+                seen.add(two_word_term)
+                candidates.append((i, two_word_term))
     
-    # If not found in basic keywords, check individual words against API
-    words = question_lower.split()
-    # Filter out common short words and stop words
-    stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'with', 'by', 'is', 'are', 'was', 'were', 'been', 'be', 'as', 'this', 'that', 'these', 'those', 'have', 'has', 'had', 'do', 'does', 'did', 'will', 'would', 'shall', 'should', 'can', 'could', 'may', 'might', 'must', 'of'}
+    def priority(candidate):
+        i, term = candidate
+        if i > 0 and words[i - 1] in FOOD_CONTEXT_WORDS:
+            return 0
+        if ' ' in term and not any(word in STOP_WORDS for word in term.split()):
+            return 1
+        return 2
     
-    for word in words:
-        # Only check words with 3+ characters to avoid checking common words
-        if len(word) >= 3 and word not in stop_words and is_food_term_via_api(word):
+    return [term for _, term in sorted(candidates, key=priority)]
+
+def contains_food_term(terms, deadline=None):
+    """Check whether any of the terms is a food, resolving cache misses concurrently.
+
+    At most FOOD_TERM_PROBES_PER_REQUEST lookups are in flight at a time.
+    Returns as soon as one term resolves true; lookups not yet finished are
+    cancelled. Returns None, meaning unknown, if terms are still unresolved
+    once ``deadline`` seconds have passed.
+    """
+    if deadline is None:
+        deadline = FOOD_TERM_LOOKUP_DEADLINE
+    
+    # Answer from the cache where possible before touching the network
+    misses = []
+    for term in terms:
+        cached = FOOD_TERMS_CACHE.get(term)
+        if cached is MISSING:
+            misses.append(term)
+        elif cached:
             return True
     
-    # If longer than one word, try checking 2-word combinations for food items
-    if len(words) > 1:
-        for i in range(len(words) - 1):
-            if words[i] not in stop_words or words[i+1] not in stop_words:
-                two_word_term = words[i] + " " + words[i+1]
-                if is_food_term_via_api(two_word_term):
-                    return True
+    if not misses or not SPOONACULAR_API_KEY:
+        return False
+    
+    # Probing is the first thing given up when the upstream budget runs low
+    if QUOTA.stage('spoonacular') != STAGE_NORMAL:
+        tracing.count('food_term_probes_skipped', len(misses))
+        return False
+    
+    give_up_at = time.monotonic() + deadline
+    queued = misses[::-1]
+    pending = set()
+    try:
+        while queued or pending:
+            while queued and len(pending) < FOOD_TERM_PROBES_PER_REQUEST:
+                tracing.count('food_term_probes')
+                pending.add(tracing.submit(_food_term_executor, is_food_term_via_api, queued.pop()))
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                LOG.warning("Food term lookup deadline reached with %d lookups pending",
+                            len(pending) + len(queued))
+                tracing.count('food_term_deadline_reached')
+                return None
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if any(future.result() for future in done):
+                return True
+        return False
+    finally:
+        for future in pending:
+            future.cancel()
+
+GREETING_KEYWORDS = [
+    'hi', 'hello', 'hey', 'greetings', 'howdy', 'hola', 'namaste', 
+    'good morning', 'good afternoon', 'good evening', 'good day',
+    'what\'s up', 'sup', 'yo', 'hiya', 'hi there', 'hello there',
+    'morning', 'evening', 'afternoon', 'welcome', 'bonjour', 'ciao'
+]
+
+# Words that mark a request for the nutrition facts of a specific food
+FOOD_QUERY_KEYWORDS = ['nutrition', 'calories', 'nutrient', 'nutritional', 'facts', 'info', 'information']
+
+# Greeting, nutrition keyword and food query detection in one compiled pass
+INTENT_CLASSIFIER = IntentClassifier(GREETING_KEYWORDS, NUTRITION_KEYWORDS, FOOD_QUERY_KEYWORDS)
+
+def classify_message(message):
+    """Return the MessageIntent (greeting, nutrition keywords, food query) of a message"""
+    return INTENT_CLASSIFIER.classify(message)
+
+def is_nutrition_related(question, intent=None):
+    """Check if the question is related to nutrition, food, or diet"""
+    if intent is None:
+        intent = classify_message(question)
+    
+    # First check against our basic nutrition keywords
+    if intent.nutrition_keywords:
+        return True
     
-    return False
+    # If not found in basic keywords, check words and 2-word combinations against API.
+    # When that runs out of time the question may well be about food: leave
+    # it to Gemini rather than turn it away
+    return contains_food_term(collect_candidate_terms(intent.words)) is not False
 
 def is_greeting(message):
     """Check if the message is a greeting"""
-    greeting_keywords = [
-        'hi', 'hello', 'hey', 'greetings', 'howdy', 'hola', 'namaste', 
-        'good morning', 'good afternoon', 'good evening', 'good day',
-        'what\'s up', 'sup', 'yo', 'hiya', 'hi there', 'hello there',
-        'morning', 'evening', 'afternoon', 'welcome', 'bonjour', 'ciao'
-    ]
-    
-    message_lower = message.lower()
-    return any(greeting in message_lower.split() or greeting == message_lower for greeting in greeting_keywords)
+    return classify_message(message).is_greeting
 
 def get_welcome_message():
     """Generate a welcome message with suggested questions"""
@@ -202,6 +467,11 @@ def get_welcome_message():
 
 def extract_food_name(query):
     """Extract potential food name from a query"""
+    # Templated questions name the food exactly ("calories in 2 eggs for breakfast")
+    parsed = QUERY_PARSER.parse(query)
+    if parsed is not None:
+        return parsed.foods[0].name
+    
     # Check patterns like "calories in X" or "nutrition of X"
     query_lower = query.lower()
     words = query_lower.split()
@@ -221,244 +491,407 @@ def extract_food_name(query):
     
     return None
 
+def normalize_food_name(food_name):
+    """Normalize a food name for use as a cache key"""
+    return ' '.join(food_name.lower().split())
+
+# "sequential" tries ingredient, product and recipe search one after another
+# and stops at the first hit, spending the least quota. "parallel" launches
+# the three searches at once and only fetches details for the highest
+# priority hit, so worst-case latency is the slowest search instead of the sum.
+SPOONACULAR_SEARCH_MODE = os.getenv('SPOONACULAR_SEARCH_MODE', 'sequential')
+
+_search_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('SPOONACULAR_SEARCH_WORKERS', 12)),
+    thread_name_prefix='spoonacular-search'
+)
+
+def _search_ingredient(food_name):
+    """Return the id of the best matching ingredient, or None"""
+    params = {
+        "query": food_name,
+        "number": 1,
+        "sort": "calories",
+        "sortDirection": "desc"
+    }
+    
+    search_data = SPOONACULAR.get_json("/food/ingredients/search", "ingredients_search", params)
+    
+    if search_data.get("results") and len(search_data["results"]) > 0:
+        return search_data["results"][0]["id"]
+    return None
+
+def _ingredient_info(food_id):
+    """Get nutrition information for an ingredient"""
+    info_params = {
+        "amount": 100,
+        "unit": "grams"
+    }
+    
+    food_data = SPOONACULAR.get_json(
+        f"/food/ingredients/{food_id}/information", "ingredient_information", info_params
+    )
+    
+    # Format the data to match our structure
+    record = FoodRecord(
+        name=food_data.get("name", "").capitalize(),
+        description=f"Information about {food_data.get('name', '').capitalize()}."
+    )
+    
+    return record.add_nutrients((food_data.get("nutrition") or {}).get("nutrients"))
+
+def _search_product(food_name):
+    """Return the id of the best matching packaged food product, or None"""
+    product_params = {
+        "query": food_name,
+        "number": 1
+    }
+    
+    product_data = SPOONACULAR.get_json("/food/products/search", "products_search", product_params)
+    
+    if product_data.get("products") and len(product_data["products"]) > 0:
+        return product_data["products"][0]["id"]
+    return None
+
+def _product_info(product_id):
+    """Get detailed product information"""
+    product_info = SPOONACULAR.get_json(f"/food/products/{product_id}", "product_information")
+    
+    # Format product data
+    record = FoodRecord(
+        name=product_info.get("title", "").capitalize(),
+        brand=product_info.get("brand", ""),
+        description=product_info.get("description", f"Information about {product_info.get('title', '').capitalize()}.")
+    )
+    
+    return record.add_nutrients((product_info.get("nutrition") or {}).get("nutrients"))
+
+def _search_recipe(food_name):
+    """Return the best matching recipe (search results already include nutrition), or None"""
+    recipe_params = {
+        "query": food_name,
+        "number": 1,
+        "addNutrition": True
+    }
+    
+    recipe_data = SPOONACULAR.get_json("/recipes/complexSearch", "recipes_search", recipe_params)
+    
+    if recipe_data.get("results") and len(recipe_data["results"]) > 0:
+        return recipe_data["results"][0]
+    return None
+
+def _recipe_info(recipe):
+    """Format a recipe search result, which already carries its nutrition"""
+    # Format recipe data
+    record = FoodRecord(
+        name=recipe.get("title", "").capitalize(),
+        description=f"Recipe information for {recipe.get('title', '').capitalize()}."
+    )
+    
+    return record.add_nutrients((recipe.get("nutrition") or {}).get("nutrients"))
+
+# Search tiers in priority order: (search, details) where search returns a
+# hit (or None) and details turns that hit into a FoodRecord
+FOOD_SEARCH_TIERS = [
+    (_search_ingredient, _ingredient_info),
+    (_search_product, _product_info),
+    (_search_recipe, _recipe_info)
+]
+
+def _fetch_food_info_sequential(food_name):
+    """Try each search tier in turn, stopping at the first hit"""
+    for search, details in FOOD_SEARCH_TIERS:
+        hit = search(food_name)
+        if hit is not None:
+            return details(hit)
+    return None
+
+def _fetch_food_info_speculative(food_name):
+    """Run every tier's search concurrently, then fetch details for the best hit"""
+    futures = [tracing.submit(_search_executor, search, food_name) for search, _ in FOOD_SEARCH_TIERS]
+    try:
+        # Wait in priority order so a lower tier can never win over a higher one
+        for future, (_, details) in zip(futures, FOOD_SEARCH_TIERS):
+            hit = future.result()
+            if hit is not None:
+                return details(hit)
+        return None
+    finally:
+        for future in futures:
+            future.cancel()
+
+def _fetch_food_info_from_api(food_name):
+    """Run the Spoonacular ingredient/product/recipe lookup chain; errors propagate"""
+    if SPOONACULAR_SEARCH_MODE == 'parallel':
+        return _fetch_food_info_speculative(food_name)
+    return _fetch_food_info_sequential(food_name)
+
+def _fetch_and_cache_food_info(cache_key, food_name):
+    record = _fetch_food_info_from_api(food_name)
+    # Failed lookups raise and are never cached; "not found" is cached briefly
+    FOOD_INFO_CACHE.set(cache_key, record.to_row() if record else None)
+    return record.as_food_info() if record else None
+
 def get_food_info_from_api(food_name):
     """Get food info from Spoonacular API"""
     if not SPOONACULAR_API_KEY:
         return None
+    
+    cache_key = normalize_food_name(food_name)
+    cached = FOOD_INFO_CACHE.get(cache_key)
+    if cached is not MISSING:
+        return FoodRecord.from_row(cached).as_food_info() if cached else None
+    
+    if QUOTA.stage('spoonacular') == STAGE_LOCAL_ONLY:
+        return None
         
     try:
-        # First try the ingredients search endpoint
-        search_url = f"https://api.spoonacular.com/food/ingredients/search"
-        params = {
-            "apiKey": SPOONACULAR_API_KEY,
-            "query": food_name,
-            "number": 1,
-            "sort": "calories",
-            "sortDirection": "desc"
-        }
-        
-        response = requests.get(search_url, params=params)
-        response.raise_for_status()
-        search_data = response.json()
-        
-        if search_data.get("results") and len(search_data["results"]) > 0:
-            food_id = search_data["results"][0]["id"]
-            
-            # Get nutrition information for ingredient
-            info_url = f"https://api.spoonacular.com/food/ingredients/{food_id}/information"
-            info_params = {
-                "apiKey": SPOONACULAR_API_KEY,
-                "amount": 100,
-                "unit": "grams"
-            }
-            
-            info_response = requests.get(info_url, params=info_params)
-            info_response.raise_for_status()
-            food_data = info_response.json()
-            
-            # Format the data to match our structure
-            food_info = {
-                "name": food_data.get("name", "").capitalize(),
-                "description": f"Information about {food_data.get('name', '').capitalize()}."
-            }
-            
-            # Extract nutrients
-            if "nutrition" in food_data and "nutrients" in food_data["nutrition"]:
-                for nutrient in food_data["nutrition"]["nutrients"]:
-                    name = nutrient.get("name", "").lower()
-                    amount = nutrient.get("amount", 0)
-                    
-                    if "calories" in name or "energy" in name:
-                        food_info["calories"] = amount
-                    elif "fat" == name:
-                        food_info["fat"] = amount
-                    elif "saturated" in name:
-                        food_info["saturated_fat"] = amount
-                    elif "carbohydrates" in name:
-                        food_info["carbs"] = amount
-                    elif "sugar" in name:
-                        food_info["sugars"] = amount
-                    elif "protein" in name:
-                        food_info["protein"] = amount
-                    elif "fiber" in name:
-                        food_info["fiber"] = amount
-                    elif "sodium" in name:
-                        food_info["sodium"] = amount
-                    elif "calcium" in name:
-                        food_info["calcium"] = amount
-                    elif "magnesium" in name:
-                        food_info["magnesium"] = amount
-            
-            return food_info
-        
-        # If ingredient search fails, try the food products search as a fallback
-        products_url = "https://api.spoonacular.com/food/products/search"
-        product_params = {
-            "apiKey": SPOONACULAR_API_KEY,
-            "query": food_name,
-            "number": 1
-        }
-        
-        product_response = requests.get(products_url, params=product_params)
-        product_response.raise_for_status()
-        product_data = product_response.json()
-        
-        if product_data.get("products") and len(product_data["products"]) > 0:
-            product_id = product_data["products"][0]["id"]
-            
-            # Get detailed product information
-            product_info_url = f"https://api.spoonacular.com/food/products/{product_id}"
-            product_info_params = {
-                "apiKey": SPOONACULAR_API_KEY
-            }
-            
-            product_info_response = requests.get(product_info_url, params=product_info_params)
-            product_info_response.raise_for_status()
-            product_info = product_info_response.json()
-            
-            # Format product data
-            food_info = {
-                "name": product_info.get("title", "").capitalize(),
-                "brand": product_info.get("brand", ""),
-                "description": product_info.get("description", f"Information about {product_info.get('title', '').capitalize()}.")
-            }
-            
-            # Extract nutrients if available
-            if "nutrition" in product_info and "nutrients" in product_info["nutrition"]:
-                for nutrient in product_info["nutrition"]["nutrients"]:
-                    name = nutrient.get("name", "").lower()
-                    amount = nutrient.get("amount", 0)
-                    
-                    if "calories" in name or "energy" in name:
-                        food_info["calories"] = amount
-                    elif "fat" == name:
-                        food_info["fat"] = amount
-                    elif "saturated" in name:
-                        food_info["saturated_fat"] = amount
-                    elif "carbohydrates" in name:
-                        food_info["carbs"] = amount
-                    elif "sugar" in name:
-                        food_info["sugars"] = amount
-                    elif "protein" in name:
-                        food_info["protein"] = amount
-                    elif "fiber" in name:
-                        food_info["fiber"] = amount
-                    elif "sodium" in name:
-                        food_info["sodium"] = amount
-                    elif "calcium" in name:
-                        food_info["calcium"] = amount
-                    elif "magnesium" in name:
-                        food_info["magnesium"] = amount
-            
-            return food_info
-            
-        # If all searches fail, try the recipe search as last resort
-        recipe_url = "https://api.spoonacular.com/recipes/complexSearch"
-        recipe_params = {
-            "apiKey": SPOONACULAR_API_KEY,
-            "query": food_name,
-            "number": 1,
-            "addNutrition": True
-        }
-        
-        recipe_response = requests.get(recipe_url, params=recipe_params)
-        recipe_response.raise_for_status()
-        recipe_data = recipe_response.json()
-        
-        if recipe_data.get("results") and len(recipe_data["results"]) > 0:
-            recipe = recipe_data["results"][0]
-            
-            # Format recipe data
-            food_info = {
-                "name": recipe.get("title", "").capitalize(),
-                "description": f"Recipe information for {recipe.get('title', '').capitalize()}."
-            }
-            
-            # Extract nutrients if available
-            if "nutrition" in recipe and "nutrients" in recipe["nutrition"]:
-                for nutrient in recipe["nutrition"]["nutrients"]:
-                    name = nutrient.get("name", "").lower()
-                    amount = nutrient.get("amount", 0)
-                    
-                    if "calories" in name or "energy" in name:
-                        food_info["calories"] = amount
-                    elif "fat" == name:
-                        food_info["fat"] = amount
-                    elif "saturated" in name:
-                        food_info["saturated_fat"] = amount
-                    elif "carbohydrates" in name:
-                        food_info["carbs"] = amount
-                    elif "sugar" in name:
-                        food_info["sugars"] = amount
-                    elif "protein" in name:
-                        food_info["protein"] = amount
-                    elif "fiber" in name:
-                        food_info["fiber"] = amount
-                    elif "sodium" in name:
-                        food_info["sodium"] = amount
-                    elif "calcium" in name:
-                        food_info["calcium"] = amount
-                    elif "magnesium" in name:
-                        food_info["magnesium"] = amount
-            
-            return food_info
-        
-        return None
+        # Concurrent requests for the same uncached food share one upstream fetch
+        return FOOD_INFO_FLIGHTS.do(cache_key, _fetch_and_cache_food_info, cache_key, food_name)
     except Exception as e:
-        print(f"Error getting food info from API: {e}")
+        LOG.warning("Error getting food info from API: %s", e)
         return None
 
-def get_food_info(food_name):
-    """Get food info from our local database or API"""
-    food_name_lower = food_name.lower()
-    
+def search_local_foods(food_name, limit=5):
+    """Return ranked local database and dataset candidates for a food name"""
+    candidates = [
+        {'key': key, 'name': NUTRITION_DATABASE[key].get('name'), 'score': score}
+        for key, score in FOOD_INDEX.search(food_name, limit=limit)
+    ]
+    if NUTRITION_DATASET is not None:
+        seen = {candidate['key'] for candidate in candidates}
+        for key, score in NUTRITION_DATASET.search(food_name, limit=limit):
+            if key not in seen:
+                row = NUTRITION_DATASET.find(key)
+                candidates.append({'key': key, 'name': NUTRITION_DATASET.record(row)['name'], 'score': score})
+    # Stable sort keeps curated entries ahead of dataset entries on equal scores
+    candidates.sort(key=lambda candidate: -candidate['score'])
+    return candidates[:limit]
+
+def find_local_food(food_name_lower):
+    """Look a food up in the local database and the bulk dataset, without the API"""
     # Try exact match in local database
     if food_name_lower in NUTRITION_DATABASE:
         return NUTRITION_DATABASE[food_name_lower]
     
-    # Try partial match in local database
-    for key in NUTRITION_DATABASE:
-        if food_name_lower in key or key in food_name_lower:
-            return NUTRITION_DATABASE[key]
+    if NUTRITION_DATASET is not None:
+        food_info = NUTRITION_DATASET.lookup(food_name_lower)
+        if food_info:
+            return food_info
+    
+    # Try the best ranked partial/fuzzy match across both sources
+    matches = FOOD_INDEX.search(food_name_lower, limit=1)
+    best = ('curated', matches[0]) if matches else None
+    if NUTRITION_DATASET is not None:
+        matches = NUTRITION_DATASET.search(food_name_lower, limit=1)
+        if matches and (best is None or matches[0][1] > best[1][1]):
+            best = ('dataset', matches[0])
+    
+    if best is None or best[1][1] < LOCAL_MATCH_MIN_SCORE:
+        return None
+    source, (key, _) = best
+    if source == 'curated':
+        return NUTRITION_DATABASE[key]
+    return NUTRITION_DATASET.lookup(key)
+
+def get_food_info(food_name):
+    """Get food info from our local database or API"""
+    food_info = find_local_food(food_name.lower())
+    if food_info:
+        return food_info
     
     # If not found in local database, try the API
+    QUERY_STATS.record(normalize_food_name(food_name))
     api_result = get_food_info_from_api(food_name)
     if api_result:
         return api_result
     
     return None
 
-def format_nutrition_facts(food_info):
-    """Format nutrition facts into a readable HTML format"""
+_local_nutrient_table = None
+_local_nutrient_rows = None
+_local_nutrient_table_lock = threading.Lock()
+
+def local_nutrient_table():
+    """Return (food keys, nutrient matrix) for the local database plus the bulk dataset.
+
+    Built on first use and kept for the life of the process.
+    """
+    global _local_nutrient_table, _local_nutrient_rows
+    if _local_nutrient_table is None:
+        with _local_nutrient_table_lock:
+            if _local_nutrient_table is None:
+                keys = list(NUTRITION_DATABASE)
+                matrix = nutrient_vectors.to_matrix([NUTRITION_DATABASE[key] for key in keys])
+                if NUTRITION_DATASET is not None:
+                    # Curated entries take precedence over dataset rows with the same key
+                    rows = [row for row in range(len(NUTRITION_DATASET))
+                            if NUTRITION_DATASET.key(row) not in NUTRITION_DATABASE]
+                    keys.extend(NUTRITION_DATASET.key(row) for row in rows)
+                    matrix = np.vstack([matrix, nutrient_vectors.dataset_matrix(NUTRITION_DATASET)[rows]])
+                _local_nutrient_rows = {key: row for row, key in enumerate(keys)}
+                _local_nutrient_table = (keys, matrix)
+    return _local_nutrient_table
+
+def local_nutrient_row(key):
+    """Return the row of a key in the local nutrient table, or None"""
+    local_nutrient_table()
+    return _local_nutrient_rows.get(key)
+
+_food_neighbors = None
+
+def food_neighbors():
+    """Return the nearest-neighbour index over the local nutrient table, building it on first use"""
+    global _food_neighbors
+    if _food_neighbors is None:
+        keys, matrix = local_nutrient_table()
+        with _local_nutrient_table_lock:
+            if _food_neighbors is None:
+                _food_neighbors = nutrient_vectors.NutrientNeighbors(matrix)
+    return _food_neighbors
+
+def local_food_record(key):
+    """Return the food info dict for a key of the local nutrient table"""
+    if key in NUTRITION_DATABASE:
+        return NUTRITION_DATABASE[key]
+    return NUTRITION_DATASET.lookup(key)
+
+def find_alternatives(food_name, constraints=None, limit=5, food_info=None):
+    """Find the local foods most similar to food_name, optionally lower/higher in some nutrients.
+
+    Pass food_info when the food is already resolved. Returns (food_info,
+    alternatives) or None if the food itself is unknown.
+    """
+    if food_info is None:
+        food_info = get_food_info(food_name)
+    if not food_info:
+        return None
+    
+    # Don't suggest the food itself
+    keys, _ = local_nutrient_table()
+    base_keys = {normalize_food_name(food_info.get('name') or '')}
+    base_keys.update(key for key, record in NUTRITION_DATABASE.items() if record is food_info)
+    exclude = [row for row in map(local_nutrient_row, base_keys) if row is not None]
+    rows, distances = food_neighbors().query(
+        nutrient_vectors.to_vector(food_info), limit=limit, constraints=constraints, exclude=exclude
+    )
+    alternatives = []
+    for row, distance in zip(rows.tolist(), distances.tolist()):
+        record = local_food_record(keys[row])
+        alternatives.append({
+            'key': keys[row],
+            'name': record.get('name'),
+            'distance': round(distance, 4),
+            'nutriments': record
+        })
+    return food_info, alternatives
+
+def resolve_food_confidently(name):
+    """Return food info for an exact or high-scoring match of name, or None.
+
+    Substitute questions are only answered without Gemini when the food is
+    clearly known; a loose match ("banana bread" -> banana) is left to it.
+    """
+    candidates = dict.fromkeys((name, singular(name)))
+    for candidate in candidates:
+        if candidate in NUTRITION_DATABASE:
+            return NUTRITION_DATABASE[candidate]
+        if NUTRITION_DATASET is not None:
+            food_info = NUTRITION_DATASET.lookup(candidate)
+            if food_info:
+                return food_info
+    
+    matches = search_local_foods(name, limit=1)
+    if matches and matches[0]['score'] >= ALTERNATIVE_MATCH_MIN_SCORE:
+        return local_food_record(matches[0]['key'])
+    
+    QUERY_STATS.record(normalize_food_name(name))
+    food_info = get_food_info_from_api(name)
+    if food_info and normalize_food_name(food_info.get('name') or '') in {normalize_food_name(c) for c in candidates}:
+        return food_info
+    return None
+
+def format_alternatives(food_info, alternatives, constraints):
+    """Format alternative foods into a readable HTML list"""
+    name = food_info.get('name', 'this food')
+    if not alternatives:
+        return f"I couldn't find a matching alternative to <strong>{name}</strong> in my food database."
+    
+    # Constraints on a nutrient the food has no value for can't be checked
+    applied = {nutrient: direction for nutrient, direction in constraints.items()
+               if food_info.get(nutrient) is not None}
+    criteria = ', '.join(f"{direction} {nutrient.replace('_', ' ')}" for nutrient, direction in applied.items())
+    text = f"<strong>Alternatives to {name}</strong>" + (f" ({criteria} than {name})" if criteria else "") + "<br><br>"
+    shown = ['calories'] + [nutrient for nutrient in constraints if nutrient != 'calories']
+    # Each value is followed by the original food's, so the difference is visible
+    for alternative in alternatives:
+        record = alternative['nutriments']
+        facts = ', '.join(
+            f"{nutrient.replace('_', ' ').capitalize()}: {record[nutrient]}"
+            + (f" (vs {food_info[nutrient]})" if food_info.get(nutrient) is not None else "")
+            for nutrient in shown if record.get(nutrient) is not None
+        )
+        text += f"• <strong>{alternative['name']}</strong>" + (f" — {facts}" if facts else "") + "<br>"
+    unchecked = [nutrient.replace('_', ' ') for nutrient in constraints if nutrient not in applied]
+    if unchecked:
+        text += f"<br>{name} has no {' or '.join(unchecked)} data, so that wasn't compared."
+    text += "<br>Values are per 100g/ml."
+    return text
+
+NUTRIENT_LABELS = [
+    ('calories', 'Calories'),
+    ('fat', 'Fat'),
+    ('saturated_fat', 'Saturated Fat'),
+    ('carbs', 'Carbohydrates'),
+    ('sugars', 'Sugars'),
+    ('protein', 'Proteins'),
+    ('fiber', 'Fiber'),
+    ('sodium', 'Sodium'),
+    ('calcium', 'Calcium'),
+    ('magnesium', 'Magnesium')
+]
+
+def nutrient_unit(key):
+    return NUTRIENT_UNITS.get(key, "mg")
+
+def portion_value(value, grams):
+    """Scale a per-100g value to a portion of the given weight"""
+    if grams is None:
+        return value
+    return round(value * grams / 100, 1)
+
+def format_nutrition_facts(food_info, grams=None):
+    """Format nutrition facts into a readable HTML format, per 100g or for a portion of grams"""
     if not food_info:
         return "No nutrition information found for this food."
     
+    # Cards are cached on their full content, so an updated food renders anew
+    try:
+        return _render_nutrition_card(tuple(sorted(food_info.items())), grams)
+    except TypeError:
+        # Unhashable values (e.g. nested data from an upstream) can't be cached
+        return _build_nutrition_card(food_info, grams)
+
+@functools.lru_cache(maxsize=int(os.getenv('NUTRITION_CARD_CACHE_SIZE', 2048)))
+def _render_nutrition_card(items, grams):
+    return _build_nutrition_card(dict(items), grams)
+
+def _build_nutrition_card(food_info, grams):
     name = food_info.get('name', 'Unknown Food')
     brand = food_info.get('brand', '')
     brand_text = f" ({brand})" if brand else ""
+    portion = "per 100g/ml" if grams is None else f"per {grams:g}g"
     
     # Build nutrition facts string
     nutrition_facts = f"""
     <strong>{name}</strong>{brand_text}<br><br>
-    <strong>Nutrition Facts (per 100g/ml):</strong><br>
+    <strong>Nutrition Facts ({portion}):</strong><br>
     """
     
     # Add standard nutrition info
-    for key, label in [
-        ('calories', 'Calories'),
-        ('fat', 'Fat'),
-        ('saturated_fat', 'Saturated Fat'),
-        ('carbs', 'Carbohydrates'),
-        ('sugars', 'Sugars'),
-        ('protein', 'Proteins'),
-        ('fiber', 'Fiber'),
-        ('sodium', 'Sodium'),
-        ('calcium', 'Calcium'),
-        ('magnesium', 'Magnesium')
-    ]:
+    for key, label in NUTRIENT_LABELS:
         if key in food_info and food_info[key] is not None:
-            unit = "kcal" if key == 'calories' else "g" if key in ['fat', 'saturated_fat', 'carbs', 'sugars', 'protein', 'fiber'] else "mg"
-            nutrition_facts += f"{label}: {food_info[key]} {unit}<br>"
+            nutrition_facts += f"{label}: {portion_value(food_info[key], grams)} {nutrient_unit(key)}<br>"
     
     # Add description if available
     if 'description' in food_info and food_info['description']:
@@ -466,91 +899,606 @@ def format_nutrition_facts(food_info):
     
     return nutrition_facts
 
-def get_response(prompt):
-    """Get response from Gemini AI or local database"""
-    try:
-        if not GOOGLE_API_KEY:
-            return "API key not configured. Please set up your GOOGLE_API_KEY in the .env file."
-            
-        # Check if this is a greeting
-        if is_greeting(prompt):
-            return get_welcome_message()
-            
-        if not is_nutrition_related(prompt):
-            return "I apologize, but I can only answer questions related to nutrition and food. Please ask about calories, nutrients, dietary information, or other nutritional aspects of different foods."
-        
-        # Check if this is a direct food item or a food lookup query
-        prompt_lower = prompt.lower()
-        
-        # Define common food query patterns
-        food_keywords = ['nutrition', 'calories', 'nutrient', 'nutritional', 'facts', 'info', 'information']
-        is_food_query = any(keyword in prompt_lower for keyword in food_keywords)
-        
-        # Try to extract a food name
-        food_name = None
+def format_nutrient_values(food_info, nutrients, grams=None):
+    """Format selected nutrients of a food, per 100g or for a portion of grams"""
+    name = food_info.get('name', 'this food')
+    portion_text = "per 100g/ml" if grams is None else f"in {grams:g}g"
+    lines = [f"{label}: {portion_value(food_info[key], grams)} {nutrient_unit(key)}"
+             for key, label in NUTRIENT_LABELS if key in nutrients]
+    return f"<strong>{name}</strong> ({portion_text})<br>" + "<br>".join(lines)
+
+QUOTA_EXCEEDED_MESSAGE = ("I've reached my usage limit for detailed answers for now. "
+                          "I can still answer questions about foods I already know; please try again later.")
+API_KEY_MISSING_MESSAGE = "API key not configured. Please set up your GOOGLE_API_KEY in the .env file."
+OFF_TOPIC_MESSAGE = "I apologize, but I can only answer questions related to nutrition and food. Please ask about calories, nutrients, dietary information, or other nutritional aspects of different foods."
+GOODBYE_MESSAGE = "Goodbye! It was nice talking with you. I'll close this session now."
+
+# Words that refer back to the food discussed in the previous turn
+FOLLOW_UP_REFERENCE_PATTERN = re.compile(r"\b(?:it|its|it's|that|this|them|those|these|same)\b")
+
+# Questions about the previous food that don't look nutrition related on
+# their own ("is it good for diabetics?", "what about its fat?"). A pronoun
+# alone isn't enough: "write me a poem about that" stays off topic.
+_REFERENCE = r"(?:it|that|this|they|them|those|these)"
+FOLLOW_UP_QUESTION_PATTERN = re.compile(
+    r"^(?:and|so|but|ok|okay)?[\s,]*(?:"
+    rf"(?:is|are|was|were|isn't|aren't)\s+{_REFERENCE}\s+(?:\w+\s+)?"
+    r"(?:good|bad|healthy|unhealthy|ok|okay|safe|fine|better|worse|high|low|rich|fattening|nutritious)\b"
+    rf"|(?:can|could|should|shall)\s+(?:i|you|we|my\s+\w+)\s+(?:eat|have|drink|give|cook|freeze)\s+{_REFERENCE}\b"
+    rf"|(?:does|do|will|would)\s+{_REFERENCE}\s+(?:have|contain|help|cause|raise|lower|fit|count|spike)\b"
+    rf"|how\s+(?:much|many)\s+[a-z ]+?\s+(?:is|are|does|do|in)\s+(?:in\s+)?{_REFERENCE}\b"
+    r"|(?:what|how)\s+about\s+(?:its|their)\s+\w+"
+    rf"|(?:what\s+are\s+)?(?:the\s+)?(?:benefits?|risks?|side\s+effects?|downsides?)\s+of\s+{_REFERENCE}\b"
+    rf"|how\s+(?:do|should|can|long)\s+(?:i|you)\s+(?:cook|prepare|eat|store|keep)\s+{_REFERENCE}\b"
+    r")"
+)
+
+def answer_follow_up(prompt, last_food):
+    """Answer a portion or nutrient question about the previous food, or return None.
+
+    Handles e.g. "and how about 200g of it?" or "how much protein does it
+    have?" from the food info remembered in the session.
+    """
+    prompt_lower = prompt.lower()
+    if not FOLLOW_UP_REFERENCE_PATTERN.search(prompt_lower):
+        return None
+    
+    grams = None
+    portion = PORTION_PATTERN.search(prompt_lower)
+    if portion:
+        grams = float(portion.group(1)) * UNIT_GRAMS[portion.group(2)]
+    
+    words = re.findall(r"[a-z]+", prompt_lower)
+    nutrients, other_words = find_nutrients(words)
+    nutrients = [nutrient for nutrient in nutrients if last_food.get(nutrient) is not None]
+    other_words = [word for word in other_words if word not in UNIT_GRAMS]
+    
+    # "calories in that banana" is about a new food, not the previous one
+    for word in other_words:
+        if len(word) >= 3 and word not in STOP_WORDS and (
+                FOOD_TERMS_CACHE.get(word, False) is True or find_local_food(word) is not None):
+            return None
+    
+    if not nutrients:
+        if grams is None:
+            return None
+        return format_nutrition_facts(last_food, grams)
+    
+    return format_nutrient_values(last_food, nutrients, grams)
+
+# Grammar for templated questions ("protein in 150g chicken", "apple vs
+# orange"), answered from food data without Gemini
+QUERY_PARSER = QueryParser(NUTRIENT_ALIASES, UNIT_GRAMS)
+
+def find_parsed_food(name):
+    """Look up a food name from a parsed question, trying its singular form locally"""
+    for candidate in dict.fromkeys((name, singular(name))):
+        food_info = find_local_food(candidate)
+        if food_info:
+            return food_info
+    return get_food_info(name)
+
+def format_comparison(foods, grams, nutrients, direction=None):
+    """Format two foods side by side; say which has more or less of the first nutrient if asked"""
+    keys = [key for key, _ in NUTRIENT_LABELS
+            if (not nutrients or key in nutrients) and all(food.get(key) is not None for food in foods)]
+    if not keys:
+        return None
+    
+    names = [food.get('name', 'this food') for food in foods]
+    if grams[0] == grams[1]:
+        portion = "per 100g/ml" if grams[0] is None else f"per {grams[0]:g}g"
+        text = f"<strong>{names[0]} vs {names[1]}</strong> ({portion})<br>"
+    else:
+        portions = ["per 100g/ml" if amount is None else f"{amount:g}g" for amount in grams]
+        text = f"<strong>{names[0]} ({portions[0]}) vs {names[1]} ({portions[1]})</strong><br>"
+    for key, label in NUTRIENT_LABELS:
+        if key in keys:
+            values = [f"{portion_value(food[key], amount)} {nutrient_unit(key)}" for food, amount in zip(foods, grams)]
+            text += f"{label}: {values[0]} vs {values[1]}<br>"
+    
+    if direction is not None:
+        key = keys[0] if not nutrients or nutrients[0] not in keys else nutrients[0]
+        values = [portion_value(food[key], amount) for food, amount in zip(foods, grams)]
+        nutrient = key.replace('_', ' ')
+        if values[0] == values[1]:
+            text += f"<br>Both have the same amount of {nutrient}."
+        else:
+            winner = values.index(max(values) if direction == 'more' else min(values))
+            text += f"<br><strong>{names[winner]}</strong> has {direction} {nutrient}."
+    return text
+
+def answer_templated(prompt, session=None):
+    """Answer a templated nutrient, nutrition facts or comparison question, or return None.
+
+    Only questions that fit one of QUERY_PARSER's templates are answered,
+    from local or cached food data (Spoonacular on a miss); open-ended
+    questions return None and go to Gemini.
+    """
+    parsed = QUERY_PARSER.parse(prompt)
+    if parsed is None:
+        return None
+    
+    foods = []
+    for ref in parsed.foods:
+        food_info = find_parsed_food(ref.name)
+        if not food_info:
+            return None
+        foods.append(food_info)
+    grams = [ref.grams for ref in parsed.foods]
+    
+    if parsed.kind == 'compare':
+        answer = format_comparison(foods, grams, parsed.nutrients, parsed.direction)
+    elif parsed.kind == 'facts' or not parsed.nutrients:
+        answer = format_nutrition_facts(foods[0], grams[0])
+    else:
+        nutrients = [nutrient for nutrient in parsed.nutrients if foods[0].get(nutrient) is not None]
+        answer = format_nutrient_values(foods[0], nutrients, grams[0]) if nutrients else None
+    if answer is None:
+        return None
+    
+    # Without a weight per item, "2 eggs" can only be answered per 100g
+    if any(ref.count is not None and ref.grams is None for ref in parsed.foods):
+        answer += "<br><br>Values are per 100g/ml, not per item."
+    if session is not None and len(foods) == 1:
+        session['last_food'] = foods[0]
+    return answer
+
+def answer_locally(prompt, session=None):
+    """Answer greetings, off-topic questions and food lookups without Gemini.
+
+    Returns None when the question needs Gemini. When a session is given,
+    follow-ups about its last food are answered from it, and any food
+    resolved here becomes its new last food.
+    """
+    # Classify once: greeting, nutrition keywords and food query flags
+    with tracing.span('greeting'):
+        intent = classify_message(prompt)
+    
+    # Check if this is a greeting
+    if intent.is_greeting:
+        return get_welcome_message()
+    
+    # Follow-ups like "and 200g of it?" don't look nutrition related on their own
+    refers_back = False
+    if session is not None and session.get('last_food'):
+        with tracing.span('follow_up'):
+            follow_up = answer_follow_up(prompt, session['last_food'])
+        if follow_up is not None:
+            return follow_up
+        refers_back = FOLLOW_UP_QUESTION_PATTERN.search(prompt.lower().strip()) is not None
+    
+    # Substitute questions are answered from the local nutrient index
+    alternative_request = QUERY_PARSER.parse_alternatives(prompt)
+    if alternative_request:
+        with tracing.span('alternatives'):
+            food_name = alternative_request.food.name
+            constraints = alternative_request.constraints
+            food_info = resolve_food_confidently(food_name)
+            result = find_alternatives(food_name, constraints, food_info=food_info) if food_info else None
+        if result and session is not None:
+            session['last_food'] = result[0]
+        if result and result[1]:
+            with tracing.span('format'):
+                return format_alternatives(result[0], result[1], constraints)
+    
+    # Templated nutrient, facts and comparison questions don't need Gemini
+    with tracing.span('templated'):
+        templated = answer_templated(prompt, session)
+    if templated is not None:
+        return templated
+    
+    with tracing.span('classify'):
+        nutrition_related = is_nutrition_related(prompt, intent)
+    # "is it good for diabetics?" is on topic when "it" is the last food
+    if not nutrition_related and not refers_back:
+        return OFF_TOPIC_MESSAGE
+    
+    # Try to extract a food name
+    food_name = None
+    
+    # If it looks like a nutrition query, extract food name
+    if intent.is_food_query:
+        food_name = extract_food_name(prompt)
+    # If it's a short prompt (1-3 words), it might be a direct food name
+    elif len(intent.words) <= 3:
+        food_name = prompt.lower()
         
-        # If it looks like a nutrition query, extract food name
-        if is_food_query:
-            food_name = extract_food_name(prompt)
-        # If it's a short prompt (1-3 words), it might be a direct food name
-        elif len(prompt_lower.split()) <= 3:
-            food_name = prompt_lower
-            
-        # If we have a food name, try to get its info
-        if food_name:
+    # If we have a food name, try to get its info
+    if food_name:
+        with tracing.span('lookup'):
             food_info = get_food_info(food_name)
-            if food_info:
+        if food_info:
+            if session is not None:
+                session['last_food'] = food_info
+            with tracing.span('format'):
                 return format_nutrition_facts(food_info)
+    
+    return None
+
+def build_gemini_prompt(prompt):
+    """Wrap a user question in the nutrition expert instructions for Gemini"""
+    return (
+        f"As a nutrition expert specializing in food composition and dietary information, please answer this question: {prompt}. "
+        "IMPORTANT: Format your response with HTML tags for structure. "
+        "Use <br> for line breaks between paragraphs. "
+        "Use <strong>text</strong> for bold/headings and <em>text</em> for emphasis. "
+        "If you're providing nutrition facts, list them in a structured format with nutrient names and values clearly labeled. "
+        "For example: Calories: 100 kcal<br>Protein: 5g<br>Carbohydrates: 15g<br>Fat: 2g "
+        "Keep the total response concise and easy to scan."
+    )
+
+# Cache of Gemini answers keyed on the normalized question. The key includes a
+# hash of the prompt template and model, so editing build_gemini_prompt
+# invalidates every cached answer. Set ANSWER_CACHE_SIMILARITY (e.g. 0.9) to
+# also reuse answers to near-identical questions.
+_answer_similarity = os.getenv('ANSWER_CACHE_SIMILARITY')
+ANSWER_CACHE = SemanticAnswerCache(
+    create_cache(
+        'answers',
+        max_size=int(os.getenv('ANSWER_CACHE_SIZE', 2000)),
+        ttl=int(os.getenv('ANSWER_CACHE_TTL', 7 * 24 * 3600)),
+        negative_ttl=0
+    ),
+    version=template_version(GEMINI_MODEL_NAME, build_gemini_prompt('{question}')),
+    stop_words=STOP_WORDS,
+    similarity_threshold=float(_answer_similarity) if _answer_similarity else None
+)
+
+# Conversations keyed by the client's session id: recent turns within a
+# token budget, a compacted summary of older ones and the last food looked
+# up. Shared between workers through the SQLite backend when CACHE_DB_PATH
+# is set.
+SESSIONS = SessionStore(
+    create_cache(
+        'sessions',
+        max_size=int(os.getenv('SESSION_CACHE_SIZE', 5000)),
+        ttl=int(os.getenv('SESSION_TTL', 3600)),
+        negative_ttl=int(os.getenv('SESSION_TTL', 3600)),
+        # Always read the shared store, so workers never serve a stale session
+        local_copy=False
+    ),
+    token_budget=int(os.getenv('SESSION_HISTORY_TOKENS', 2000))
+)
+
+def has_history(session):
+    return bool(session and (session['history'] or session['summary']))
+
+def find_mentioned_food(prompt):
+    """Return the food info of a food named in the prompt from local or cached data, or None.
+
+    Never calls Spoonacular; two-word names are tried before single words.
+    """
+    words = re.findall(r"[a-z]+", prompt.lower())
+    terms = [' '.join(words[i:i + 2]) for i in range(len(words) - 1)] + words
+    for term in terms:
+        if len(term) < 3 or term in STOP_WORDS:
+            continue
+        for candidate in dict.fromkeys((term, singular(term))):
+            if candidate in NUTRITION_DATABASE:
+                return NUTRITION_DATABASE[candidate]
+            if NUTRITION_DATASET is not None:
+                food_info = NUTRITION_DATASET.lookup(candidate)
+                if food_info:
+                    return food_info
+            cached = FOOD_INFO_CACHE.get(normalize_food_name(candidate))
+            if cached is not MISSING and cached:
+                return FoodRecord.from_row(cached).as_food_info()
+    return None
+
+def resolve_response(prompt, session=None):
+    """Answer a prompt without calling Gemini if possible.
+
+    Returns (answer, None) when the answer is known locally or cached, or
+    (None, gemini_prompt) when Gemini has to be asked.
+    """
+    if not GOOGLE_API_KEY:
+        return API_KEY_MISSING_MESSAGE, None
+    
+    local_answer = answer_locally(prompt, session)
+    if local_answer is not None:
+        return local_answer, None
+    
+    # Questions answered by Gemini can be about another food; a later "its"
+    # must refer to that one, not to whatever was looked up before
+    if session is not None and not FOLLOW_UP_REFERENCE_PATTERN.search(prompt.lower()):
+        session['last_food'] = find_mentioned_food(prompt)
+    
+    # Near-duplicate questions are answered from the cache without Gemini,
+    # unless earlier turns may change what the question means
+    if not has_history(session):
+        with tracing.span('answer_cache'):
+            cached_answer = ANSWER_CACHE.get(prompt)
+        if cached_answer is not None:
+            return cached_answer, None
+    
+    return None, build_gemini_prompt(prompt)
+
+def gemini_generate_function(session):
+    """Return the Gemini call for a prompt, continuing the session's chat if it has history"""
+    model = get_gemini_model()
+    if has_history(session):
+        return model.start_chat(history=SESSIONS.gemini_history(session)).send_message
+    return model.generate_content
+
+def record_gemini_usage(gemini_prompt, session, response, text):
+    """Charge a Gemini call to the quota, from its usage metadata or an estimate"""
+    usage = getattr(response, 'usage_metadata', None)
+    tokens = getattr(usage, 'total_token_count', 0) if usage is not None else 0
+    if not tokens:
+        tokens = estimate_tokens(gemini_prompt) + estimate_tokens(text)
+        if has_history(session):
+            tokens += sum(estimate_tokens(part) for _, part in session['history'])
+            tokens += estimate_tokens(session['summary'])
+    QUOTA.spend('gemini', tokens)
+
+def finish_response(prompt, answer, session, generated=False):
+    """Cache a generated answer and record the turn in the session"""
+    if generated and not has_history(session):
+        ANSWER_CACHE.set(prompt, answer)
+    if session is not None:
+        SESSIONS.record_turn(session, prompt, answer)
+    return answer
+
+def get_response(prompt, session=None):
+    """Get response from Gemini AI or local database"""
+    try:
+        answer, gemini_prompt = resolve_response(prompt, session)
+        if answer is not None:
+            return finish_response(prompt, answer, session)
         
         # If not a specific food lookup or no match found, use Gemini
-        enhanced_prompt = (
-            f"As a nutrition expert specializing in food composition and dietary information, please answer this question: {prompt}. "
-            "IMPORTANT: Format your response with HTML tags for structure. "
-            "Use <br> for line breaks between paragraphs. "
-            "Use <strong>text</strong> for bold/headings and <em>text</em> for emphasis. "
-            "If you're providing nutrition facts, list them in a structured format with nutrient names and values clearly labeled. "
-            "For example: Calories: 100 kcal<br>Protein: 5g<br>Carbohydrates: 15g<br>Fat: 2g "
-            "Keep the total response concise and easy to scan."
-        )
-        
-        response = model.generate_content(enhanced_prompt)
-        return response.text
+        QUOTA.check('gemini')
+        with tracing.span('gemini'):
+            response = gemini_generate_function(session)(gemini_prompt)
+        record_gemini_usage(gemini_prompt, session, response, response.text)
+        return finish_response(prompt, response.text, session, generated=True)
+    except QuotaExceeded:
+        raise
     except Exception as e:
-        print(f"Error getting response from Gemini: {e}")
+        LOG.error("Error getting response from Gemini: %s", e)
         return f"An error occurred: {str(e)}"
 
+def stream_response(prompt, session=None):
+    """Yield the response in chunks as Gemini generates it.
+
+    Local answers are yielded in one piece; errors are raised to the caller
+    so the streaming endpoint can report them as an error event.
+    """
+    answer, gemini_prompt = resolve_response(prompt, session)
+    if answer is not None:
+        finish_response(prompt, answer, session)
+        yield answer
+        return
+    
+    QUOTA.check('gemini')
+    chunks = []
+    # Time spent by the client reading chunks is included in this stage
+    with tracing.span('gemini'):
+        response = gemini_generate_function(session)(gemini_prompt, stream=True)
+        for chunk in response:
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield chunk.text
+    record_gemini_usage(gemini_prompt, session, response, ''.join(chunks))
+    # Only complete answers are cached and recorded
+    finish_response(prompt, ''.join(chunks), session, generated=True)
+
 def preload_common_food_terms():
     """Preload common food terms into the cache to reduce API calls during use"""
     print("Preloading common food terms into cache...")
     for term in COMMON_FOOD_TERMS:
-        FOOD_TERMS_CACHE[term] = True
+        FOOD_TERMS_CACHE.set(term, True)
     print(f"Preloaded {len(COMMON_FOOD_TERMS)} common food terms")
 
-# Create Flask app
-app = Flask(__name__, static_folder='static')
+def is_food_info_warm(food_name):
+    """Check whether a food can be answered without calling Spoonacular"""
+    return normalize_food_name(food_name) in FOOD_INFO_CACHE or find_local_food(food_name.lower()) is not None
+
+# Background warming of the hottest foods. Serverless platforms freeze the
+# process between requests, so it is off by default on Vercel.
+CACHE_WARMER_ENABLED = os.getenv('CACHE_WARMER', '0' if os.getenv('VERCEL') else '1') == '1'
+def warm_food_info(food_name):
+    """Warm one food, unless the upstream budget is already being rationed"""
+    if QUOTA.stage('spoonacular') != STAGE_NORMAL:
+        return None
+    return get_food_info_from_api(food_name)
+
+# Maximum Spoonacular calls per warming run, across all workers on this host
+CACHE_WARMER_BUDGET = int(os.getenv('CACHE_WARMER_BUDGET', 50))
+# With the shared SQLite cache one warmer fills it for every worker. Without
+# it each worker has its own cache, so each warms itself on a share of the budget.
+CACHE_WARMER_SHARED = FOOD_INFO_CACHE.backend is not None
+
+CACHE_WARMER = CacheWarmer(
+    QUERY_STATS,
+    warm=warm_food_info,
+    is_warm=is_food_info_warm,
+    call_counter=lambda: SPOONACULAR.call_count(),
+    budget=CACHE_WARMER_BUDGET if CACHE_WARMER_SHARED
+    else max(1, CACHE_WARMER_BUDGET // int(os.getenv('WEB_CONCURRENCY', 1))),
+    interval=int(os.getenv('CACHE_WARMER_INTERVAL', 900)),
+    top_n=int(os.getenv('CACHE_WARMER_TOP_N', 100)),
+    lock_path=os.getenv('CACHE_WARMER_LOCK_PATH', os.path.join(tempfile.gettempdir(), 'nutrition_bot_cache_warmer.lock'))
+    if CACHE_WARMER_SHARED else None
+)
+
+def start_background_services():
+    """Preload caches; runs at import so it also happens under gunicorn and
+    Vercel, not only when run as a script"""
+    preload_common_food_terms()
+    for term in COMMON_FOOD_TERMS:
+        # Seed the statistics so the first warming run has candidates
+        QUERY_STATS.record(term, 0)
+    atexit.register(QUERY_STATS.persist)
+
+start_background_services()
+
+def start_cache_warmer():
+    """Start the cache warmer thread in this process, if enabled.
+
+    Not done at import: under gunicorn --preload the import runs in the
+    master, and its threads don't survive the fork into workers. Gunicorn
+    calls this from its post_worker_init hook; other servers start it on
+    the first request.
+    """
+    if CACHE_WARMER_ENABLED and SPOONACULAR_API_KEY:
+        CACHE_WARMER.start()
+
+# Endpoints that can trigger Spoonacular or Gemini calls
+RATE_LIMITED_ENDPOINTS = {'chat', 'chat_stream', 'food_info', 'food_info_batch', 'food_alternatives'}
+# "ip" (default) or "session": key chat buckets on the client's session id
+RATE_LIMIT_BY = os.getenv('RATE_LIMIT_BY', 'ip')
+
+# Number of reverse proxies in front of the app (Vercel's edge, nginx, a load
+# balancer). Each one appends the address it saw to X-Forwarded-For, and
+# ProxyFix takes the client address from the entry added by the outermost
+# trusted proxy, so every client gets its own bucket. Leave it at 0 when
+# clients connect directly, or they could pick their own address.
+TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', '1' if os.getenv('VERCEL') else '0'))
+if TRUSTED_PROXIES > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+
+def too_many_requests(message, retry_after):
+    """Build a 429 response; chat clients display ``response``"""
+    retry_after = max(1, int(retry_after + 0.999))
+    response = jsonify({'error': message, 'response': message, 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def client_ip_key():
+    # The forwarded client address when TRUSTED_PROXIES is set
+    return 'ip:' + (request.remote_addr or 'unknown')
+
+def rate_limit_key():
+    if RATE_LIMIT_BY == 'session':
+        data = request.get_json(silent=True)
+        session_id = data.get('session_id') if isinstance(data, dict) else None
+        if isinstance(session_id, str) and session_id:
+            return 'session:' + session_id
+    return client_ip_key()
+
+@app.before_request
+def before_request():
+    g.trace = tracing.start_trace(request.endpoint or 'unknown')
+    start_cache_warmer()
+    if request.endpoint in RATE_LIMITED_ENDPOINTS and request.method != 'OPTIONS':
+        allowed, retry_after = RATE_LIMITER.check(rate_limit_key())
+        if allowed and RATE_LIMIT_BY == 'session':
+            allowed, retry_after = IP_RATE_LIMITER.check(client_ip_key())
+        if not allowed:
+            tracing.count('rate_limited')
+            return too_many_requests("You're sending messages too quickly. Please wait a moment and try again.",
+                                     retry_after)
+
+# Compressed static files and API payloads, keyed by strong ETag and encoding
+COMPRESSED_BODIES = CompressedBodyCache(max_size=int(os.getenv('COMPRESSED_BODY_CACHE_SIZE', 256)))
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 500))
+
+@functools.lru_cache(maxsize=64)
+def _static_file_version(path, mtime):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+@app.url_defaults
+def add_static_version(endpoint, values):
+    """Add a content hash to static URLs so they can be cached for a year"""
+    if endpoint != 'static' or 'v' in values or 'filename' not in values:
+        return
+    path = os.path.join(app.static_folder, values['filename'])
+    try:
+        values['v'] = _static_file_version(path, os.path.getmtime(path))
+    except OSError:
+        pass
 
 # Enable CORS for all routes
 @app.after_request
 def after_request(response):
+    if request.endpoint == 'static' and request.args.get('v') and response.status_code in (200, 304):
+        # Versioned URLs change whenever the file does
+        response.cache_control.public = True
+        response.cache_control.max_age = 365 * 24 * 3600
+        response.cache_control.immutable = True
+        response.cache_control.no_cache = None
+    compress_response(response, request.headers.get('Accept-Encoding'),
+                      body_cache=COMPRESSED_BODIES, min_size=COMPRESSION_MIN_SIZE)
+    # Answer If-None-Match with 304 now that the final ETag is known
+    if response.get_etag()[0]:
+        response.make_conditional(request)
+    trace = g.get('trace')
+    if trace is not None:
+        # For streamed responses this is the time until streaming starts
+        tracing.finish_trace(trace, response.status_code)
+        if SERVER_TIMING:
+            response.headers['Server-Timing'] = trace.server_timing()
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     return response
 
-# Create directories if they don't exist
-os.makedirs('templates', exist_ok=True)
-os.makedirs('static/css', exist_ok=True)
-os.makedirs('static/js', exist_ok=True)
+@app.teardown_request
+def teardown_request(exc):
+    # Runs after a stream ends too; the request thread's next work must
+    # not add to this request's trace
+    tracing.clear_trace()
+
+_index_html = None
 
 @app.route('/')
 def index():
-    return render_template('chat.html')
+    # The page has no per-request content, so render it once
+    global _index_html
+    if _index_html is None or app.debug:
+        _index_html = render_template('chat.html')
+    response = Response(_index_html, mimetype='text/html')
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response
 
 @app.route('/api/test', methods=['GET'])
 def test():
     """Test endpoint to verify API is working"""
     return jsonify({'status': 'ok', 'message': 'API is working'})
 
+@app.route('/api/cache_stats', methods=['GET'])
+def cache_stats():
+    """Endpoint to report hit/miss/eviction counters for the caches"""
+    food_info_stats = FOOD_INFO_CACHE.info()
+    food_info_stats['coalesced'] = FOOD_INFO_FLIGHTS.coalesced
+    return jsonify({
+        'food_terms': FOOD_TERMS_CACHE.info(),
+        'food_info': food_info_stats,
+        'answers': ANSWER_CACHE.info(),
+        'sessions': SESSIONS.info(),
+        'warmer': CACHE_WARMER.info()
+    })
+
+@app.route('/api/upstream_stats', methods=['GET'])
+def upstream_stats():
+    """Endpoint to report Spoonacular latency histograms and circuit breaker state"""
+    return jsonify({
+        'spoonacular': SPOONACULAR.stats(),
+        'quota': QUOTA.info(),
+        'rate_limited': RATE_LIMITER.limited + IP_RATE_LIMITER.limited
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint: stage, request and Spoonacular latency histograms"""
+    upstream = SPOONACULAR.stats()
+    extra = [
+        ('nutrition_bot_upstream_seconds', {'upstream': 'spoonacular', 'endpoint': endpoint}, data)
+        for endpoint, data in upstream['endpoints'].items()
+    ]
+    body = tracing.METRICS.render(extra)
+    body += "# TYPE nutrition_bot_upstream_errors_total counter\n"
+    for endpoint, data in sorted(upstream['endpoints'].items()):
+        body += f'nutrition_bot_upstream_errors_total{{upstream="spoonacular",endpoint="{endpoint}"}} {data["errors"]}\n'
+    body += "# TYPE nutrition_bot_log_suppressed_total counter\n"
+    body += f"nutrition_bot_log_suppressed_total {LOG.rate_limit.suppressed + LOG.queue_handler.dropped}\n"
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/food_info', methods=['GET'])
 def food_info():
     """Endpoint to get food information from local database"""
@@ -558,60 +1506,296 @@ def food_info():
     if not food_name:
         return jsonify({'error': 'No food name provided'}), 400
     
+    limit = request.args.get('limit', type=int)
+    if limit is not None and not 1 <= limit <= 50:
+        return jsonify({'error': 'limit must be between 1 and 50'}), 400
+    
     food_data = get_food_info(food_name)
     if not food_data:
         return jsonify({'error': 'Food not found'}), 404
     
-    return jsonify({
+    result = {
         'product_name': food_data.get('name'),
         'brand': food_data.get('brand', ''),
-        'nutriments': food_data,
-        'formatted': format_nutrition_facts(food_data)
+        'nutriments': food_data
+    }
+    # Clients that render the card themselves can skip the HTML with formatted=0
+    if request.args.get('formatted', '1') != '0':
+        result['formatted'] = format_nutrition_facts(food_data)
+    # Optionally include the top-k local candidates for disambiguation
+    if limit is not None:
+        result['candidates'] = search_local_foods(food_name, limit)
+    
+    # Repeat lookups revalidate with If-None-Match and get a 304 without a body
+    response = jsonify(result)
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response
+
+# Upper bound on foods per batch request and on concurrent remote lookups
+MAX_BATCH_FOODS = int(os.getenv('MAX_BATCH_FOODS', 50))
+BATCH_LOOKUP_CONCURRENCY = int(os.getenv('BATCH_LOOKUP_CONCURRENCY', 8))
+
+def parse_batch_item(item):
+    """Normalize a batch entry ("apple" or {"name": ..., "grams": ...}) to (name, grams)"""
+    if isinstance(item, str):
+        name, grams = item, 100
+    elif isinstance(item, dict):
+        name, grams = item.get('name') or item.get('food_name'), item.get('grams', 100)
+    else:
+        raise ValueError('Each food must be a name or an object with a name')
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError('No food name provided')
+    if isinstance(grams, bool) or not isinstance(grams, (int, float)) or grams <= 0:
+        raise ValueError('grams must be a positive number')
+    return name.strip(), grams
+
+def resolve_foods(names):
+    """Resolve food names to food info: local hits first, remote misses concurrently.
+
+    Returns {name: food_info or None}; lookup errors are returned as exceptions.
+    """
+    results = {}
+    misses = []
+    for name in dict.fromkeys(names):
+        food_info = find_local_food(name.lower())
+        if food_info:
+            results[name] = food_info
+        else:
+            misses.append(name)
+    
+    if not misses:
+        return results
+    
+    with ThreadPoolExecutor(max_workers=min(BATCH_LOOKUP_CONCURRENCY, len(misses))) as pool:
+        futures = [tracing.submit(pool, get_food_info, name) for name in misses]
+    for name, future in zip(misses, futures):
+        error = future.exception()
+        results[name] = error if error is not None else future.result()
+    return results
+
+@app.route('/api/food_info/batch', methods=['POST'])
+def food_info_batch():
+    """Endpoint to look up several foods (with optional gram amounts) in one request.
+
+    Body: {"foods": ["apple", {"name": "brown rice", "grams": 150}, ...]}.
+    Returns per-item results (scaled to each amount) plus the summed totals;
+    items that fail are reported individually instead of failing the batch.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('foods'), list) or not data['foods']:
+        return jsonify({'error': 'Request must be JSON with a non-empty "foods" list'}), 400
+    if len(data['foods']) > MAX_BATCH_FOODS:
+        return jsonify({'error': f'At most {MAX_BATCH_FOODS} foods per request'}), 400
+    
+    parsed = []
+    for item in data['foods']:
+        try:
+            parsed.append(parse_batch_item(item))
+        except ValueError as e:
+            parsed.append(e)
+    
+    resolved = resolve_foods([entry[0] for entry in parsed if not isinstance(entry, Exception)])
+    
+    items = []
+    found_foods = []
+    found_grams = []
+    for item, entry in zip(data['foods'], parsed):
+        if isinstance(entry, Exception):
+            items.append({'query': item, 'found': False, 'error': str(entry)})
+            continue
+        name, grams = entry
+        food_data = resolved[name]
+        if isinstance(food_data, Exception):
+            items.append({'query': name, 'grams': grams, 'found': False, 'error': f'Lookup failed: {food_data}'})
+            continue
+        if not food_data:
+            items.append({'query': name, 'grams': grams, 'found': False, 'error': 'Food not found'})
+            continue
+        found_foods.append(food_data)
+        found_grams.append(grams)
+        items.append({
+            'query': name,
+            'grams': grams,
+            'found': True,
+            'product_name': food_data.get('name'),
+            'brand': food_data.get('brand', ''),
+            'nutriments': food_data
+        })
+    
+    # Scale every found item and sum the meal in single array operations
+    scaled = nutrient_vectors.scale(nutrient_vectors.to_matrix(found_foods), found_grams)
+    found_items = [item for item in items if item['found']]
+    for item, vector in zip(found_items, scaled):
+        item['scaled'] = nutrient_vectors.from_vector(vector)
+    
+    return jsonify({
+        'items': items,
+        'totals': nutrient_vectors.from_vector(nutrient_vectors.total(scaled)),
+        'found': sum(1 for item in items if item['found']),
+        'missing': sum(1 for item in items if not item['found'])
     })
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
-    print("Chat API endpoint called")
+@app.route('/api/foods/rank', methods=['GET'])
+def rank_foods():
+    """Endpoint to rank local foods by a nutrient or a ratio (e.g. protein per calorie).
+
+    Query parameters: nutrient, optional per, limit (default 10) and
+    order ("desc" or "asc").
+    """
+    nutrient = request.args.get('nutrient', '')
+    per = request.args.get('per') or None
+    limit = request.args.get('limit', 10, type=int)
+    order = request.args.get('order', 'desc')
+    for name in (nutrient, per):
+        if name is not None and name not in nutrient_vectors.NUTRIENT_INDEX:
+            return jsonify({'error': f'Unknown nutrient {name!r}; use one of {NUTRIENT_COLUMNS}'}), 400
+    if not 1 <= limit <= 100 or order not in ('asc', 'desc'):
+        return jsonify({'error': 'limit must be between 1 and 100 and order "asc" or "desc"'}), 400
+    
+    keys, matrix = local_nutrient_table()
+    rows, values = nutrient_vectors.rank(matrix, nutrient, per=per, limit=limit, descending=order == 'desc')
+    return jsonify({
+        'nutrient': nutrient,
+        'per': per,
+        'results': [
+            {'key': keys[row], 'value': round(float(value), 4)}
+            for row, value in zip(rows.tolist(), values.tolist())
+        ]
+    })
+
+@app.route('/api/foods/alternatives', methods=['GET'])
+def food_alternatives():
+    """Endpoint to find similar foods, optionally lower/higher in given nutrients.
+
+    Query parameters: food_name, limit (default 5), and repeatable lower /
+    higher nutrient names, e.g. ?food_name=banana&lower=sugars&higher=fiber.
+    """
+    food_name = request.args.get('food_name', '')
+    if not food_name:
+        return jsonify({'error': 'No food name provided'}), 400
+    limit = request.args.get('limit', 5, type=int)
+    if not 1 <= limit <= 50:
+        return jsonify({'error': 'limit must be between 1 and 50'}), 400
+    
+    constraints = {}
+    for direction in ('lower', 'higher'):
+        for nutrient in request.args.getlist(direction):
+            if nutrient not in nutrient_vectors.NUTRIENT_INDEX:
+                return jsonify({'error': f'Unknown nutrient {nutrient!r}; use one of {NUTRIENT_COLUMNS}'}), 400
+            constraints[nutrient] = direction
+    
+    result = find_alternatives(food_name, constraints, limit)
+    if result is None:
+        return jsonify({'error': 'Food not found'}), 404
+    base, alternatives = result
+    return jsonify({
+        'food': base.get('name'),
+        'constraints': constraints,
+        'alternatives': alternatives
+    })
+
+def get_chat_message():
+    """Validate a chat request, returning (message, None) or (None, error response)"""
     if not request.is_json:
-        print("Error: Request is not JSON")
-        return jsonify({'error': 'Request must be JSON'}), 400
+        LOG.info("Rejected chat request: not JSON")
+        return None, (jsonify({'error': 'Request must be JSON'}), 400)
         
     data = request.get_json()
-    if not data:
-        print("Error: Invalid JSON data")
-        return jsonify({'error': 'Invalid JSON'}), 400
+    if not data or not isinstance(data, dict):
+        LOG.info("Rejected chat request: invalid JSON")
+        return None, (jsonify({'error': 'Invalid JSON'}), 400)
         
     user_message = data.get('message', '')
     if not user_message:
-        print("Error: No message provided")
-        return jsonify({'error': 'No message provided'}), 400
+        LOG.info("Rejected chat request: no message")
+        return None, (jsonify({'error': 'No message provided'}), 400)
+    
+    LOG.debug("Received message: %.200s", user_message)
+    return user_message, None
+
+def get_chat_session():
+    """Return (session_id, session) for the session_id in a chat request, starting one if needed"""
+    session_id = request.get_json().get('session_id')
+    return SESSIONS.load(session_id if isinstance(session_id, str) else None)
+
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    user_message, error = get_chat_message()
+    if error:
+        return error
     
-    print(f"Received message: {user_message}")
+    session_id, session = get_chat_session()
     
     # Special handling for exit command
     if user_message.lower() == 'byee':
-        print("Exit command received, sending goodbye message")
-        return jsonify({'response': 'Goodbye! It was nice talking with you. I\'ll close this session now.', 'exit': True})
+        SESSIONS.cache.delete(session_id)
+        return jsonify({'response': GOODBYE_MESSAGE, 'exit': True, 'session_id': session_id})
     
     # Regular message handling
     try:
-        response = get_response(user_message)
-        print(f"Sending response: {response[:100]}...")
-        return jsonify({'response': response})
+        response = get_response(user_message, session)
+        SESSIONS.save(session_id, session)
+        LOG.debug("Sending response: %.100s", response)
+        return jsonify({'response': response, 'session_id': session_id})
+    except QuotaExceeded as e:
+        return too_many_requests(QUOTA_EXCEEDED_MESSAGE, e.retry_after)
     except Exception as e:
-        print(f"Error in chat endpoint: {e}")
+        LOG.error("Error in chat endpoint: %s", e)
         return jsonify({'response': f'Sorry, an error occurred: {str(e)}'}), 500
 
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Streaming variant of /api/chat that sends the response as Server-Sent Events.
+
+    Emits ``chunk`` events ({"text": ...}) as the answer is generated, then a
+    ``done`` event ({"exit": bool, "session_id": ...}), or an ``error`` event
+    if generation fails.
+    """
+    user_message, error = get_chat_message()
+    if error:
+        return error
+    session_id, session = get_chat_session()
+    
+    def generate():
+        if user_message.lower() == 'byee':
+            SESSIONS.cache.delete(session_id)
+            yield sse_event('chunk', {'text': GOODBYE_MESSAGE})
+            yield sse_event('done', {'exit': True, 'session_id': session_id})
+            return
+        try:
+            for text in stream_response(user_message, session):
+                yield sse_event('chunk', {'text': text})
+            SESSIONS.save(session_id, session)
+            yield sse_event('done', {'exit': False, 'session_id': session_id})
+        except QuotaExceeded as e:
+            # Headers are already sent, so the 429 details travel in the event
+            yield sse_event('error', {'error': QUOTA_EXCEEDED_MESSAGE, 'retry_after': e.retry_after})
+        except Exception as e:
+            LOG.error("Error in chat stream endpoint: %s", e)
+            yield sse_event('error', {'error': f'Sorry, an error occurred: {str(e)}'})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Stop reverse proxies from buffering the stream
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 if __name__ == '__main__':
     print("Starting the Nutrition Facts Guide Web Interface...")
     port = int(os.environ.get('PORT', 5002))
     print(f"Open your browser and navigate to http://127.0.0.1:{port}")
     print(f"API Key configured: {'Yes' if GOOGLE_API_KEY else 'No - Please check your .env file'}")
     
-    # Preload food terms 
-    if SPOONACULAR_API_KEY:
-        preload_common_food_terms()
-    else:
+    if not SPOONACULAR_API_KEY:
         print("Spoonacular API key not found - food term detection will be limited")
     
     app.run(host='0.0.0.0', debug=True, port=port)
\ No newline at end of file
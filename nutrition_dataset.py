@@ -0,0 +1,366 @@
+"""Compact, memory-mapped food composition dataset.
+
+The ingestion step (run offline) turns a large CSV or JSON food composition
+dump into a single columnar binary file:
+
+    python nutrition_dataset.py ingest foods.csv data/nutrition.bin
+
+The app memory-maps that file read-only. Nutrient columns are exposed as
+zero-copy float32 views, rows are sorted by food key so exact lookups are a
+binary search, and every gunicorn worker shares the same OS page cache.
+
+File layout: an 8 byte magic, a little-endian uint32 header length, a JSON
+header describing each section as [offset, length], then the 8-byte aligned
+sections themselves. Numeric columns are float32 arrays with NaN for missing
+values; string columns are a uint32 offsets array plus a UTF-8 blob.
+"""
+import argparse
+import bisect
+import csv
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+
+from food_index import FoodIndex
+
+LOG = logging.getLogger('nutrition_bot.nutrition_dataset')
+
+MAGIC = b'NUTRDB\x00\x01'
+
+# Per-100g nutrient columns, in the same order as format_nutrition_facts
+NUTRIENT_COLUMNS = [
+    'calories', 'fat', 'saturated_fat', 'carbs', 'sugars',
+    'protein', 'fiber', 'sodium', 'calcium', 'magnesium'
+]
+STRING_COLUMNS = ['key', 'name', 'brand', 'description']
+
+# Source column names (lowercased) accepted for each field, covering our own
+# field names and USDA FoodData Central style exports
+FIELD_ALIASES = {
+    'name': ['name', 'food_name', 'description', 'food', 'long_desc', 'shrt_desc'],
+    'brand': ['brand', 'brand_owner', 'brand_name', 'manufacturer'],
+    'description': ['notes', 'food_description', 'additional_description', 'ingredients'],
+    'calories': ['calories', 'energy', 'energy (kcal)', 'energy_kcal', 'kcal', 'energ_kcal'],
+    'fat': ['fat', 'total fat', 'total_fat', 'total lipid (fat)', 'lipid_tot', 'fat_g'],
+    'saturated_fat': ['saturated_fat', 'saturated fat', 'fatty acids, total saturated', 'fa_sat', 'saturated_fat_g'],
+    'carbs': ['carbs', 'carbohydrates', 'carbohydrate', 'carbohydrate, by difference', 'carbohydrt', 'carbohydrate_g'],
+    'sugars': ['sugars', 'sugar', 'total sugars', 'sugars, total', 'sugar_tot', 'sugars_g'],
+    'protein': ['protein', 'protein_g'],
+    'fiber': ['fiber', 'fibre', 'dietary fiber', 'fiber, total dietary', 'fiber_td', 'fiber_g'],
+    'sodium': ['sodium', 'sodium, na', 'sodium_mg'],
+    'calcium': ['calcium', 'calcium, ca', 'calcium_mg'],
+    'magnesium': ['magnesium', 'magnesium, mg', 'magnesium_mg']
+}
+
+_ALIGNMENT = 8
+
+
+def normalize_key(name):
+    """Lowercase a food name and collapse its whitespace, as keys are stored"""
+    return ' '.join(name.lower().split())
+
+
+def _resolve_fields(header):
+    """Map our field names to the matching source column names"""
+    lowered = {column.strip().lower(): column for column in header}
+    mapping = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                mapping[field] = lowered[alias]
+                break
+    if 'name' not in mapping:
+        raise ValueError(f"No food name column found in {sorted(header)}")
+    return mapping
+
+
+def _parse_number(value):
+    if value is None:
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip()
+    if not value:
+        return math.nan
+    try:
+        return float(value)
+    except ValueError:
+        return math.nan
+
+
+def iter_source_records(path):
+    """Stream records from a CSV, JSON array or JSON-lines file as dicts"""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='') as f:
+        if extension == '.csv':
+            yield from csv.DictReader(f)
+        elif extension in ('.jsonl', '.ndjson'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            data = json.load(f)
+            if isinstance(data, dict):
+                data = data.get('foods') or list(data.values())
+            yield from data
+
+
+def ingest(source_path, output_path):
+    """Convert a food composition dump into the columnar binary format"""
+    rows = {}
+    mapping = None
+    for record in iter_source_records(source_path):
+        if mapping is None:
+            mapping = _resolve_fields(record.keys())
+        name = str(record.get(mapping['name']) or '').strip()
+        key = normalize_key(name)
+        # Keep the first occurrence of each food
+        if not key or key in rows:
+            continue
+        rows[key] = (
+            name,
+            str(record.get(mapping['brand'], '') or '').strip() if 'brand' in mapping else '',
+            str(record.get(mapping['description'], '') or '').strip() if 'description' in mapping else '',
+            [_parse_number(record.get(mapping[field])) if field in mapping else math.nan
+             for field in NUTRIENT_COLUMNS]
+        )
+
+    keys = sorted(rows)
+    sections = []
+    for index, column in enumerate(NUTRIENT_COLUMNS):
+        values = array('f', (rows[key][3][index] for key in keys))
+        if sys.byteorder == 'big':
+            values.byteswap()
+        sections.append((column, values.tobytes()))
+    for index, column in enumerate(STRING_COLUMNS):
+        offsets = array('I', [0])
+        blob = bytearray()
+        for key in keys:
+            text = key if index == 0 else rows[key][index - 1]
+            blob += text.encode('utf-8')
+            offsets.append(len(blob))
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        sections.append((f'{column}.offsets', offsets.tobytes()))
+        sections.append((f'{column}.data', bytes(blob)))
+
+    # Section offsets depend on the header length, which depends on the
+    # offsets; lay out relative to the data start and pad the header instead
+    layout = {}
+    position = 0
+    for section_name, data in sections:
+        layout[section_name] = [position, len(data)]
+        position += len(data) + (-len(data) % _ALIGNMENT)
+    header = json.dumps({
+        'rows': len(keys),
+        'nutrients': NUTRIENT_COLUMNS,
+        'sections': layout
+    }).encode('utf-8')
+    data_start = len(MAGIC) + 4 + len(header)
+    header += b' ' * (-data_start % _ALIGNMENT)
+    data_start = len(MAGIC) + 4 + len(header)
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    temp_path = output_path + '.tmp'
+    with open(temp_path, 'wb') as out:
+        out.write(MAGIC)
+        out.write(struct.pack('<I', len(header)))
+        out.write(header)
+        for _, data in sections:
+            out.write(data)
+            out.write(b'\x00' * (-len(data) % _ALIGNMENT))
+    # Atomic swap so running workers never map a half-written file
+    os.replace(temp_path, output_path)
+    return len(keys)
+
+
+class _StringColumn:
+    """Sequence view over a memory-mapped string column"""
+
+    def __init__(self, buffer, offsets, data_start):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._data_start = data_start
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def raw(self, row):
+        start = self._data_start + self._offsets[row]
+        return self._buffer[start:self._data_start + self._offsets[row + 1]]
+
+    def __getitem__(self, row):
+        return bytes(self.raw(row)).decode('utf-8')
+
+
+class _EncodedKeys:
+    """UTF-8 key bytes per row; byte order equals code point order, so bisect works"""
+
+    def __init__(self, column):
+        self._column = column
+
+    def __len__(self):
+        return len(self._column)
+
+    def __getitem__(self, row):
+        return bytes(self._column.raw(row))
+
+
+class NutritionDataset:
+    """Read-only, memory-mapped view of an ingested nutrition dataset"""
+
+    def __init__(self, path, stop_words=()):
+        self.path = path
+        self._stop_words = stop_words
+        # The mapping stays valid after the file object is closed
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = self._buffer = memoryview(self._mmap)
+
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a nutrition dataset file")
+        header_length = struct.unpack_from('<I', buffer, len(MAGIC))[0]
+        header_start = len(MAGIC) + 4
+        header = json.loads(bytes(buffer[header_start:header_start + header_length]))
+        data_start = header_start + header_length
+
+        self.rows = header['rows']
+        self.nutrients = header['nutrients']
+        sections = header['sections']
+
+        def section(name, fmt):
+            offset, length = sections[name]
+            view = buffer[data_start + offset:data_start + offset + length].cast(fmt)
+            if sys.byteorder == 'big':
+                # The file is little-endian; big-endian hosts pay for a copy
+                values = array(fmt, view)
+                values.byteswap()
+                return values
+            return view
+
+        self.columns = {column: section(column, 'f') for column in self.nutrients}
+        self._strings = {}
+        for column in STRING_COLUMNS:
+            offsets = section(f'{column}.offsets', 'I')
+            self._strings[column] = _StringColumn(buffer, offsets, data_start + sections[f'{column}.data'][0])
+        self._encoded_keys = _EncodedKeys(self._strings['key'])
+
+        self._index = None
+        self._index_lock = threading.Lock()
+        self._fork_hook_registered = False
+
+    def __len__(self):
+        return self.rows
+
+    def key(self, row):
+        return self._strings['key'][row]
+
+    def find(self, key):
+        """Return the row of a food name matching a key exactly (ignoring case and spacing), or None"""
+        encoded = normalize_key(key).encode('utf-8')
+        row = bisect.bisect_left(self._encoded_keys, encoded)
+        if row < self.rows and self._encoded_keys[row] == encoded:
+            return row
+        return None
+
+    def record(self, row):
+        """Build a food info dict (same shape as NUTRITION_DATABASE entries) for a row"""
+        food_info = {'name': self._strings['name'][row]}
+        brand = self._strings['brand'][row]
+        if brand:
+            food_info['brand'] = brand
+        for column in self.nutrients:
+            value = self.columns[column][row]
+            if not math.isnan(value):
+                # Trim float32 noise (0.3 is stored as 0.30000001...)
+                food_info[column] = float(f"{value:.6g}")
+        description = self._strings['description'][row]
+        food_info['description'] = description or f"Information about {food_info['name']}."
+        return food_info
+
+    def lookup(self, key):
+        """Return the food info dict for an exact key, or None"""
+        row = self.find(key)
+        return self.record(row) if row is not None else None
+
+    @property
+    def index(self):
+        """Name index over the dataset, built on first use unless built in the background"""
+        if self._index is None:
+            with self._index_lock:
+                if self._index is None:
+                    keys = self._strings['key']
+                    self._index = FoodIndex((keys[row] for row in range(self.rows)),
+                                            stop_words=self._stop_words)
+        return self._index
+
+    def build_index_in_background(self):
+        """Start building the name index in a daemon thread, so no request pays for all of it.
+
+        Searches made before it is done wait for it. Under gunicorn
+        --preload the master waits for the build before forking, so the
+        workers share one index; a build still running when the process
+        forks otherwise is restarted in the child, where the parent's
+        thread doesn't exist.
+        """
+        if self._index is not None:
+            return
+        threading.Thread(target=self._build_index, name='dataset-index', daemon=True).start()
+        if not self._fork_hook_registered and hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart_index_build)
+            self._fork_hook_registered = True
+
+    def _build_index(self):
+        self.index
+
+    def _restart_index_build(self):
+        if self._index is None and self._strings:
+            # The parent's build thread may have held the lock when it forked
+            self._index_lock = threading.Lock()
+            threading.Thread(target=self._build_index, name='dataset-index', daemon=True).start()
+
+    def search(self, query, limit=5):
+        """Return up to limit (key, score) pairs ranked best first"""
+        return self.index.search(query, limit=limit)
+
+    def close(self):
+        self._strings.clear()
+        self.columns.clear()
+        self._encoded_keys = None
+        self._index = None
+        self._buffer.release()
+        self._mmap.close()
+
+
+def load_dataset(path, stop_words=()):
+    """Open a dataset file if it exists, returning None when unavailable"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return NutritionDataset(path, stop_words=stop_words)
+    except (OSError, ValueError) as e:
+        LOG.warning("Could not load nutrition dataset %s: %s", path, e)
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nutrition dataset tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ingest_parser = subparsers.add_parser('ingest', help="Import a CSV/JSON food composition dump")
+    ingest_parser.add_argument('source', help="CSV, JSON or JSON-lines file, one food per row (values per 100g)")
+    ingest_parser.add_argument('output', help="Path of the binary dataset file to write")
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        count = ingest(args.source, args.output)
+        print(f"Wrote {count} foods to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+import re
+from collections import namedtuple
+
+# Nutrient names and synonyms as users type them, mapped to our nutrient keys
+NUTRIENT_ALIASES = {
+    'calorie': 'calories', 'calories': 'calories', 'kcal': 'calories', 'energy': 'calories',
+    'fat': 'fat', 'fats': 'fat',
+    'saturated fat': 'saturated_fat', 'saturated fats': 'saturated_fat', 'saturated': 'saturated_fat',
+    'carb': 'carbs', 'carbs': 'carbs', 'carbohydrate': 'carbs', 'carbohydrates': 'carbs',
+    'sugar': 'sugars', 'sugars': 'sugars',
+    'protein': 'protein', 'proteins': 'protein',
+    'fiber': 'fiber', 'fibre': 'fiber',
+    'sodium': 'sodium', 'salt': 'sodium',
+    'calcium': 'calcium',
+    'magnesium': 'magnesium'
+}
+
+# Grams per unit of weight
+UNIT_GRAMS = {
+    'g': 1, 'gram': 1, 'grams': 1, 'kg': 1000,
+    'oz': 28.35, 'ounce': 28.35, 'ounces': 28.35,
+    'lb': 453.6, 'lbs': 453.6, 'pound': 453.6, 'pounds': 453.6
+}
+PORTION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(kg|g|grams?|oz|ounces?|lbs?|pounds?)\b")
+
+NUMBER_WORDS = {'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'half a': 0.5, 'half an': 0.5}
+
+# Words that never belong to a food name, so open-ended questions using them
+# ("is chicken good for you") don't fit a template
+NON_FOOD_WORDS = {
+    'is', 'are', 'was', 'does', 'do', 'did', 'have', 'has', 'contain', 'contains', 'provide',
+    'can', 'should', 'would', 'will', 'why', 'how', 'what', 'which', 'when', 'who',
+    'good', 'bad', 'healthy', 'healthier', 'unhealthy', 'better', 'worse', 'best', 'worst',
+    'more', 'less', 'fewer', 'much', 'many', 'too', 'enough', 'need', 'daily', 'recommended',
+    'safe', 'eat', 'eating', 'ate', 'diet', 'weight', 'lose', 'gain', 'if', 'than', 'or',
+    'it', 'its', 'that', 'this', 'them', 'those', 'these', 'same', 'i', 'me', 'my', 'you', 'your', 'we'
+}
+
+# A polite opener before the question ("hi, how many calories in a banana")
+GREETING_PREFIX = re.compile(r"^(?:hi|hello|hey|good (?:morning|afternoon|evening))(?:\s+there)?\s*,?\s+")
+
+CONNECTING_WORDS = ['and', 'or', 'in', 'of', 'for', 'at', 'with', 'to', 'per', 'than', 'vs', 'versus',
+                    'compared', 'against', 'each', 'total', 'today']
+
+# One food mentioned in a question:
+#   name: the food without quantity or article ("chicken breast")
+#   grams: portion weight when given with a unit ("150g chicken"), else None
+#   count: number of items given without a unit ("2 eggs"), else None
+FoodRef = namedtuple('FoodRef', ['name', 'grams', 'count'])
+
+# A templated question:
+#   kind: 'facts' (everything about one food), 'nutrients' or 'compare'
+#   nutrients: nutrient keys asked about, in question order (empty means all)
+#   foods: one FoodRef, or two for comparisons
+#   direction: 'more' or 'less' for "which has more protein, X or Y", else None
+ParsedQuery = namedtuple('ParsedQuery', ['kind', 'nutrients', 'foods', 'direction'])
+
+# A substitute question:
+#   food: the FoodRef to find alternatives to
+#   constraints: nutrient key -> 'lower' or 'higher'
+AlternativeQuery = namedtuple('AlternativeQuery', ['food', 'constraints'])
+
+# What "healthier" means when no explicit constraint is given
+HEALTHIER_CONSTRAINTS = {'sugars': 'lower', 'saturated_fat': 'lower'}
+
+LOWER_WORDS = {'lower', 'less', 'fewer', 'reduced', 'low'}
+
+
+def find_nutrients(words):
+    """Return (nutrient keys in order, the words that aren't nutrient names)"""
+    nutrients = []
+    other_words = []
+    i = 0
+    while i < len(words):
+        # Two-word aliases ("saturated fat") win over their parts
+        pair = ' '.join(words[i:i + 2])
+        if i + 1 < len(words) and pair in NUTRIENT_ALIASES:
+            nutrient = NUTRIENT_ALIASES[pair]
+            i += 2
+        else:
+            nutrient = NUTRIENT_ALIASES.get(words[i])
+            if nutrient is None:
+                other_words.append(words[i])
+            i += 1
+        if nutrient and nutrient not in nutrients:
+            nutrients.append(nutrient)
+    return nutrients, other_words
+
+
+def singular(name):
+    """Best-effort singular of the last word of a food name ("eggs" -> "egg")"""
+    head, _, last = name.rpartition(' ')
+    if last.endswith('ies') and len(last) > 4:
+        last = last[:-3] + 'y'
+    elif last.endswith(('oes', 'ches', 'shes', 'xes', 'sses')):
+        last = last[:-2]
+    elif last.endswith('s') and not last.endswith(('ss', 'us')) and len(last) > 3:
+        last = last[:-1]
+    return f"{head} {last}" if head else last
+
+
+class QueryParser:
+    """Grammar for templated nutrition questions, compiled once at import time.
+
+    Recognizes nutrient questions ("how many calories in a banana", "protein
+    in 150g chicken"), nutrition facts requests ("nutrition facts of oats")
+    comparisons ("compare apple vs orange", "which has more protein, eggs or
+    tofu", "is apple healthier than banana") and, through parse_alternatives,
+    substitute questions ("healthier alternative to white rice") as
+    whole-question templates. Anything else, including
+    questions with extra clauses ("is the protein in eggs good for
+    muscle?"), returns None and is left to the LLM. Quantities, units,
+    articles and meal context ("for breakfast") are stripped from the food
+    names so they can be looked up directly.
+    """
+
+    def __init__(self, nutrient_aliases=NUTRIENT_ALIASES, unit_grams=UNIT_GRAMS):
+        self.nutrient_aliases = nutrient_aliases
+        self.unit_grams = unit_grams
+
+        def alternation(words):
+            # Longest first so "saturated fat" wins over "saturated"
+            return '|'.join(re.escape(word) for word in sorted(words, key=lambda w: (-len(w), w)))
+
+        alias = f"(?:{alternation(nutrient_aliases)})"
+        nutrients = rf"(?P<nutrients>{alias}(?:(?:\s*,\s*(?:and\s+)?|\s+and\s+){alias})*)"
+        unit = f"(?:{alternation(unit_grams)})"
+        number = rf"(?:\d+(?:\.\d+)?|{alternation(NUMBER_WORDS)})"
+
+        # Connecting words end a food name, so "eggs for breakfast" is "eggs";
+        # other non-food words and nutrient names can't be part of one
+        excluded = set(CONNECTING_WORDS) | NON_FOOD_WORDS | set(nutrient_aliases)
+        word = rf"(?!(?:{alternation(excluded)})\b)[a-z][a-z'-]*"
+
+        def food(prefix=''):
+            return (rf"(?:(?P<{prefix}amount>{number})\s*(?P<{prefix}unit>{unit})?\s+(?:of\s+)?)?"
+                    rf"(?:(?:a|an|the|some)\s+)?"
+                    rf"(?P<{prefix}food>{word}(?:\s+{word}){{0,3}})")
+
+        facts = r"(?:nutrition(?:al)?(?:\s+(?:facts|info|information|values?|content|profile))?|nutrients|macros|macronutrients)"
+        ask = (r"(?:(?:how much|how many|what(?:'s|\s+is|\s+are)?|tell me|show me|give me)"
+               r"(?:\s+the)?(?:\s+(?:amount|number|total)\s+of)?\s+)?")
+        context = (r"(?:\s+(?:for|at|with|in)\s+(?:my\s+)?(?:breakfast|brunch|lunch|dinner|supper|dessert|a snack|snack))?"
+                   r"(?:\s+(?:per 100\s*g|per 100 grams|each|in total|total|today))?")
+        versus = r"(?:vs|versus|compared to|compared with)"
+        direction = r"(?P<direction>more|less|fewer|higher|lower)"
+
+        templates = [
+            ('nutrients', rf"{ask}{nutrients}(?:\s+(?:are|is))?(?:\s+there)?\s+(?:in|of|for)\s+{food()}{context}"),
+            ('nutrients', rf"(?:how much|how many)\s+{nutrients}\s+(?:does|do)\s+{food()}\s+(?:have|contain|provide){context}"),
+            ('nutrients', rf"{food()}\s+{nutrients}"),
+            ('facts', rf"{ask}{facts}\s+(?:in|of|for)\s+{food()}{context}"),
+            ('facts', rf"{food()}\s+{facts}"),
+            ('compare', rf"compare(?:\s+the)?(?:\s+{nutrients})?(?:\s+{facts})?(?:\s+(?:in|of|for))?"
+                        rf"\s+{food('a_')}\s+(?:{versus}|and|with|to|against)\s+{food('b_')}"),
+            ('compare', rf"{food('a_')}\s+{versus}\s+{food('b_')}(?:\s+(?:{nutrients}|{facts}))?"),
+            ('compare', rf"which\s+(?:one\s+)?(?:has|contains|is)\s+{direction}(?:\s+in)?\s+{nutrients}\s*,?\s*"
+                        rf"{food('a_')}\s+or\s+{food('b_')}"),
+            ('compare', rf"(?:is|are|does|do)\s+{food('a_')}\s+(?:have\s+)?{direction}(?:\s+in)?\s+{nutrients}"
+                        rf"\s+than\s+{food('b_')}"),
+            ('compare', rf"(?:is|are)\s+{food('a_')}\s+healthier\s+than\s+{food('b_')}"),
+            ('compare', rf"which\s+(?:one\s+)?is\s+healthier\s*,?\s*{food('a_')}\s+or\s+{food('b_')}"),
+        ]
+        self._templates = [(kind, re.compile(pattern)) for kind, pattern in templates]
+        # Cheap check that skips the templates for most open-ended questions
+        self._prefilter = re.compile(rf"\b(?:{alias}|{facts}|compare|vs|versus|healthier)\b")
+
+        # Nutrient constraints on a substitute ("lower in sugar", "low-fat")
+        change = r"(?:lower|less|fewer|reduced|low|higher|more|richer|high)"
+        separator = r"(?:\s+in\s+|\s*-\s*|\s+)"
+        constraints = rf"{change}{separator}{alias}(?:(?:\s*,\s*(?:and\s+)?|\s+and\s+){change}{separator}{alias})*"
+        self._constraint = re.compile(rf"({change}){separator}({alias})")
+        quality = r"(?P<quality>good|great|healthy|healthier|better)"
+        substitute = r"(?:alternatives?|substitutes?|replacements?|swaps?)"
+        request = (r"(?:(?:what(?:'s|\s+is|\s+are)|what\s+would\s+be|give\s+me|suggest|show\s+me|recommend|"
+                   r"find|list|any|is\s+there|are\s+there|i\s+need|i\s+want)\s+)?")
+        suffix = (rf"(?:(?:\s+(?:with|but|that(?:'s|\s+is|\s+are|\s+has|\s+have)?|which\s+(?:is|are|has|have)|having))?"
+                  rf"\s+(?P<after>{constraints}))?")
+        alternatives = [
+            rf"{request}(?:(?:a|an|some|the)\s+)?(?:{quality}\s+)?(?:(?P<before>{constraints})\s+)?"
+            rf"{substitute}\s+(?:to|for)\s+{food()}{suffix}",
+            rf"what\s+(?:can|could|should)\s+i\s+(?:eat|use|have|try|buy)\s+instead\s+of\s+{food()}{suffix}",
+            rf"(?:what(?:'s|\s+is|\s+are)\s+)?(?:some\s+)?(?:foods?\s+)?similar\s+to\s+{food()}{suffix}",
+            rf"(?:what(?:'s|\s+is|\s+are)|something|anything|is\s+there\s+(?:something|anything))\s+"
+            rf"(?P<quality>healthier)\s+than\s+{food()}",
+        ]
+        self._alternative_templates = [re.compile(pattern) for pattern in alternatives]
+        self._alternative_prefilter = re.compile(
+            r"\b(?:alternatives?|substitutes?|replacements?|swaps?|instead of|similar to|healthier)\b"
+        )
+
+    def normalize(self, text):
+        text = text.lower().replace('&', ' and ').replace(':', ',')
+        # Drop sentence punctuation but keep decimal points ("1.5 kg")
+        text = re.sub(r"[?!;]+|\.(?!\d)|\bplease\b", ' ', text)
+        text = ' '.join(text.split()).strip(' ,')
+        return GREETING_PREFIX.sub('', text)
+
+    def _food_ref(self, match, prefix=''):
+        name = match.group(prefix + 'food')
+        amount = match.group(prefix + 'amount')
+        if amount is None:
+            return FoodRef(name, None, None)
+        quantity = NUMBER_WORDS[amount] if amount in NUMBER_WORDS else float(amount)
+        unit = match.group(prefix + 'unit')
+        if unit is not None:
+            return FoodRef(name, quantity * self.unit_grams[unit], None)
+        return FoodRef(name, None, quantity)
+
+    def parse(self, text):
+        """Return the ParsedQuery for a templated question, or None"""
+        text = self.normalize(text)
+        if not self._prefilter.search(text):
+            return None
+        for kind, pattern in self._templates:
+            match = pattern.fullmatch(text)
+            if match is None:
+                continue
+            prefixes = ['a_', 'b_'] if kind == 'compare' else ['']
+            foods = [self._food_ref(match, prefix) for prefix in prefixes]
+            groups = match.groupdict()
+            nutrients = find_nutrients(groups['nutrients'].replace(',', ' ').split())[0] if groups.get('nutrients') else []
+            direction = groups.get('direction')
+            if direction is not None:
+                direction = 'more' if direction in ('more', 'higher') else 'less'
+            return ParsedQuery(kind, nutrients, foods, direction)
+        return None
+
+    def parse_alternatives(self, text):
+        """Return the AlternativeQuery for a templated substitute question, or None"""
+        text = self.normalize(text)
+        if not self._alternative_prefilter.search(text):
+            return None
+        for pattern in self._alternative_templates:
+            match = pattern.fullmatch(text)
+            if match is None:
+                continue
+            groups = match.groupdict()
+            constraints = {}
+            for name in ('before', 'after'):
+                for change, alias in self._constraint.findall(groups.get(name) or ''):
+                    constraints[self.nutrient_aliases[alias]] = 'lower' if change in LOWER_WORDS else 'higher'
+            if not constraints and groups.get('quality') in ('healthy', 'healthier', 'better'):
+                constraints = dict(HEALTHIER_CONSTRAINTS)
+            return AlternativeQuery(self._food_ref(match), constraints)
+        return None
@@ -0,0 +1,245 @@
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+LOG = logging.getLogger('nutrition_bot.quota')
+
+# Degradation stages, from least to most restricted
+STAGE_NORMAL = 'normal'
+STAGE_NO_PROBING = 'no_probing'    # food-term probing uses the cache only
+STAGE_LOCAL_ONLY = 'local_only'    # no upstream calls: local data and caches only
+
+
+class QuotaExceeded(Exception):
+    """Raised when an answer needs an upstream whose budget is used up"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allow ``rate`` events per second on average, with bursts of up to ``burst``"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, now=None):
+        """Consume a token; return (allowed, seconds until the next token is available)"""
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate
+
+
+class ClientRateLimiter:
+    """Token bucket per client key (IP address or session id).
+
+    Buckets are kept in an LRU bounded by ``max_clients``, so a flood of
+    distinct clients can't grow memory without limit; an evicted client
+    simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate=1.0, burst=10, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.limited = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def check(self, key):
+        """Return (allowed, retry_after seconds) for one request from key"""
+        if not self.enabled:
+            return True, 0.0
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            allowed, retry_after = bucket.take()
+            if not allowed:
+                self.limited += 1
+            return allowed, retry_after
+
+
+class SQLiteQuotaStore:
+    """Upstream spending per window in a SQLite file shared by every worker.
+
+    Gunicorn workers pointing at the same file charge one budget between
+    them instead of each spending a full budget of its own.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS quota ("
+            "window_start REAL NOT NULL, resource TEXT NOT NULL, used REAL NOT NULL, "
+            "PRIMARY KEY (window_start, resource))"
+        )
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared across threads, keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, window_start, resource, amount):
+        self._connection().execute(
+            "INSERT INTO quota (window_start, resource, used) VALUES (?, ?, ?) "
+            "ON CONFLICT (window_start, resource) DO UPDATE SET used = used + excluded.used",
+            (window_start, resource, amount)
+        )
+
+    def used(self, window_start):
+        """Return {resource: amount used} for a window, dropping older windows"""
+        conn = self._connection()
+        conn.execute("DELETE FROM quota WHERE window_start < ?", (window_start,))
+        rows = conn.execute("SELECT resource, used FROM quota WHERE window_start = ?", (window_start,))
+        return dict(rows.fetchall())
+
+
+def create_quota_store():
+    """Return a SQLiteQuotaStore in the shared cache database when CACHE_DB_PATH is set, else None"""
+    db_path = os.getenv('CACHE_DB_PATH')
+    if not db_path:
+        return None
+    try:
+        return SQLiteQuotaStore(db_path)
+    except (sqlite3.Error, OSError) as e:
+        LOG.warning("Could not open shared quota store at %s, budgets are per process: %s", db_path, e)
+        return None
+
+
+class QuotaAccountant:
+    """Track upstream spending (Spoonacular points, Gemini tokens) per fixed window.
+
+    ``limits`` maps a resource to its budget per window; resources without a
+    positive limit are tracked but never restrict anything. Each resource
+    has its own stage: below ``probe_reserve`` of its budget, speculative
+    calls to it (food-term probing) stop; below ``local_only_reserve``, it
+    isn't called at all until the window resets, while other resources
+    with budget left still are. Windows are aligned to the epoch, so a daily window resets at
+    midnight UTC like Spoonacular's quota.
+
+    With a shared ``store`` every spend is added to it and the totals of all
+    processes are re-read at most every ``refresh`` seconds; without one,
+    budgets are per process.
+    """
+
+    def __init__(self, limits, window=86400, probe_reserve=0.3, local_only_reserve=0.05,
+                 store=None, refresh=1.0):
+        self.limits = dict(limits)
+        self.window = window
+        self.probe_reserve = probe_reserve
+        self.local_only_reserve = local_only_reserve
+        self.store = store
+        self.refresh = refresh
+        self._used = {resource: 0.0 for resource in self.limits}
+        self._window_start = self._current_window()
+        self._synced_at = None
+        self._lock = threading.Lock()
+
+    def _current_window(self):
+        return math.floor(time.time() / self.window) * self.window
+
+    def _roll_window(self):
+        start = self._current_window()
+        if start != self._window_start:
+            self._window_start = start
+            self._used = {resource: 0.0 for resource in self.limits}
+            self._synced_at = None
+        if self.store is not None:
+            now = time.monotonic()
+            if self._synced_at is None or now - self._synced_at >= self.refresh:
+                self._synced_at = now
+                try:
+                    used = self.store.used(self._window_start)
+                except sqlite3.Error as e:
+                    LOG.warning("Error reading shared quota: %s", e)
+                else:
+                    self._used = {resource: 0.0 for resource in self.limits}
+                    self._used.update(used)
+
+    def spend(self, resource, amount):
+        with self._lock:
+            self._roll_window()
+            self._used[resource] = self._used.get(resource, 0.0) + amount
+            window_start = self._window_start
+        if self.store is not None:
+            try:
+                self.store.add(window_start, resource, amount)
+            except sqlite3.Error as e:
+                LOG.warning("Error writing shared quota: %s", e)
+
+    def remaining_fraction(self, resource):
+        limit = self.limits.get(resource)
+        if not limit or limit <= 0:
+            return 1.0
+        with self._lock:
+            self._roll_window()
+            return max(0.0, 1 - self._used.get(resource, 0.0) / limit)
+
+    def stage(self, resource=None):
+        """Return the stage for calling resource; without one, the stage of the scarcest resource"""
+        if resource is not None:
+            lowest = self.remaining_fraction(resource)
+        else:
+            lowest = min((self.remaining_fraction(name) for name in self.limits), default=1.0)
+        if lowest <= self.local_only_reserve:
+            return STAGE_LOCAL_ONLY
+        if lowest <= self.probe_reserve:
+            return STAGE_NO_PROBING
+        return STAGE_NORMAL
+
+    def seconds_until_reset(self):
+        return max(1, int(math.ceil(self._window_start + self.window - time.time())))
+
+    def check(self, resource):
+        """Raise QuotaExceeded if calling resource is not allowed at the current stage"""
+        if self.stage(resource) == STAGE_LOCAL_ONLY:
+            raise QuotaExceeded(f"Upstream budget exhausted, not calling {resource}",
+                                self.seconds_until_reset())
+
+    def info(self):
+        with self._lock:
+            self._roll_window()
+            used = dict(self._used)
+        return {
+            'stage': self.stage(),
+            'shared': self.store is not None,
+            'window': self.window,
+            'resets_in': self.seconds_until_reset(),
+            'resources': {
+                resource: {
+                    'used': round(used.get(resource, 0.0), 2),
+                    'limit': self.limits[resource] or None,
+                    'remaining_fraction': round(self.remaining_fraction(resource), 4),
+                    'stage': self.stage(resource)
+                }
+                for resource in self.limits
+            }
+        }
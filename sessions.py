@@ -0,0 +1,98 @@
+import copy
+import re
+import uuid
+
+from food_cache import MISSING
+
+# Client-supplied session ids are used as cache keys, so only accept plain tokens
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def plain_text(html):
+    """Strip tags and collapse whitespace in an answer"""
+    return ' '.join(TAG_PATTERN.sub(' ', html).split())
+
+
+def new_session():
+    # Plain JSON-compatible data so the shared SQLite cache backend can store it
+    return {'history': [], 'summary': '', 'last_food': None}
+
+
+class SessionStore:
+    """Conversation state per client session id, kept in a TTLCache.
+
+    A session holds the recent turns, a short summary of turns that no
+    longer fit the ``token_budget`` and the last food resolved for it, so
+    follow-up questions can refer back to it. Old turns are compacted
+    locally (question plus the start of the answer) instead of asking
+    Gemini to summarize them, which would cost another LLM call per turn.
+
+    The cache should be created with ``local_copy=False`` so every load sees
+    the latest save from any worker. load and save work on copies, so
+    concurrent requests never mutate a session object another one holds.
+    """
+
+    def __init__(self, cache, token_budget=2000, summary_chars=1200):
+        self.cache = cache
+        self.token_budget = token_budget
+        self.summary_chars = summary_chars
+
+    def load(self, session_id):
+        """Return (session_id, session), starting a new session for unknown or invalid ids"""
+        if session_id and SESSION_ID_PATTERN.match(session_id):
+            session = self.cache.get(session_id)
+            if session is not MISSING:
+                return session_id, copy.deepcopy(session)
+        else:
+            session_id = uuid.uuid4().hex
+        return session_id, new_session()
+
+    def save(self, session_id, session):
+        self.cache.set(session_id, copy.deepcopy(session))
+
+    def record_turn(self, session, question, answer):
+        """Append a question/answer pair and compact the history to the token budget"""
+        session['history'].append(['user', question])
+        session['history'].append(['model', answer])
+        self.compact(session)
+
+    def compact(self, session):
+        history = session['history']
+        tokens = estimate_tokens(session['summary']) + sum(estimate_tokens(text) for _, text in history)
+        # Always keep the latest exchange verbatim
+        while tokens > self.token_budget and len(history) > 2:
+            (_, question), (_, answer) = history[0], history[1]
+            del history[:2]
+            tokens -= estimate_tokens(question) + estimate_tokens(answer)
+            answer_start = plain_text(answer)[:160]
+            line = f"User asked: {question.strip()[:160]} / Answer began: {answer_start}"
+            lines = session['summary'].split('\n') if session['summary'] else []
+            lines.append(line)
+            # Oldest summary lines go first; the newest is always kept
+            while len(lines) > 1 and sum(len(l) + 1 for l in lines) > self.summary_chars:
+                lines.pop(0)
+            summary = '\n'.join(lines)
+            tokens += estimate_tokens(summary) - estimate_tokens(session['summary'])
+            session['summary'] = summary
+
+    def gemini_history(self, session):
+        """Return the session as a Gemini chat history (list of role/parts dicts)"""
+        history = []
+        if session['summary']:
+            history.append({'role': 'user', 'parts': ['Summary of our earlier conversation:\n' + session['summary']]})
+            history.append({'role': 'model', 'parts': ['Understood.']})
+        for role, text in session['history']:
+            history.append({'role': role, 'parts': [text]})
+        return history
+
+    def info(self):
+        info = self.cache.info()
+        info['token_budget'] = self.token_budget
+        return info
@@ -337,16 +337,198 @@ document.addEventListener('DOMContentLoaded', () => {
             }
         }
         
+        // Stream the response from the server, falling back to the regular API
+        try {
+            const streamed = await streamChatResponse(message);
+            if (streamed) {
+                if (streamed.exit) {
+                    setTimeout(() => {
+                        alert('Session ended. Refresh to start a new chat.');
+                    }, 1000);
+                }
+                return;
+            }
+        } catch (error) {
+            console.error('Streaming error:', error);
+            hideTypingIndicator();
+            const errorMessage = error.message || 'Sorry, there was an error communicating with the server. Please try again.';
+            addMessage(errorMessage, 'bot');
+            
+            // Add to chat history
+            chatHistory.push({
+                sender: 'bot',
+                content: errorMessage
+            });
+            return;
+        }
+        
+        sendRegularMessage(message);
+    }
+    
+    // Parse one Server-Sent Event block into its type and JSON payload
+    function parseSseEvent(rawEvent) {
+        let type = 'message';
+        let data = '';
+        rawEvent.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                type = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                data += line.slice(5).trim();
+            }
+        });
+        return { type, data: data ? JSON.parse(data) : {} };
+    }
+    
+    // Render (partial) bot content, keeping HTML formatting from the server
+    function renderBotContent(contentDiv, content) {
+        contentDiv.innerHTML = content;
+        chatMessages.scrollTop = chatMessages.scrollHeight;
+    }
+    
+    // The server keeps the conversation (recent turns and the last food
+    // looked up) under this id, so follow-ups like "and 200g of it?" work
+    function getSessionId() {
+        try {
+            return sessionStorage.getItem('chatSessionId');
+        } catch (e) {
+            return null;
+        }
+    }
+    
+    function setSessionId(sessionId) {
+        try {
+            if (sessionId) {
+                sessionStorage.setItem('chatSessionId', sessionId);
+            } else {
+                sessionStorage.removeItem('chatSessionId');
+            }
+        } catch (e) {
+            // Storage unavailable (e.g. privacy mode): the chat stays stateless
+        }
+    }
+    
+    // Append the server's Retry-After hint (seconds) to an error message
+    function withRetryAfter(message, retryAfter) {
+        const seconds = parseInt(retryAfter, 10);
+        if (!seconds || seconds <= 0) {
+            return message;
+        }
+        return `${message} (You can try again in ${seconds} second${seconds === 1 ? '' : 's'}.)`;
+    }
+    
+    // Build the message to show for a failed (non-OK) response
+    async function errorMessageFor(response) {
+        let data = {};
+        try {
+            data = await response.json();
+        } catch (e) {
+            // Not JSON (e.g. a proxy error page)
+        }
+        const message = data.response || data.error || 'Sorry, there was an error communicating with the server. Please try again.';
+        return withRetryAfter(message, response.headers.get('Retry-After') || data.retry_after);
+    }
+    
+    // Stream a chat response from /api/chat/stream, rendering chunks as they
+    // arrive. Resolves to {text, exit}, or null if the browser or server
+    // doesn't support streaming, in which case nothing was processed and the
+    // regular API can be used instead. Any other failure is thrown, since the
+    // server may already have spent an answer on the message.
+    async function streamChatResponse(message) {
+        if (!window.ReadableStream || !window.TextDecoder) {
+            return null;
+        }
+        
+        const response = await fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify({ message, session_id: getSessionId() })
+        });
+        // Only a missing streaming endpoint falls back to /api/chat
+        if (response.status === 404 || response.status === 405) {
+            return null;
+        }
+        if (!response.ok) {
+            throw new Error(await errorMessageFor(response));
+        }
+        if (!response.body) {
+            throw new Error('Sorry, the response could not be read. Please try again.');
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let fullText = '';
+        let contentDiv = null;
+        let exit = false;
+        let finished = false;
+        
+        while (!finished) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const event = parseSseEvent(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+                
+                if (event.type === 'chunk') {
+                    if (!contentDiv) {
+                        // First chunk: replace the typing indicator with the message
+                        hideTypingIndicator();
+                        contentDiv = addMessage('', 'bot');
+                    }
+                    fullText += event.data.text;
+                    renderBotContent(contentDiv, fullText);
+                } else if (event.type === 'done') {
+                    exit = Boolean(event.data.exit);
+                    setSessionId(event.data.session_id);
+                    finished = true;
+                } else if (event.type === 'error') {
+                    throw new Error(withRetryAfter(event.data.error, event.data.retry_after));
+                }
+            }
+        }
+        
+        if (!finished) {
+            throw new Error('The connection was interrupted. Please try again.');
+        }
+        if (!contentDiv) {
+            // Done without any text: nothing to show
+            hideTypingIndicator();
+            return { text: '', exit };
+        }
+        
+        if (fullText.includes('Here are some things you can ask me')) {
+            addSuggestionButtons();
+        }
+        
+        // Add to chat history
+        chatHistory.push({
+            sender: 'bot',
+            content: fullText
+        });
+        
+        return { text: fullText, exit };
+    }
+    
+    // Send a message through the regular (non-streaming) chat API
+    function sendRegularMessage(message) {
         // Send message to server (regular API)
         fetch('/api/chat', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({ message })
+            body: JSON.stringify({ message, session_id: getSessionId() })
         })
         .then(response => response.json())
         .then(data => {
+            setSessionId(data.session_id);
+            
             // Hide typing indicator
             hideTypingIndicator();
             
@@ -441,6 +623,8 @@ document.addEventListener('DOMContentLoaded', () => {
             messageDiv.style.opacity = '1';
             messageDiv.style.transform = 'translateY(0)';
         }, 10);
+        
+        return contentDiv;
     }
     
     // Function to add clickable suggestion buttons
@@ -503,6 +687,9 @@ document.addEventListener('DOMContentLoaded', () => {
             chatMessages.removeChild(chatMessages.lastChild);
         }
         
+        // Start a new server-side conversation
+        setSessionId(null);
+        
         // Reset chat history
         chatHistory = [{
             sender: 'bot',
@@ -0,0 +1,63 @@
+import unittest
+
+from answer_cache import SemanticAnswerCache, question_tokens, template_version
+from food_cache import TTLCache
+
+# (question, other phrasing, same key)
+KEY_CASES = [
+    ("calories in an egg", "How many calories does an egg have?", True),
+    ("protein in eggs", "how much protein is in an egg", True),
+    ("Is rice good for you?", "is rice good for you", True),
+    ("calories in an egg", "protein in an egg", False),
+    ("is glass safe", "is glas safe", False),
+]
+
+
+def answer_cache(version='v1', **options):
+    return SemanticAnswerCache(TTLCache(), version, stop_words={'in', 'an', 'a', 'the', 'for'}, **options)
+
+
+class AnswerCacheTest(unittest.TestCase):
+    def test_normalized_keys(self):
+        cache = answer_cache()
+        for question, other, same in KEY_CASES:
+            with self.subTest(question=question, other=other):
+                self.assertEqual(cache.key(question) == cache.key(other), same)
+
+    def test_rephrased_question_hits(self):
+        cache = answer_cache()
+        cache.set("calories in an egg", "About 70.")
+        self.assertEqual(cache.get("How many calories does an egg have?"), "About 70.")
+        self.assertIsNone(cache.get("protein in an egg"))
+
+    def test_template_change_invalidates_answers(self):
+        shared = TTLCache()
+        old = SemanticAnswerCache(shared, template_version('prompt v1', 'model'))
+        new = SemanticAnswerCache(shared, template_version('prompt v2', 'model'))
+        old.set("calories in an egg", "About 70.")
+        self.assertIsNone(new.get("calories in an egg"))
+
+    def test_similar_question_fallback(self):
+        cache = answer_cache(similarity_threshold=0.8)
+        cache.set("benefits of green tea", "Antioxidants.")
+        self.assertEqual(cache.get("health benefits of green tea"), "Antioxidants.")
+        self.assertEqual(cache.similar_hits, 1)
+        # Close, but about another food
+        self.assertIsNone(cache.get("benefits of green beans"))
+        self.assertIsNone(cache.get("benefits of black coffee"))
+        # Without a threshold only the exact key is used
+        exact_only = answer_cache()
+        exact_only.set("benefits of green tea", "Antioxidants.")
+        self.assertIsNone(exact_only.get("health benefits of green tea"))
+
+    def test_empty_questions_and_answers_are_not_cached(self):
+        cache = answer_cache()
+        cache.set("what is it?", "Something.")
+        cache.set("calories in an egg", "")
+        self.assertEqual(question_tokens("what is it?"), [])
+        self.assertIsNone(cache.get("what is it?"))
+        self.assertIsNone(cache.get("calories in an egg"))
+
+
+if __name__ == '__main__':
+    unittest.main()
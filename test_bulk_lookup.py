@@ -0,0 +1,60 @@
+import argparse
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault('CACHE_WARMER', '0')
+
+import bulk_lookup
+import nutrition_bot as bot
+
+FOODS = ['apple', 'purple kale chips', 'dragonfruit jam', 'smoked tofu', 'red lentil pasta', 'oat bran muffin']
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.input = os.path.join(directory.name, 'foods.txt')
+        self.output = os.path.join(directory.name, 'enriched.jsonl')
+        with open(self.input, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(FOODS) + '\n')
+
+    def run_lookup(self, lookup):
+        args = argparse.Namespace(input=self.input, output=self.output, column=None, format='jsonl',
+                                  concurrency=1, max_api_calls=None, checkpoint=None, restart=False)
+        with mock.patch.object(bot, 'SPOONACULAR_API_KEY', 'test'), \
+                mock.patch.object(bot, 'get_food_info_from_api', lookup):
+            return bulk_lookup.run(bot, args)
+
+    def test_interrupted_run_retries_failed_rows(self):
+        def flaky(food_name):
+            if food_name == 'dragonfruit jam':
+                return None    # failed and not cached: an error row
+            if food_name == 'red lentil pasta':
+                raise KeyboardInterrupt
+            return {'name': food_name}
+
+        with self.assertRaises(KeyboardInterrupt):
+            self.run_lookup(flaky)
+        with open(self.output + '.checkpoint', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        self.assertEqual(checkpoint['rows'], 4)
+        self.assertEqual(checkpoint['errors'], [3])
+
+        counts, reason = self.run_lookup(lambda food_name: {'name': food_name})
+        self.assertIsNone(reason)
+        self.assertEqual(counts['error'], 0)
+        self.assertEqual(counts['found'], len(FOODS))
+
+        with open(self.output, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record['row'] for record in records], [1, 2, 3, 4, 3, 5, 6])
+        latest = {record['row']: record['status'] for record in records}
+        self.assertEqual(latest, {row: 'found' for row in range(1, len(FOODS) + 1)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from food_cache import MISSING, SingleFlight, SQLiteCacheBackend, TTLCache
+
+
+class TTLCacheTest(unittest.TestCase):
+    def test_falsy_values_use_the_negative_ttl(self):
+        cache = TTLCache(ttl=100, negative_ttl=10)
+        now = time.time()
+        for value in ['apple', None, False, []]:
+            cache.set(repr(value), value)
+        # (seconds later, keys still cached)
+        steps = [
+            (5, ["'apple'", 'None', 'False', '[]']),
+            (11, ["'apple'"]),
+            (101, []),
+        ]
+        for seconds, cached in steps:
+            with self.subTest(seconds=seconds), mock.patch('food_cache.time.time', return_value=now + seconds):
+                for key in ["'apple'", 'None', 'False', '[]']:
+                    self.assertEqual(cache.get(key) is not MISSING, key in cached, key)
+
+    def test_lru_eviction(self):
+        cache = TTLCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual([key for key in 'abc' if key in cache], ['a', 'c'])
+        self.assertEqual(cache.stats.evictions, 1)
+
+
+class SQLiteBackendTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.db')
+
+    def test_processes_share_entries(self):
+        first = TTLCache(backend=SQLiteCacheBackend(self.path, 'food_info'))
+        second = TTLCache(backend=SQLiteCacheBackend(self.path, 'food_info'))
+        other = TTLCache(backend=SQLiteCacheBackend(self.path, 'food_terms'))
+        first.set('apple', {'calories': 52})
+        self.assertEqual(second.get('apple'), {'calories': 52})
+        # Namespaces don't see each other's keys
+        self.assertIs(other.get('apple'), MISSING)
+        second.delete('apple')
+        self.assertIs(TTLCache(backend=SQLiteCacheBackend(self.path, 'food_info')).get('apple'), MISSING)
+
+    def test_expired_entries_are_dropped(self):
+        backend = SQLiteCacheBackend(self.path, 'food_info')
+        backend.set('apple', 1, time.time() - 1)
+        self.assertIs(backend.get('apple'), MISSING)
+        self.assertEqual(len(backend), 0)
+
+    def test_least_recently_used_is_evicted(self):
+        backend = SQLiteCacheBackend(self.path, 'food_info', max_size=2, touch_interval=0)
+        expires_at = time.time() + 100
+        backend.set('a', 1, expires_at)
+        backend.set('b', 2, expires_at)
+        time.sleep(0.01)
+        backend.get('a')
+        self.assertEqual(backend.set('c', 3, expires_at), 1)
+        self.assertEqual([key for key in 'abc' if backend.get(key) is not MISSING], ['a', 'c'])
+
+    def test_hits_touch_access_time_at_most_once_per_interval(self):
+        backend = SQLiteCacheBackend(self.path, 'food_info', touch_interval=60)
+        backend.set('apple', 1, time.time() + 100)
+
+        def last_access():
+            return backend._connection().execute("SELECT last_access FROM cache").fetchone()[0]
+
+        stored = last_access()
+        backend.get('apple')
+        self.assertEqual(last_access(), stored)
+        with mock.patch('food_cache.time.time', return_value=stored + 61):
+            backend.get('apple')
+        self.assertEqual(last_access(), stored + 61)
+
+    def test_backend_errors_fall_back_to_a_miss(self):
+        backend = SQLiteCacheBackend(self.path, 'food_info')
+        cache = TTLCache(backend=backend, local_copy=False)
+        backend._connection().execute("DROP TABLE cache")
+        with self.assertLogs('nutrition_bot.food_cache', 'WARNING'):
+            cache.set('apple', 1)
+            self.assertIs(cache.get('apple'), MISSING)
+            cache.delete('apple')
+            cache.clear()
+
+
+class SingleFlightTest(unittest.TestCase):
+    def run_concurrently(self, flights, fn, callers=5):
+        """Call flights.do('apple', fn) from several threads; return their results or errors"""
+        outcomes = [None] * callers
+
+        def call(i):
+            try:
+                outcomes[i] = flights.do('apple', fn)
+            except Exception as e:
+                outcomes[i] = e
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+
+    def test_concurrent_calls_share_one_execution(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return {'calories': 52}
+
+        # Hold the first call until the others have joined it
+        threading.Timer(0.2, release.set).start()
+        outcomes = self.run_concurrently(flights, fetch)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(outcomes, [{'calories': 52}] * 5)
+        self.assertEqual(flights.coalesced, 4)
+
+    def test_error_reaches_every_waiter(self):
+        flights = SingleFlight()
+        release = threading.Event()
+
+        def fetch():
+            release.wait(5)
+            raise ConnectionError("upstream down")
+
+        threading.Timer(0.2, release.set).start()
+        outcomes = self.run_concurrently(flights, fetch)
+        self.assertTrue(all(isinstance(outcome, ConnectionError) for outcome in outcomes))
+
+    def test_finished_flight_is_not_reused(self):
+        flights = SingleFlight()
+        results = iter([1, 2])
+        self.assertEqual(flights.do('apple', next, results), 1)
+        self.assertEqual(flights.do('apple', next, results), 2)
+        self.assertEqual(flights.coalesced, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+from food_index import FoodIndex
+
+NAMES = ['apple', 'apple juice', 'green apple', 'banana', 'banana bread', 'peanut butter',
+         'chicken breast', 'chicken thigh', 'brown rice', 'white rice', 'whole milk', 'skim milk']
+
+# (query, best match or None)
+CASES = [
+    ("apple", 'apple'),
+    ("Apple Juice", 'apple juice'),
+    # Prefix expansion
+    ("chick brea", 'chicken breast'),
+    ("pean", 'peanut butter'),
+    # Typos through trigram similarity
+    ("bananna bread", 'banana bread'),
+    ("chiken thigh", 'chicken thigh'),
+    # Stop words don't count
+    ("the brown rice", 'brown rice'),
+    # Ties go to the shorter name, then alphabetically
+    ("rice", 'brown rice'),
+    ("xyzzy", None),
+    ("of the", None),
+]
+
+
+class FoodIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = FoodIndex(NAMES, stop_words={'the', 'of'})
+
+    def test_best_match(self):
+        for query, expected in CASES:
+            with self.subTest(query=query):
+                self.assertEqual(self.index.best_match(query), expected)
+
+    def test_exact_match_scores_one_and_ranks_first(self):
+        results = self.index.search("banana", limit=3)
+        self.assertEqual(results[0], ('banana', 1.0))
+        self.assertIn('banana bread', [name for name, _ in results])
+        self.assertTrue(all(score < 1.0 for _, score in results[1:]))
+
+    def test_min_score(self):
+        self.assertEqual(self.index.best_match("apple pie", min_score=0.5), 'apple')
+        self.assertIsNone(self.index.best_match("apple pie", min_score=0.9))
+
+    def test_duplicate_names_are_indexed_once(self):
+        self.assertEqual(len(FoodIndex(['Apple', 'apple', 'banana'])), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from intent import IntentClassifier
+
+GREETINGS = ['hi', 'hello', 'hey', 'good morning', 'hi there', "what's up"]
+NUTRITION = ['calories', 'protein', 'vitamin', 'nutrition facts', 'diet']
+FOOD_QUERY = ['nutrition', 'calories', 'facts', 'info']
+
+# (message, is_greeting, nutrition_keywords, is_food_query)
+CASES = [
+    ("hi", True, (), False),
+    ("Hello!", True, (), False),
+    ("Good morning :)", True, (), False),
+    ("hey, hi there", True, (), False),
+    ("Hi, how many calories in a banana?", False, ('calories',), True),
+    ("Hello! protein in 150g apple", False, ('protein',), False),
+    ("hi can you help me", False, (), False),
+    ("this is a thing", False, (), False),
+    ("which vitamins are in kale", False, ('vitamin',), False),
+    ("nutrition facts of oats", False, ('nutrition facts',), True),
+    ("", False, (), False),
+]
+
+
+class IntentClassifierTest(unittest.TestCase):
+    def setUp(self):
+        self.classifier = IntentClassifier(GREETINGS, NUTRITION, FOOD_QUERY)
+
+    def test_cases(self):
+        for message, is_greeting, keywords, is_food_query in CASES:
+            with self.subTest(message=message):
+                intent = self.classifier.classify(message)
+                self.assertEqual(intent.is_greeting, is_greeting)
+                self.assertEqual(intent.nutrition_keywords, keywords)
+                self.assertEqual(intent.is_food_query, is_food_query)
+
+    def test_greeting_followed_by_question_is_answered(self):
+        # Regression: a polite opener used to turn the question into the welcome message
+        for message in ("Hi, how many calories in a banana?", "Hello! protein in 150g apple"):
+            with self.subTest(message=message):
+                self.assertFalse(self.classifier.classify(message).is_greeting)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from nutrient_records import FoodRecord
+
+# (upstream nutrient entry, column, stored value); column None means ignored
+NUTRIENT_CASES = [
+    ({'name': 'Calories', 'amount': 52, 'unit': 'kcal'}, 'calories', 52),
+    ({'name': 'Energy', 'amount': 418.4, 'unit': 'kJ'}, 'calories', 100.0),
+    ({'name': 'Total Fat', 'amount': 3.6, 'unit': 'g'}, 'fat', 3.6),
+    ({'name': 'Saturated Fat', 'amount': 1, 'unit': 'g'}, 'saturated_fat', 1),
+    ({'name': 'Carbohydrates', 'amount': 14, 'unit': 'g'}, 'carbs', 14),
+    ({'name': 'Sugar', 'amount': 10.4, 'unit': 'g'}, 'sugars', 10.4),
+    ({'name': 'Fiber', 'amount': 2400, 'unit': 'mg'}, 'fiber', 2.4),
+    ({'name': 'Sodium', 'amount': 0.5, 'unit': 'g'}, 'sodium', 500),
+    ({'name': 'Calcium', 'amount': 6000, 'unit': 'µg'}, 'calcium', 6.0),
+    ({'name': 'Magnesium', 'amount': 5}, 'magnesium', 5),
+    # Names that only look like a column
+    ({'name': 'Sugar Alcohol', 'amount': 3, 'unit': 'g'}, None, None),
+    ({'name': 'Net Carbohydrates', 'amount': 12, 'unit': 'g'}, None, None),
+    ({'name': 'Mono Unsaturated Fat', 'amount': 2, 'unit': 'g'}, None, None),
+    # Amounts or units that can't be used
+    ({'name': 'Protein', 'amount': '3', 'unit': 'g'}, None, None),
+    ({'name': 'Protein', 'amount': 3, 'unit': 'oz'}, None, None),
+    ({'name': None, 'amount': 3, 'unit': 'g'}, None, None),
+]
+
+
+class FoodRecordTest(unittest.TestCase):
+    def test_nutrient_mapping(self):
+        for entry, column, value in NUTRIENT_CASES:
+            with self.subTest(entry=entry):
+                record = FoodRecord('apple').add_nutrients([entry])
+                food_info = record.as_food_info()
+                if column is None:
+                    self.assertEqual(set(food_info), {'name', 'description'})
+                else:
+                    self.assertEqual(food_info[column], value)
+
+    def test_first_entry_for_a_column_wins(self):
+        record = FoodRecord('apple').add_nutrients([
+            {'name': 'Calories', 'amount': 52, 'unit': 'kcal'},
+            {'name': 'Energy', 'amount': 1000, 'unit': 'kJ'},
+        ])
+        self.assertEqual(record.calories, 52)
+
+    def test_row_round_trip(self):
+        record = FoodRecord('Peanut Butter', 'Acme', 'Smooth').add_nutrients([
+            {'name': 'Protein', 'amount': 25, 'unit': 'g'},
+        ])
+        restored = FoodRecord.from_row(record.to_row())
+        self.assertEqual(restored.as_food_info(), record.as_food_info())
+        self.assertEqual(restored.as_food_info()['brand'], 'Acme')
+        self.assertNotIn('brand', FoodRecord('apple').as_food_info())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import math
+import unittest
+
+import numpy as np
+
+from nutrient_vectors import NutrientNeighbors, from_vector, rank, scale, to_matrix, to_vector, total
+
+FOODS = [
+    {'name': 'apple', 'calories': 52, 'sugars': 10.4, 'protein': 0.3, 'fiber': 2.4},
+    {'name': 'banana', 'calories': 89, 'sugars': 12.2, 'protein': 1.1, 'fiber': 2.6},
+    {'name': 'chicken', 'calories': 165, 'protein': 31, 'fat': 3.6},
+    {'name': 'water', 'calories': 0},
+]
+
+
+class NutrientArithmeticTest(unittest.TestCase):
+    def test_vector_round_trip(self):
+        vector = to_vector({'calories': 52, 'protein': 0.3, 'fat': None, 'sugars': True})
+        self.assertEqual(from_vector(vector), {'calories': 52.0, 'protein': 0.3})
+
+    def test_scale_per_row(self):
+        matrix = to_matrix(FOODS[:2])
+        scaled = scale(matrix, [50, 200])
+        self.assertEqual(from_vector(scaled[0])['calories'], 26.0)
+        self.assertEqual(from_vector(scaled[1])['calories'], 178.0)
+
+    def test_total_keeps_nutrients_nobody_reports_missing(self):
+        totals = from_vector(total(to_matrix(FOODS), [100, 100, 200, 500]))
+        self.assertEqual(totals['calories'], 52 + 89 + 330)
+        # Only chicken reports fat; the others count as zero
+        self.assertEqual(totals['fat'], 7.2)
+        self.assertNotIn('sodium', totals)
+
+    def test_rank(self):
+        matrix = to_matrix(FOODS)
+        # (nutrient, per, descending, expected rows)
+        cases = [
+            ('protein', None, True, [2, 1, 0]),
+            ('calories', None, False, [3, 0, 1, 2]),
+            # Water has no calories to divide by and drops out
+            ('protein', 'calories', True, [2, 1, 0]),
+        ]
+        for nutrient, per, descending, expected in cases:
+            with self.subTest(nutrient=nutrient, per=per):
+                rows, values = rank(matrix, nutrient, per=per, descending=descending)
+                self.assertEqual(rows.tolist(), expected)
+                self.assertFalse(np.isnan(values).any())
+        rows, _ = rank(matrix, 'protein', limit=1)
+        self.assertEqual(rows.tolist(), [2])
+
+
+class NutrientNeighborsTest(unittest.TestCase):
+    def setUp(self):
+        self.neighbors = NutrientNeighbors(to_matrix(FOODS))
+
+    def test_nearest_first_and_exclusions(self):
+        rows, distances = self.neighbors.query(to_vector(FOODS[0]), limit=4)
+        self.assertEqual(rows[0], 0)
+        self.assertEqual(distances[0], 0.0)
+        self.assertEqual(distances.tolist(), sorted(distances.tolist()))
+        rows, _ = self.neighbors.query(to_vector(FOODS[0]), limit=4, exclude=[0])
+        self.assertEqual(sorted(rows.tolist()), [1, 2, 3])
+
+    def test_constraints_filter_on_raw_values(self):
+        rows, _ = self.neighbors.query(to_vector(FOODS[1]), constraints={'sugars': 'lower'}, exclude=[1])
+        # Chicken and water don't report sugars, so they can't be shown to have less
+        self.assertEqual(rows.tolist(), [0])
+        rows, _ = self.neighbors.query(to_vector(FOODS[0]), constraints={'protein': 'higher'})
+        self.assertEqual(sorted(rows.tolist()), [1, 2])
+
+    def test_constraint_on_a_missing_reference_is_ignored(self):
+        rows, distances = self.neighbors.query(to_vector(FOODS[3]), limit=4, constraints={'sugars': 'lower'})
+        self.assertEqual(len(rows), 4)
+        self.assertTrue(all(math.isfinite(distance) for distance in distances))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,252 @@
+import json
+import os
+import time
+import unittest
+from unittest import mock
+
+os.environ.setdefault('CACHE_WARMER', '0')
+
+import nutrition_bot as bot
+
+# (message, answered locally) with an apple as the previous food; None means Gemini
+FOLLOW_UP_CASES = [
+    ("how much protein in it", True),
+    ("what about its fat?", True),
+    ("is it good for diabetics?", None),
+    ("can I eat it every day?", None),
+    ("what are the benefits of it", None),
+    # A pronoun alone doesn't make a message about the previous food
+    ("what is the weather like this weekend", bot.OFF_TOPIC_MESSAGE),
+    ("write me a poem about that", bot.OFF_TOPIC_MESSAGE),
+    ("this is great, thanks", bot.OFF_TOPIC_MESSAGE),
+]
+
+
+def session_about(food):
+    return {'history': [], 'summary': '', 'last_food': bot.NUTRITION_DATABASE[food]}
+
+
+class FollowUpTest(unittest.TestCase):
+    def test_cases(self):
+        for message, expected in FOLLOW_UP_CASES:
+            with self.subTest(message=message):
+                answer = bot.answer_locally(message, session_about('apple'))
+                if expected is True:
+                    self.assertIn('Apple', answer)
+                else:
+                    self.assertEqual(answer, expected)
+
+    @mock.patch.object(bot, 'GOOGLE_API_KEY', 'test')
+    def test_gemini_answer_moves_last_food(self):
+        # (question sent to Gemini, last food afterwards)
+        steps = [
+            ("is banana good for diabetics?", 'banana'),
+            ("is it better before a run?", 'banana'),
+            ("tips for a healthy breakfast?", None),
+        ]
+        session = session_about('apple')
+        for question, food in steps:
+            with self.subTest(question=question):
+                answer, gemini_prompt = bot.resolve_response(question, session)
+                self.assertIsNone(answer)
+                self.assertIsNotNone(gemini_prompt)
+                if food is None:
+                    self.assertIsNone(session['last_food'])
+                else:
+                    self.assertEqual(session['last_food'], bot.NUTRITION_DATABASE[food])
+
+
+# (question, terms that must be probed first)
+CANDIDATE_ORDER_CASES = [
+    ("I have been training for a marathon and wonder whether eating peanut butter every morning is okay",
+     ['peanut']),
+    ("my coach says a bowl of quinoa salad after practice helps", ['quinoa', 'quinoa salad']),
+]
+
+
+class FoodTermProbeTest(unittest.TestCase):
+    def test_likely_foods_are_probed_first(self):
+        for question, first in CANDIDATE_ORDER_CASES:
+            with self.subTest(question=question):
+                terms = bot.collect_candidate_terms(bot.classify_message(question).words)
+                self.assertEqual(terms[:len(first)], first)
+
+    @mock.patch.object(bot, 'SPOONACULAR_API_KEY', 'test')
+    def test_deadline_leaves_the_question_to_gemini(self):
+        def slow_lookup(term):
+            time.sleep(0.5)
+            return False
+
+        question = "my grandmother swears that zorblax porridge before bedtime fixes everything"
+        with mock.patch.object(bot, 'is_food_term_via_api', slow_lookup), \
+                mock.patch.object(bot, 'FOOD_TERM_LOOKUP_DEADLINE', 0.05):
+            self.assertIsNone(bot.contains_food_term(['zorblax', 'porridge'], deadline=0.05))
+            # Unknown is not "not about food": no off-topic answer
+            self.assertIsNone(bot.answer_locally(question))
+
+
+def parse_events(body):
+    """Split a text/event-stream body into (event, data) pairs, checking the framing"""
+    events = []
+    for block in body.split('\n\n')[:-1]:
+        lines = block.split('\n')
+        assert [line.split(': ', 1)[0] for line in lines] == ['event', 'data'], block
+        events.append((lines[0][len('event: '):], json.loads(lines[1][len('data: '):])))
+    assert body.endswith('\n\n'), body[-20:]
+    return events
+
+
+class ChatStreamTest(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(bot, 'GOOGLE_API_KEY', 'test'),
+            # Many requests from one test client address
+            mock.patch.object(bot.RATE_LIMITER, 'rate', 0),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client = bot.app.test_client()
+
+    def test_sse_event_escapes_newlines(self):
+        event = bot.sse_event('chunk', {'text': "line one\n\nline two"})
+        self.assertEqual(event, 'event: chunk\ndata: {"text": "line one\\n\\nline two"}\n\n')
+        self.assertEqual(parse_events(event), [('chunk', {'text': "line one\n\nline two"})])
+
+    def test_local_answer_is_streamed_then_done(self):
+        response = self.client.post('/api/chat/stream', json={'message': "How many calories in a banana?"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        events = parse_events(response.get_data(as_text=True))
+        self.assertEqual([event for event, _ in events[:-1]], ['chunk'] * (len(events) - 1))
+        self.assertIn('Banana', ''.join(data['text'] for _, data in events[:-1]))
+        event, data = events[-1]
+        self.assertEqual(event, 'done')
+        self.assertFalse(data['exit'])
+        self.assertTrue(data['session_id'])
+
+    def test_goodbye_ends_the_session(self):
+        response = self.client.post('/api/chat/stream', json={'message': 'byee'})
+        events = parse_events(response.get_data(as_text=True))
+        self.assertEqual([event for event, _ in events], ['chunk', 'done'])
+        self.assertTrue(events[-1][1]['exit'])
+
+    def test_quota_error_is_sent_as_an_event(self):
+        with mock.patch.object(bot, 'stream_response', side_effect=bot.QuotaExceeded("spent", 60)):
+            response = self.client.post('/api/chat/stream', json={'message': "write me a meal plan"})
+        self.assertEqual(parse_events(response.get_data(as_text=True)),
+                         [('error', {'error': bot.QUOTA_EXCEEDED_MESSAGE, 'retry_after': 60})])
+
+    def test_invalid_request_is_rejected_before_streaming(self):
+        response = self.client.post('/api/chat/stream', json={'message': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.mimetype, 'application/json')
+
+
+# (request body, reason) for batch requests rejected as a whole
+INVALID_BATCHES = [
+    ([{'name': 'apple'}], "not an object"),
+    ({}, "no foods"),
+    ({'foods': []}, "empty list"),
+    ({'foods': 'apple'}, "not a list"),
+    ({'foods': ['apple'] * (bot.MAX_BATCH_FOODS + 1)}, "too many foods"),
+]
+
+# (item, error) for batch items reported individually
+INVALID_ITEMS = [
+    (42, 'Each food must be a name or an object with a name'),
+    ({'grams': 100}, 'No food name provided'),
+    ('  ', 'No food name provided'),
+    ({'name': 'apple', 'grams': -5}, 'grams must be a positive number'),
+    ({'name': 'apple', 'grams': True}, 'grams must be a positive number'),
+    ({'name': 'apple', 'grams': '100'}, 'grams must be a positive number'),
+]
+
+
+class FoodInfoBatchTest(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(bot, 'SPOONACULAR_API_KEY', None),
+            mock.patch.object(bot.RATE_LIMITER, 'rate', 0),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.client = bot.app.test_client()
+
+    def test_invalid_requests(self):
+        for body, reason in INVALID_BATCHES:
+            with self.subTest(reason=reason):
+                response = self.client.post('/api/food_info/batch', json=body)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.get_json())
+        response = self.client.post('/api/food_info/batch', data='apple', content_type='text/plain')
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_items_are_reported_individually(self):
+        for item, error in INVALID_ITEMS:
+            with self.subTest(item=item):
+                response = self.client.post('/api/food_info/batch', json={'foods': ['apple', item]})
+                self.assertEqual(response.status_code, 200)
+                data = response.get_json()
+                self.assertEqual((data['found'], data['missing']), (1, 1))
+                self.assertEqual(data['items'][1], {'query': item, 'found': False, 'error': error})
+
+    def test_items_are_scaled_and_summed(self):
+        apple, banana = bot.NUTRITION_DATABASE['apple'], bot.NUTRITION_DATABASE['banana']
+        response = self.client.post('/api/food_info/batch', json={
+            'foods': ['apple', {'name': 'banana', 'grams': 150}, 'zorblax']
+        })
+        data = response.get_json()
+        self.assertEqual([item['found'] for item in data['items']], [True, True, False])
+        self.assertEqual(data['items'][2]['error'], 'Food not found')
+        self.assertEqual(data['items'][1]['scaled']['calories'], round(banana['calories'] * 1.5, 2))
+        self.assertEqual(data['totals']['calories'], round(apple['calories'] + banana['calories'] * 1.5, 2))
+
+
+class ConditionalGetTest(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(bot.RATE_LIMITER, 'rate', 0)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.client = bot.app.test_client()
+
+    def test_food_info_revalidates_with_etag(self):
+        first = self.client.get('/api/food_info?food_name=apple')
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.cache_control.no_cache)
+        etag = first.headers['ETag']
+
+        again = self.client.get('/api/food_info?food_name=apple', headers={'If-None-Match': etag})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.get_data(), b'')
+        self.assertEqual(again.headers['ETag'], etag)
+
+        other = self.client.get('/api/food_info?food_name=banana', headers={'If-None-Match': etag})
+        self.assertEqual(other.status_code, 200)
+        self.assertNotEqual(other.headers['ETag'], etag)
+
+    def test_compressed_representation_has_its_own_etag(self):
+        plain = self.client.get('/api/food_info?food_name=apple')
+        gzipped = self.client.get('/api/food_info?food_name=apple', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(gzipped.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzipped.headers['ETag'], plain.headers['ETag'][:-1] + '-gzip"')
+        self.assertIn('Accept-Encoding', gzipped.headers['Vary'])
+
+        again = self.client.get('/api/food_info?food_name=apple',
+                                headers={'Accept-Encoding': 'gzip', 'If-None-Match': gzipped.headers['ETag']})
+        self.assertEqual(again.status_code, 304)
+        # The uncompressed tag doesn't match the gzip representation
+        mismatched = self.client.get('/api/food_info?food_name=apple',
+                                     headers={'Accept-Encoding': 'gzip', 'If-None-Match': plain.headers['ETag']})
+        self.assertEqual(mismatched.status_code, 200)
+
+    def test_errors_have_no_etag(self):
+        response = self.client.get('/api/food_info')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('ETag', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+
+from query_parser import HEALTHIER_CONSTRAINTS, FoodRef, QueryParser
+
+# (question, kind, nutrients, foods, direction); kind None means left to the LLM
+CASES = [
+    ("How many calories in a banana?", 'nutrients', ['calories'], [FoodRef('banana', None, None)], None),
+    ("protein in 150g chicken breast", 'nutrients', ['protein'], [FoodRef('chicken breast', 150.0, None)], None),
+    ("how much fat and saturated fat does 2 eggs have", 'nutrients', ['fat', 'saturated_fat'],
+     [FoodRef('eggs', None, 2.0)], None),
+    ("calories in 1.5 kg of rice", 'nutrients', ['calories'], [FoodRef('rice', 1500.0, None)], None),
+    ("carbs in oatmeal for breakfast", 'nutrients', ['carbs'], [FoodRef('oatmeal', None, None)], None),
+    ("nutrition facts of oats", 'facts', [], [FoodRef('oats', None, None)], None),
+    ("avocado nutrition", 'facts', [], [FoodRef('avocado', None, None)], None),
+    ("compare apple vs orange", 'compare', [], [FoodRef('apple', None, None), FoodRef('orange', None, None)], None),
+    ("which has more protein, eggs or tofu?", 'compare', ['protein'],
+     [FoodRef('eggs', None, None), FoodRef('tofu', None, None)], 'more'),
+    ("does salmon have less sodium than tuna", 'compare', ['sodium'],
+     [FoodRef('salmon', None, None), FoodRef('tuna', None, None)], 'less'),
+    # A polite opener doesn't stop a question from fitting a template
+    ("Hi, how many calories in a banana?", 'nutrients', ['calories'], [FoodRef('banana', None, None)], None),
+    ("Hello! protein in 150g apple", 'nutrients', ['protein'], [FoodRef('apple', 150.0, None)], None),
+    # Open-ended questions and extra clauses are left to the LLM
+    ("is the protein in eggs good for muscle?", None, None, None, None),
+    ("is chicken good for you", None, None, None, None),
+    ("how many calories should I eat a day", None, None, None, None),
+    ("tell me about the history of rice", None, None, None, None),
+    ("hi", None, None, None, None),
+]
+
+# (question, food name or None, constraints)
+ALTERNATIVE_CASES = [
+    ("healthier alternative to white rice", 'white rice', HEALTHIER_CONSTRAINTS),
+    ("What's a good substitute for butter?", 'butter', {}),
+    ("substitute for sour cream with less fat", 'sour cream', {'fat': 'lower'}),
+    ("low-fat alternatives to cheese", 'cheese', {'fat': 'lower'}),
+    ("what can I eat instead of chips with lower sodium and more fiber?", 'chips',
+     {'sodium': 'lower', 'fiber': 'higher'}),
+    ("what is healthier than white bread?", 'white bread', HEALTHIER_CONSTRAINTS),
+    ("what is similar to banana", 'banana', {}),
+    # Not substitute questions, or extra clauses the templates can't account for
+    ("Is apple healthier than banana?", None, None),
+    ("is an orange a good substitute for an apple in a pie recipe?", None, None),
+    ("what is similar to the flavor of banana?", None, None),
+    ("why are alternatives to sugar popular", None, None),
+]
+
+# (question, kind, food names) for comparisons phrased with "healthier"
+HEALTHIER_COMPARE_CASES = [
+    ("Is apple healthier than banana?", 'compare', ['apple', 'banana']),
+    ("Which is healthier, apple or banana?", 'compare', ['apple', 'banana']),
+    ("is apple healthier than banana for breakfast", None, None),
+]
+
+
+class ParseTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = QueryParser()
+
+    def test_cases(self):
+        for question, kind, nutrients, foods, direction in CASES:
+            with self.subTest(question=question):
+                parsed = self.parser.parse(question)
+                if kind is None:
+                    self.assertIsNone(parsed)
+                else:
+                    self.assertEqual(parsed.kind, kind)
+                    self.assertEqual(parsed.nutrients, nutrients)
+                    self.assertEqual(parsed.foods, foods)
+                    self.assertEqual(parsed.direction, direction)
+
+
+class ParseAlternativesTest(unittest.TestCase):
+    def setUp(self):
+        self.parser = QueryParser()
+
+    def test_cases(self):
+        for question, food, constraints in ALTERNATIVE_CASES:
+            with self.subTest(question=question):
+                parsed = self.parser.parse_alternatives(question)
+                if food is None:
+                    self.assertIsNone(parsed)
+                else:
+                    self.assertEqual(parsed.food.name, food)
+                    self.assertEqual(parsed.constraints, constraints)
+
+    def test_healthier_than_is_a_comparison(self):
+        for question, kind, foods in HEALTHIER_COMPARE_CASES:
+            with self.subTest(question=question):
+                parsed = self.parser.parse(question)
+                if kind is None:
+                    self.assertIsNone(parsed)
+                else:
+                    self.assertEqual(parsed.kind, kind)
+                    self.assertEqual([ref.name for ref in parsed.foods], foods)
+
+
+if __name__ == '__main__':
+    unittest.main()
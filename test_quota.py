@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+
+from quota import STAGE_LOCAL_ONLY, STAGE_NO_PROBING, STAGE_NORMAL, QuotaAccountant, QuotaExceeded, SQLiteQuotaStore
+
+
+class SharedQuotaTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.db')
+
+    def accountant(self):
+        # refresh=0 re-reads the shared totals on every check
+        return QuotaAccountant({'spoonacular': 100}, store=SQLiteQuotaStore(self.path), refresh=0)
+
+    def test_workers_charge_one_budget(self):
+        first, second = self.accountant(), self.accountant()
+        # (spender, amount, stage both workers see afterwards)
+        steps = [
+            (first, 40, STAGE_NORMAL),
+            (second, 35, STAGE_NO_PROBING),
+            (first, 21, STAGE_LOCAL_ONLY),
+        ]
+        for spender, amount, stage in steps:
+            spender.spend('spoonacular', amount)
+            with self.subTest(amount=amount):
+                self.assertEqual(first.stage(), stage)
+                self.assertEqual(second.stage(), stage)
+
+    def test_without_store_budgets_are_per_process(self):
+        first = QuotaAccountant({'spoonacular': 100})
+        second = QuotaAccountant({'spoonacular': 100})
+        first.spend('spoonacular', 96)
+        self.assertEqual(first.stage(), STAGE_LOCAL_ONLY)
+        self.assertEqual(second.stage(), STAGE_NORMAL)
+
+
+class ResourceStageTest(unittest.TestCase):
+    def test_exhausted_resource_does_not_block_the_other(self):
+        quota = QuotaAccountant({'spoonacular': 100, 'gemini': 1000})
+        quota.spend('gemini', 1000)
+        with self.assertRaises(QuotaExceeded):
+            quota.check('gemini')
+        quota.check('spoonacular')
+        self.assertEqual(quota.stage('spoonacular'), STAGE_NORMAL)
+        self.assertEqual(quota.stage('gemini'), STAGE_LOCAL_ONLY)
+        # The overall stage reported in stats follows the scarcest resource
+        self.assertEqual(quota.stage(), STAGE_LOCAL_ONLY)
+
+    def test_probing_stage_follows_its_own_budget(self):
+        quota = QuotaAccountant({'spoonacular': 100, 'gemini': 1000})
+        # (resource, amount, spoonacular stage afterwards)
+        steps = [
+            ('gemini', 800, STAGE_NORMAL),
+            ('spoonacular', 75, STAGE_NO_PROBING),
+            ('spoonacular', 21, STAGE_LOCAL_ONLY),
+        ]
+        for resource, amount, stage in steps:
+            quota.spend(resource, amount)
+            with self.subTest(resource=resource, amount=amount):
+                self.assertEqual(quota.stage('spoonacular'), stage)
+
+
+if __name__ == '__main__':
+    unittest.main()
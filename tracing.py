@@ -0,0 +1,185 @@
+"""Per-request stage timing with Prometheus-style metrics.
+
+A Trace is attached to the current request through a context variable, so
+``span('stage')`` blocks anywhere in the call chain (including pool threads
+started with ``submit``) add their time to both the process-wide stage
+histograms and the request's own breakdown, which can be sent back as a
+``Server-Timing`` header. Views run synchronously in the server's request
+threads, whose context outlives the request, so the trace is cleared when
+the request is torn down.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from upstream import LatencyHistogram
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+
+
+class Trace:
+    """Stage timings and counters of one request"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            total, calls = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total + seconds, calls + 1)
+
+    def incr(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Format the stage breakdown as a Server-Timing header value"""
+        with self._lock:
+            stages = list(self.stages.items())
+        entries = []
+        for stage, (seconds, calls) in stages:
+            # Header metric names are tokens; ':' and '.' become '-'
+            token = stage.replace(':', '-').replace('.', '-')
+            entry = f"{token};dur={seconds * 1000:.1f}"
+            if calls > 1:
+                entry += f';desc="{calls} calls"'
+            entries.append(entry)
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ', '.join(entries)
+
+
+class Metrics:
+    """Process-wide labelled histograms and counters, rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+
+    def describe(self, metric, text):
+        self._help[metric] = text
+
+    def observe(self, metric, labels, seconds):
+        key = (metric, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def incr(self, metric, labels=None, amount=1):
+        key = (metric, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def render(self, extra=()):
+        """Render every metric (plus extra (metric, labels, histogram dict) tuples) as text"""
+        with self._lock:
+            histograms = [(metric, dict(labels), histogram.as_dict())
+                          for (metric, labels), histogram in self._histograms.items()]
+            counters = [(metric, dict(labels), value)
+                        for (metric, labels), value in self._counters.items()]
+        histograms.extend(extra)
+
+        lines = []
+        for metric in sorted({metric for metric, _, _ in histograms}):
+            self._header(lines, metric, 'histogram')
+            for _, labels, data in sorted((h for h in histograms if h[0] == metric), key=_label_order):
+                for bound, count in data['buckets'].items():
+                    lines.append(f"{metric}_bucket{_labels(labels, le=bound)} {count}")
+                lines.append(f"{metric}_sum{_labels(labels)} {data['sum']}")
+                lines.append(f"{metric}_count{_labels(labels)} {data['count']}")
+        for metric in sorted({metric for metric, _, _ in counters}):
+            self._header(lines, metric, 'counter')
+            for _, labels, value in sorted((c for c in counters if c[0] == metric), key=_label_order):
+                lines.append(f"{metric}{_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, lines, metric, kind):
+        if metric in self._help:
+            lines.append(f"# HELP {metric} {self._help[metric]}")
+        lines.append(f"# TYPE {metric} {kind}")
+
+
+def _label_order(item):
+    return sorted(item[1].items())
+
+
+def _labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for value in labels.values())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + '}'
+
+
+METRICS = Metrics()
+METRICS.describe('nutrition_bot_stage_seconds', 'Time spent in each stage of the chat pipeline')
+METRICS.describe('nutrition_bot_request_seconds', 'Time to produce a response, per endpoint')
+
+
+def start_trace(name):
+    """Start tracing a request in the current context and return the Trace"""
+    trace = Trace(name)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def finish_trace(trace, status=None):
+    """Record the request latency of a finished trace"""
+    labels = {'endpoint': trace.name}
+    if status is not None:
+        labels['status'] = str(status)
+    METRICS.observe('nutrition_bot_request_seconds', labels, trace.elapsed())
+
+
+def clear_trace():
+    """Detach the trace from the current context once its request is done"""
+    _current_trace.set(None)
+
+
+@contextmanager
+def span(stage):
+    """Time a block as one stage of the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        METRICS.observe('nutrition_bot_stage_seconds', {'stage': stage}, elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, elapsed)
+
+
+def annotate(stage, seconds):
+    """Add externally timed work (e.g. an upstream call) to the current request only"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+def count(counter, amount=1):
+    """Increment a process-wide counter and the current request's copy of it"""
+    METRICS.incr(f"nutrition_bot_{counter}_total", amount=amount)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.incr(counter, amount)
+
+
+def submit(executor, fn, *args):
+    """executor.submit that keeps the current trace visible inside the worker thread"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
@@ -0,0 +1,245 @@
+import bisect
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upstream responses worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is currently failing"""
+
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram (Prometheus style)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += seconds
+            self.count += 1
+
+    def as_dict(self):
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+                cumulative += count
+                buckets['+Inf' if bound == float('inf') else str(bound)] = cumulative
+            return {'buckets': buckets, 'sum': round(self.total, 6), 'count': self.count}
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after repeated failures, probing again after a cool-down.
+
+    Closed: calls go through. After ``failure_threshold`` consecutive
+    failures it opens and calls fail immediately for ``reset_timeout``
+    seconds, then a single trial call is let through (half-open); its outcome
+    closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Return True if a call may be made now"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class CappedRetry(Retry):
+    """Retry whose backoff and honoured Retry-After never exceed ``max_wait`` seconds"""
+
+    max_wait = None
+
+    def new(self, **kwargs):
+        retry = super().new(**kwargs)
+        retry.max_wait = self.max_wait
+        return retry
+
+    def _cap(self, seconds):
+        if seconds is None or self.max_wait is None:
+            return seconds
+        return min(seconds, self.max_wait)
+
+    def get_backoff_time(self):
+        return self._cap(super().get_backoff_time())
+
+    def get_retry_after(self, response):
+        return self._cap(super().get_retry_after(response))
+
+
+def _build_retry(retries, backoff_factor, backoff_jitter, max_wait=None):
+    options = dict(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    try:
+        retry = CappedRetry(backoff_jitter=backoff_jitter, **options)
+    except TypeError:
+        # urllib3 < 2 has no built-in jitter
+        retry = CappedRetry(**options)
+    retry.max_wait = max_wait
+    return retry
+
+
+class UpstreamClient:
+    """Pooled, instrumented HTTP client for one upstream API.
+
+    Keeps connections alive across calls, applies connect/read timeouts,
+    retries 429/5xx responses with jittered exponential backoff (waiting at
+    most ``max_retry_wait`` seconds between attempts, even when Retry-After
+    asks for longer), trips a circuit breaker when the upstream keeps failing
+    and records a latency histogram per logical endpoint. ``observer``, if given, is called with
+    (endpoint, seconds) after every call, e.g. to add it to a request trace.
+    """
+
+    def __init__(self, name, base_url, default_params=None, connect_timeout=3.05,
+                 read_timeout=10.0, retries=2, backoff_factor=0.3, backoff_jitter=0.2,
+                 max_retry_wait=None, pool_size=20, breaker=None, observer=None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.default_params = default_params or {}
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.observer = observer
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=_build_retry(retries, backoff_factor, backoff_jitter, max_retry_wait)
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._histograms = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, endpoint):
+        with self._lock:
+            histogram = self._histograms.get(endpoint)
+            if histogram is None:
+                histogram = self._histograms[endpoint] = LatencyHistogram()
+            return histogram
+
+    def _observe(self, endpoint, seconds):
+        self._histogram(endpoint).observe(seconds)
+        if self.observer is not None:
+            self.observer(endpoint, seconds)
+
+    def _count_error(self, endpoint):
+        with self._lock:
+            self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+
+    def get_json(self, path, endpoint, params=None):
+        """GET base_url + path and return the decoded JSON body.
+
+        Raises CircuitOpenError without calling the upstream while the
+        circuit is open, and requests exceptions for failed calls.
+        """
+        if not self.breaker.allow():
+            self._count_error(endpoint)
+            raise CircuitOpenError(f"{self.name} is unavailable, skipping {endpoint}")
+
+        query = dict(self.default_params)
+        if params:
+            query.update(params)
+
+        start = time.perf_counter()
+        try:
+            response = self.session.get(self.base_url + path, params=query, timeout=self.timeout)
+        except requests.RequestException:
+            self._observe(endpoint, time.perf_counter() - start)
+            self._count_error(endpoint)
+            self.breaker.record_failure()
+            raise
+        self._observe(endpoint, time.perf_counter() - start)
+
+        if response.status_code in RETRY_STATUSES:
+            # Still failing after retries: the upstream is degraded
+            self._count_error(endpoint)
+            self.breaker.record_failure()
+        elif response.ok:
+            self.breaker.record_success()
+        else:
+            # Other 4xx are problems with our request, not upstream health
+            self._count_error(endpoint)
+            self.breaker.record_success()
+        response.raise_for_status()
+        return response.json()
+
+    def call_count(self):
+        """Total upstream calls made so far (each may include retries)"""
+        with self._lock:
+            return sum(histogram.count for histogram in self._histograms.values())
+
+    def stats(self):
+        """Return per-endpoint latency histograms, error counts and breaker state"""
+        with self._lock:
+            histograms = dict(self._histograms)
+            errors = dict(self._errors)
+        return {
+            'circuit': self.breaker.state,
+            'endpoints': {
+                endpoint: dict(histograms.get(endpoint, LatencyHistogram()).as_dict(),
+                               errors=errors.get(endpoint, 0))
+                for endpoint in sorted(set(histograms) | set(errors))
+            }
+        }